@@ -0,0 +1,775 @@
+"""
+Load and soak harness for the data proxy library and relayer.
+
+Simulated owners and consumers run a weighted mix of store, consume and grant
+operations, either against the database module directly or against a running
+relayer, and throughput, latency percentiles, errors and memory are reported
+per operation. Run ``python -m benchmarks.load --help`` for the options.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+from typing import (
+    Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+)
+from umbral import SecretKey, Signer
+from src.database import store_data, consume_data, grant_access
+from src.encryption import encrypt_data, create_kfrags
+from src.log_storage import LogStorage
+from src.relayer import (
+    relayer_request, sign_store_request, DEFAULT_HOST, DEFAULT_PORT
+)
+from src.storage import StorageBackend, InMemoryStorage, SQLiteStorage
+from benchmarks.run import (
+    parse_size, format_size, parse_policy, describe_environment
+)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+OPERATIONS = ('store', 'consume', 'grant')
+DEFAULT_MIX = 'consume:90,store:9,grant:1'
+DEFAULT_SIZES = '1K:60,16K:30,256K:9,1M:1'
+DEFAULT_POLICIES = '1/1,2/3'
+DEFAULT_DURATION = 10.0
+DEFAULT_REPORT_INTERVAL = 5.0
+
+# Latency buckets grow by 2% from 1 us, so percentiles are within 2% at any
+# scale and a histogram stays small however long a soak runs
+_MIN_LATENCY = 1e-6
+_GROWTH = 1.02
+_ACCESS_URL = "https://example.com/data"
+
+T = TypeVar('T')
+
+# Called with the elapsed seconds, the per-operation summary of the interval
+# and the current resident memory
+Reporter = Callable[[float, Dict[str, Dict[str, float]], Optional[int]], None]
+
+
+def parse_distribution(
+    text: str,
+    parse: Callable[[str], T]
+) -> List[Tuple[T, float]]:
+    """
+    Parse a weighted distribution such as ``'1K:70,1M:30'``.
+
+    A value without a weight counts as 1.
+
+    Args:
+        text (str): Comma-separated values, each with an optional ``:weight``.
+        parse (Callable[[str], T]): Parser of a single value.
+
+    Returns:
+        List[Tuple[T, float]]: The values and their weights.
+    """
+    distribution = []
+    for item in text.split(','):
+        value, _, weight = item.partition(':')
+        distribution.append((parse(value), float(weight) if weight else 1.0))
+    weights = [weight for _, weight in distribution]
+    if not distribution or min(weights) < 0 or sum(weights) <= 0:
+        raise ValueError(f"Invalid distribution '{text}'.")
+    return distribution
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram answering percentile queries in bounded
+    memory.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one latency in seconds."""
+        scaled = max(seconds, _MIN_LATENCY) / _MIN_LATENCY
+        index = int(math.log(scaled) / math.log(_GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Return the latency below which the given fraction of observations fall.
+
+        Args:
+            fraction (float): Between 0 and 1, e.g. 0.99 for p99.
+
+        Returns:
+            float: The latency in seconds, or 0.0 without observations.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        running = 0
+        for index in sorted(self.buckets):
+            running += self.buckets[index]
+            if running >= rank:
+                return min(_MIN_LATENCY * _GROWTH ** (index + 1), self.max)
+        return self.max
+
+    def summary(self, seconds: float) -> Dict[str, float]:
+        """Summarize the observations made over a period of seconds."""
+        return {
+            'count': self.count,
+            'throughput': self.count / seconds if seconds > 0 else 0.0,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+
+def memory_usage(
+    pid: Optional[int] = None
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Read the resident and peak resident memory of a process.
+
+    Args:
+        pid (Optional[int]): Process to inspect, e.g. a relayer; the current
+            process if omitted.
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: Current and peak resident bytes,
+        None where unknown.
+    """
+    current = peak = None
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        if pid is None and resource is not None:
+            # Kilobytes on Linux, bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak *= 1 if sys.platform == 'darwin' else 1024
+    return current, peak
+
+
+class Participants:
+    """
+    Simulated owners and consumers, and the policy each owner uses for each
+    consumer.
+
+    Args:
+        owners (int): Number of data owners.
+        consumers (int): Number of data consumers.
+        policies (Sequence[Tuple[int, int]]): Threshold and shares pairs,
+            assigned to owner/consumer pairs at random.
+        rng (random.Random): Source of the policy assignment.
+    """
+
+    def __init__(
+        self,
+        owners: int,
+        consumers: int,
+        policies: Sequence[Tuple[int, int]],
+        rng: random.Random
+    ):
+        if owners <= 0 or consumers <= 0:
+            raise ValueError(
+                "At least one owner and one consumer are required.")
+        self.owner_keys = [SecretKey.random() for _ in range(owners)]
+        self.owner_signers = [Signer(key) for key in self.owner_keys]
+        self.owner_public_keys = [key.public_key() for key in self.owner_keys]
+        self.consumer_keys = [SecretKey.random() for _ in range(consumers)]
+        self.consumer_public_keys = [
+            key.public_key() for key in self.consumer_keys
+        ]
+        self.policies = {
+            (owner, consumer): rng.choice(policies)
+            for owner in range(owners) for consumer in range(consumers)
+        }
+
+
+class LibraryTarget:
+    """
+    Runs operations by calling the database module directly, on a thread pool.
+
+    Args:
+        storage (StorageBackend): The storage the assets are written to.
+        participants (Participants): The simulated owners and consumers.
+        concurrency (int): Number of threads.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        participants: Participants,
+        concurrency: int
+    ):
+        self.storage = storage
+        self.participants = participants
+        self.executor = ThreadPoolExecutor(max_workers=concurrency,
+                                           thread_name_prefix='load')
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking database call on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def prepare_store(  # pylint: disable=unused-argument
+            self, owner: int, consumer: int, data: bytes) -> Any:
+        """Return the plaintext, as store_data encrypts while it is timed."""
+        return data
+
+    async def store(self, asset_id: str, owner: int, consumer: int,
+                    prepared: Any) -> None:
+        """Encrypt and store an asset of owner, granted to consumer."""
+        people = self.participants
+        threshold, shares = people.policies[owner, consumer]
+        await self._run(store_data, self.storage, asset_id, prepared,
+                        _ACCESS_URL, people.owner_keys[owner],
+                        people.owner_signers[owner],
+                        people.consumer_public_keys[consumer],
+                        threshold, shares)
+
+    async def consume(self, asset_id: str, owner: int,
+                      consumer: int) -> None:
+        """Re-encrypt and decrypt an asset of owner for consumer."""
+        people = self.participants
+        await self._run(consume_data, self.storage, asset_id,
+                        f"consumer_{consumer}",
+                        people.consumer_keys[consumer],
+                        people.owner_public_keys[owner],
+                        people.consumer_public_keys[consumer])
+
+    async def grant(self, asset_id: str, owner: int, consumer: int) -> None:
+        """Grant consumer access to an asset of owner."""
+        people = self.participants
+        threshold, shares = people.policies[owner, consumer]
+        await self._run(grant_access, self.storage, asset_id,
+                        people.owner_keys[owner], people.owner_signers[owner],
+                        people.consumer_public_keys[consumer],
+                        threshold, shares)
+
+    def close(self) -> None:
+        """Shut down the thread pool."""
+        self.executor.shutdown()
+
+
+class RelayerTarget:
+    """
+    Runs operations against a relayer over HTTP, one connection per request.
+
+    Owners encrypt and generate kfrags before a request is sent, so only the
+    relayer's work and the round trip are timed. Consume responses are checked
+    for success but not decrypted, which would make the client the bottleneck.
+
+    Args:
+        participants (Participants): The simulated owners and consumers.
+        host (str): Host of the relayer.
+        port (int): TCP port of the relayer.
+        unix_path (Optional[str]): Unix socket of the relayer, used instead of
+            host and port.
+    """
+
+    def __init__(
+        self,
+        participants: Participants,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        unix_path: Optional[str] = None
+    ):
+        self.participants = participants
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self._kfrags: Dict[Tuple[int, int], List[str]] = {}
+
+    async def _request(self, path: str,
+                       payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request, raising RuntimeError unless it succeeds."""
+        status, response = await relayer_request(
+            path, payload, self.host, self.port, self.unix_path)
+        if status != HTTPStatus.OK:
+            raise RuntimeError(f"{path} failed with status {status}: "
+                               f"{response.get('error')}")
+        return response
+
+    def _grant_payload(self, asset_id: str, owner: int,
+                       consumer: int) -> Dict[str, Any]:
+        """Build the grant request of owner for consumer on an asset."""
+        people = self.participants
+        threshold, shares = people.policies[owner, consumer]
+        consumer_key = people.consumer_public_keys[consumer]
+        kfrags = self._kfrags.get((owner, consumer))
+        if kfrags is None:
+            # Generated once per pair, as an owner reuses its policy for
+            # every asset
+            kfrags = self._kfrags[owner, consumer] = [
+                bytes(kfrag).hex() for kfrag in create_kfrags(
+                    people.owner_keys[owner], consumer_key,
+                    people.owner_signers[owner], threshold, shares)
+            ]
+        return {'assetId': asset_id,
+                'consumerPublicKey': bytes(consumer_key).hex(),
+                'threshold': threshold, 'kfrags': kfrags}
+
+    async def prepare_store(  # pylint: disable=unused-argument
+            self, owner: int, consumer: int, data: bytes) -> Any:
+        """Encrypt the plaintext to owner before the store is timed."""
+        ciphertext, capsule = encrypt_data(
+            data, self.participants.owner_public_keys[owner])
+        return ciphertext.hex(), bytes(capsule).hex()
+
+    async def store(self, asset_id: str, owner: int, consumer: int,
+                    prepared: Any) -> None:
+        """Send a store signed by owner, then grant the asset to consumer."""
+        ciphertext, capsule = prepared
+        people = self.participants
+        payload = {
+            'assetId': asset_id, 'accessUrl': _ACCESS_URL,
+            'capsule': capsule, 'ciphertext': ciphertext,
+            'ownerPublicKey': bytes(people.owner_public_keys[owner]).hex(),
+            'version': 1,
+        }
+        await self._request(
+            '/store', sign_store_request(payload, people.owner_signers[owner]))
+        await self._request(
+            '/grant', self._grant_payload(asset_id, owner, consumer))
+
+    async def consume(  # pylint: disable=unused-argument
+            self, asset_id: str, owner: int, consumer: int) -> None:
+        """Request the re-encrypted asset for consumer."""
+        consumer_key = self.participants.consumer_public_keys[consumer]
+        await self._request('/consume', {
+            'assetId': asset_id, 'consumerAddress': f"consumer_{consumer}",
+            'consumerPublicKey': bytes(consumer_key).hex(),
+        })
+
+    async def grant(self, asset_id: str, owner: int, consumer: int) -> None:
+        """Send the kfrags of owner for consumer on an asset."""
+        await self._request(
+            '/grant', self._grant_payload(asset_id, owner, consumer))
+
+    def close(self) -> None:
+        """Nothing to release, as every request has its own connection."""
+
+
+class _Stats:
+    """
+    Latencies and errors per operation, for the whole run and for the current
+    report interval.
+    """
+
+    def __init__(self):
+        self.total = {operation: LatencyHistogram()
+                      for operation in OPERATIONS}
+        self.interval = {operation: LatencyHistogram()
+                         for operation in OPERATIONS}
+        self.errors: Dict[str, Dict[str, int]] = {
+            operation: {} for operation in OPERATIONS
+        }
+        self.bytes = {operation: 0 for operation in OPERATIONS}
+
+    def record(self, operation: str, seconds: float, nbytes: int) -> None:
+        self.total[operation].observe(seconds)
+        self.interval[operation].observe(seconds)
+        self.bytes[operation] += nbytes
+
+    def error(self, operation: str, error: Exception) -> None:
+        errors = self.errors[operation]
+        name = type(error).__name__
+        errors[name] = errors.get(name, 0) + 1
+
+    def next_interval(self) -> Dict[str, LatencyHistogram]:
+        interval = self.interval
+        self.interval = {operation: LatencyHistogram()
+                         for operation in OPERATIONS}
+        return interval
+
+
+async def _drive(
+    target: Any,
+    participants: Participants,
+    mix: Sequence[Tuple[str, float]],
+    sizes: Sequence[Tuple[int, float]],
+    rng: random.Random,
+    concurrency: int,
+    duration: Optional[float],
+    operations: Optional[int],
+    initial_assets: int,
+    report_interval: Optional[float],
+    report: Optional[Reporter],
+    relayer_pid: Optional[int]
+) -> Dict[str, Any]:
+    """
+    Run the clients of run_load against a target.
+
+    The initial assets are stored untimed first. Then concurrency clients
+    each issue one operation after another until the duration has passed or
+    the operations have been issued, while report is called every
+    report_interval seconds.
+
+    Returns:
+        Dict[str, Any]: The results described in run_load.
+    """
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    size_values = [size for size, _ in sizes]
+    size_weights = [weight for _, weight in sizes]
+    owners = len(participants.owner_keys)
+    consumers = len(participants.consumer_keys)
+    # Each asset's owner and the consumers it was granted to
+    assets: List[Tuple[str, int, List[int]]] = []
+    stats = _Stats()
+    # Payloads are slices of one random pool, so generating data is not
+    # measured
+    pool = os.urandom(max(size_values))
+
+    async def store(timed: bool) -> None:
+        owner, consumer = rng.randrange(owners), rng.randrange(consumers)
+        size = rng.choices(size_values, size_weights)[0]
+        asset_id = f"asset-{len(assets) + 1}-{rng.getrandbits(32):08x}"
+        offset = rng.randrange(len(pool) - size + 1)
+        prepared = await target.prepare_store(
+            owner, consumer, pool[offset:offset + size])
+        start = time.perf_counter()
+        try:
+            await target.store(asset_id, owner, consumer, prepared)
+        except Exception as e:  # pylint: disable=broad-except
+            if not timed:
+                raise
+            stats.error('store', e)
+            return
+        if timed:
+            stats.record('store', time.perf_counter() - start, size)
+        assets.append((asset_id, owner, [consumer]))
+
+    for _ in range(initial_assets):
+        await store(False)
+
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+    issued = 0
+
+    def running() -> bool:
+        if operations is not None and issued >= operations:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    async def worker() -> None:
+        nonlocal issued
+        while running():
+            issued += 1
+            operation = rng.choices(names, weights)[0]
+            if operation == 'store' or not assets:
+                await store(True)
+                continue
+            asset_id, owner, granted = rng.choice(assets)
+            if operation == 'consume':
+                consumer = rng.choice(granted)
+            else:
+                consumer = rng.randrange(consumers)
+            start = time.perf_counter()
+            try:
+                await getattr(target, operation)(asset_id, owner, consumer)
+            except Exception as e:  # pylint: disable=broad-except
+                stats.error(operation, e)
+                continue
+            stats.record(operation, time.perf_counter() - start, 0)
+            if operation == 'grant' and consumer not in granted:
+                granted.append(consumer)
+
+    async def reporter() -> None:
+        last = started
+        while True:
+            await asyncio.sleep(report_interval)
+            now = time.perf_counter()
+            interval = {name: histogram.summary(now - last)
+                        for name, histogram in stats.next_interval().items()}
+            report(now - started, interval, memory_usage(relayer_pid)[0])
+            last = now
+
+    reporting = None
+    if report is not None and report_interval:
+        reporting = asyncio.ensure_future(reporter())
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if reporting is not None:
+            reporting.cancel()
+    elapsed = time.perf_counter() - started
+
+    overall = LatencyHistogram()
+    for histogram in stats.total.values():
+        for index, count in histogram.buckets.items():
+            overall.buckets[index] = overall.buckets.get(index, 0) + count
+        overall.count += histogram.count
+        overall.total += histogram.total
+        overall.max = max(overall.max, histogram.max)
+    results: Dict[str, Any] = {
+        'duration': elapsed, 'assets': len(assets), 'operations': {}
+    }
+    for operation in OPERATIONS:
+        summary = stats.total[operation].summary(elapsed)
+        summary['errors'] = stats.errors[operation]
+        summary['bytes'] = stats.bytes[operation]
+        results['operations'][operation] = summary
+    results['total'] = overall.summary(elapsed)
+    results['total']['errors'] = sum(
+        sum(errors.values()) for errors in stats.errors.values())
+    results['peak_memory'] = memory_usage()[1]
+    if relayer_pid is not None:
+        results['relayer_peak_memory'] = memory_usage(relayer_pid)[1]
+    return results
+
+
+def run_load(
+    owners: int = 4,
+    consumers: int = 16,
+    mix: Sequence[Tuple[str, float]] = (
+        ('consume', 90.0), ('store', 9.0), ('grant', 1.0)
+    ),
+    sizes: Sequence[Tuple[int, float]] = ((1024, 1.0),),
+    policies: Sequence[Tuple[int, int]] = ((1, 1),),
+    concurrency: int = 4,
+    duration: Optional[float] = DEFAULT_DURATION,
+    operations: Optional[int] = None,
+    initial_assets: int = 100,
+    storage: Optional[StorageBackend] = None,
+    relayer: Optional[Dict[str, Any]] = None,
+    relayer_pid: Optional[int] = None,
+    seed: Optional[int] = None,
+    report_interval: Optional[float] = None,
+    report: Optional[Reporter] = None
+) -> Dict[str, Any]:
+    """
+    Put a mixed store, consume and grant load on the library or on a relayer.
+
+    Every concurrent client runs one operation after another, picking the
+    operation from mix, the payload size from sizes and the owner and
+    consumer at random. Consumes read a random existing asset as one of its
+    granted consumers; grants give a random consumer access to a random
+    asset. The run stops after duration seconds or once operations have been
+    issued, whichever comes first.
+
+    Args:
+        owners (int): Number of simulated data owners.
+        consumers (int): Number of simulated data consumers.
+        mix (Sequence[Tuple[str, float]]): Operations (``store``,
+            ``consume``, ``grant``) and their weights.
+        sizes (Sequence[Tuple[int, float]]): Payload sizes in bytes and their
+            weights.
+        policies (Sequence[Tuple[int, int]]): Threshold and shares pairs
+            assigned to owner/consumer pairs.
+        concurrency (int): Number of concurrent clients.
+        duration (Optional[float]): Seconds to run for; None runs until
+            operations are issued.
+        operations (Optional[int]): Number of operations to issue; None runs
+            for duration.
+        initial_assets (int): Assets stored before measuring, so consumes
+            have data to read.
+        storage (Optional[StorageBackend]): Storage of the library target;
+            in-memory if omitted.
+        relayer (Optional[Dict[str, Any]]): ``host``, ``port`` or
+            ``unix_path`` of a relayer to load instead of the library.
+        relayer_pid (Optional[int]): Process ID of the relayer, to report its
+            memory.
+        seed (Optional[int]): Seed of the random choices, to replay the same
+            workload.
+        report_interval (Optional[float]): Seconds between progress reports.
+        report (Optional[Reporter]): Called every report_interval with the
+            elapsed seconds, the per-operation summary of the interval and
+            the current resident memory.
+
+    Returns:
+        Dict[str, Any]: Per-operation and ``total`` count, throughput, mean,
+        p50, p95, p99 and max latency in seconds and errors by type, plus
+        ``duration``, ``assets`` and ``peak_memory`` in bytes.
+    """
+    if duration is None and operations is None:
+        raise ValueError("A duration or a number of operations is required.")
+    if concurrency <= 0:
+        raise ValueError("Concurrency must be positive.")
+    unknown = {name for name, _ in mix} - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}.")
+
+    rng = random.Random(seed)
+    participants = Participants(owners, consumers, policies, rng)
+    if relayer is not None:
+        target: Any = RelayerTarget(participants, **relayer)
+    else:
+        if storage is None:
+            storage = InMemoryStorage()
+        target = LibraryTarget(storage, participants, concurrency)
+    try:
+        return asyncio.run(_drive(
+            target, participants, mix, sizes, rng, concurrency, duration,
+            operations, initial_assets, report_interval, report, relayer_pid))
+    finally:
+        target.close()
+
+
+def _format_memory(nbytes: Optional[int]) -> str:
+    if nbytes is None:
+        return "n/a"
+    return f"{nbytes / (1 << 20):.1f} MiB"
+
+
+def _print_interval(
+    elapsed: float,
+    interval: Dict[str, Dict[str, float]],
+    memory: Optional[int]
+) -> None:
+    line = f"[{elapsed:8.1f}s]"
+    for operation, summary in interval.items():
+        if summary['count']:
+            line += (f"  {operation} {summary['throughput']:8.1f}/s"
+                     f" p50 {summary['p50'] * 1e3:.2f} ms"
+                     f" p99 {summary['p99'] * 1e3:.2f} ms")
+    print(f"{line}  rss {_format_memory(memory)}", flush=True)
+
+
+def _print_results(results: Dict[str, Any]) -> None:
+    print(f"\n{'operation':<10} {'count':>9} {'ops/s':>10} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    rows = list(results['operations'].items())
+    rows.append(('total', results['total']))
+    for name, summary in rows:
+        errors = summary['errors']
+        if not isinstance(errors, int):
+            errors = sum(errors.values())
+        print(f"{name:<10} {summary['count']:>9} "
+              f"{summary['throughput']:>10.1f} "
+              f"{summary['p50'] * 1e3:>9.2f} {summary['p95'] * 1e3:>9.2f} "
+              f"{summary['p99'] * 1e3:>9.2f} {summary['max'] * 1e3:>9.2f} "
+              f"{errors:>7}")
+    print(f"\nDuration {results['duration']:.1f} s, "
+          f"{results['assets']} assets, "
+          f"peak memory {_format_memory(results['peak_memory'])}")
+    if 'relayer_peak_memory' in results:
+        memory = _format_memory(results['relayer_peak_memory'])
+        print(f"Relayer peak memory {memory}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Generate load on the library or a relayer.")
+    parser.add_argument('--owners', type=int, default=4,
+                        help="Number of simulated data owners.")
+    parser.add_argument('--consumers', type=int, default=16,
+                        help="Number of simulated data consumers.")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help="Weighted operations among store, consume and "
+                             f"grant (default: {DEFAULT_MIX}).")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help="Weighted payload sizes "
+                             f"(default: {DEFAULT_SIZES}).")
+    parser.add_argument('--policies', default=DEFAULT_POLICIES,
+                        help="Comma-separated threshold/shares pairs "
+                             f"(default: {DEFAULT_POLICIES}).")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Number of concurrent clients.")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help="Seconds to run for; use a long duration for "
+                             "soak runs.")
+    parser.add_argument('--operations', type=int,
+                        help="Stop after this many operations.")
+    parser.add_argument('--initial-assets', type=int, default=100,
+                        help="Assets stored before measuring.")
+    parser.add_argument('--seed', type=int,
+                        help="Seed to replay the same workload.")
+    parser.add_argument('--report-interval', type=float,
+                        default=DEFAULT_REPORT_INTERVAL,
+                        help="Seconds between progress lines; 0 disables "
+                             "them.")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument('--db',
+                         help="SQLite database file for the library target.")
+    storage.add_argument('--log',
+                         help="Write-ahead log directory for the library "
+                              "target.")
+    storage.add_argument('--relayer', metavar='HOST:PORT',
+                         help="Load a running relayer instead of the "
+                              "library.")
+    storage.add_argument('--relayer-unix', metavar='PATH',
+                         help="Load a relayer listening on a Unix socket.")
+    parser.add_argument('--relayer-pid', type=int,
+                        help="Process ID of the relayer, to report its "
+                             "memory.")
+    parser.add_argument('--output',
+                        help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    relayer = None
+    if args.relayer:
+        host, _, port = args.relayer.rpartition(':')
+        relayer = {'host': host or DEFAULT_HOST, 'port': int(port)}
+    elif args.relayer_unix:
+        relayer = {'unix_path': args.relayer_unix}
+    if args.db:
+        database: Optional[StorageBackend] = SQLiteStorage(args.db)
+    elif args.log:
+        database = LogStorage(args.log)
+    else:
+        database = None
+
+    print(f"{args.owners} owners, {args.consumers} consumers, "
+          f"mix {args.mix}, sizes {args.sizes}, policies {args.policies}, "
+          f"concurrency {args.concurrency}", flush=True)
+    sizes = parse_distribution(args.sizes, parse_size)
+    try:
+        results = run_load(
+            owners=args.owners,
+            consumers=args.consumers,
+            mix=parse_distribution(args.mix, str.strip),
+            sizes=sizes,
+            policies=[
+                parse_policy(policy) for policy in args.policies.split(',')
+            ],
+            concurrency=args.concurrency,
+            duration=args.duration if args.operations is None else None,
+            operations=args.operations,
+            initial_assets=args.initial_assets,
+            storage=database,
+            relayer=relayer,
+            relayer_pid=args.relayer_pid,
+            seed=args.seed,
+            report_interval=args.report_interval or None,
+            report=_print_interval,
+        )
+    finally:
+        if database is not None:
+            database.close()
+    _print_results(results)
+    if args.output:
+        results['parameters'] = {
+            key: value for key, value in vars(args).items()
+            if key not in ('output', 'db', 'log')
+        }
+        results['parameters']['sizes'] = [
+            (format_size(size), weight) for size, weight in sizes
+        ]
+        output = {'environment': describe_environment(), 'results': results}
+        Path(args.output).write_text(
+            json.dumps(output, indent=2, sort_keys=True) + "\n")
+    return 1 if results['total']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
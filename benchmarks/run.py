@@ -0,0 +1,329 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from umbral import SecretKey, Signer
+from src.did_document import create_did_document, encode_did_document, decode_did_document
+from src.encryption import encrypt_data, create_kfrags, reencrypt_data, decrypt_reencrypted_data
+from src.database import store_data, consume_data
+from src.storage import InMemoryStorage
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+DEFAULT_SIZES = '1K,64K,1M,16M'
+FULL_SIZES = '1K,64K,1M,16M,256M,1G'
+DEFAULT_POLICIES = '1/1,2/3,5/10'
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_RETRIES = 2
+
+_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+# Payloads at least this large are measured once; a single round already takes seconds
+_SINGLE_ROUND_SIZE = 256 << 20
+
+Case = Tuple[str, Callable[[], Any], int]
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a payload size such as ``'64K'`` or ``'1G'`` (binary units).
+
+    Args:
+        text (str): The size with an optional K, M or G suffix.
+
+    Returns:
+        int: The size in bytes.
+    """
+    text = text.strip().upper().rstrip('B')
+    unit = text[-1] if text and text[-1] in _UNITS else ''
+    return int(text[:len(text) - len(unit)]) * _UNITS[unit]
+
+
+def format_size(size: int) -> str:
+    for unit in ('G', 'M', 'K'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return str(size)
+
+
+def parse_policy(text: str) -> Tuple[int, int]:
+    """
+    Parse a ``threshold/shares`` pair such as ``'2/3'``.
+
+    Args:
+        text (str): The policy.
+
+    Returns:
+        Tuple[int, int]: The threshold and the number of shares.
+    """
+    threshold, shares = text.split('/')
+    return int(threshold), int(shares)
+
+
+def measure(func: Callable[[], Any], min_time: float = DEFAULT_MIN_TIME, min_rounds: int = 3) -> Dict[str, float]:
+    """
+    Time a function repeatedly until both min_rounds and min_time are reached.
+
+    Args:
+        func (Callable[[], Any]): The operation to time.
+        min_time (float): Minimum total seconds spent timing.
+        min_rounds (int): Minimum number of calls.
+
+    Returns:
+        Dict[str, float]: ``min``, ``median`` and ``mean`` seconds per call, and the number of ``rounds``.
+    """
+    timings: List[float] = []
+    total = 0.0
+    while len(timings) < min_rounds or total < min_time:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'rounds': len(timings),
+    }
+
+
+def benchmark_cases(sizes: Sequence[int], policies: Sequence[Tuple[int, int]]) -> Iterator[Case]:
+    """
+    Generate the benchmark cases, creating their inputs lazily.
+
+    Payload-dependent operations are swept over every size with the first policy,
+    and policy-dependent operations over every policy with the smallest size, so
+    each parameter is varied on its own.
+
+    Args:
+        sizes (Sequence[int]): Payload sizes in bytes.
+        policies (Sequence[Tuple[int, int]]): Threshold and shares pairs.
+
+    Returns:
+        Iterator[Tuple[str, Callable[[], Any], int]]: Name, operation and payload size of each case.
+    """
+    owner_key = SecretKey.random()
+    owner_public_key = owner_key.public_key()
+    owner_signer = Signer(owner_key)
+    consumer_key = SecretKey.random()
+    consumer_public_key = consumer_key.public_key()
+    access_url = "https://example.com/data"
+
+    sweep = [(size, policies[0]) for size in sizes]
+    sweep += [(min(sizes), policy) for policy in policies[1:]]
+
+    for size in sizes:
+        data = bytes(size)
+        yield f"encrypt_data[size={format_size(size)}]", lambda data=data: encrypt_data(data, owner_public_key), size
+        del data
+
+    for threshold, shares in policies:
+        label = f"policy={threshold}/{shares}"
+        yield (f"create_kfrags[{label}]",
+               lambda t=threshold, n=shares: create_kfrags(owner_key, consumer_public_key, owner_signer, t, n), 0)
+        _, capsule = encrypt_data(b"x", owner_public_key)
+        kfrags = create_kfrags(owner_key, consumer_public_key, owner_signer, threshold, shares)[:threshold]
+        # One consume re-encrypts the capsule with threshold kfrags
+        yield (f"reencrypt_data[{label}]",
+               lambda capsule=capsule, kfrags=kfrags: [reencrypt_data(capsule, kfrag) for kfrag in kfrags], 0)
+
+    for size, (threshold, shares) in sweep:
+        label = f"size={format_size(size)},policy={threshold}/{shares}"
+        ciphertext, capsule = encrypt_data(bytes(size), owner_public_key)
+        kfrags = create_kfrags(owner_key, consumer_public_key, owner_signer, threshold, shares)
+        cfrags = [reencrypt_data(capsule, kfrag) for kfrag in kfrags[:threshold]]
+        yield (f"decrypt_reencrypted_data[{label}]",
+               lambda c=capsule, f=cfrags, x=ciphertext: decrypt_reencrypted_data(
+                   consumer_key, owner_public_key, c, f, x), size)
+        del ciphertext
+
+    ciphertext, capsule = encrypt_data(b"x", owner_public_key)
+    kfrags = create_kfrags(owner_key, consumer_public_key, owner_signer, 2, 3)
+    yield ("create_did_document",
+           lambda: create_did_document("asset", access_url, owner_public_key, ciphertext, capsule, kfrags), 0)
+    grants = [(bytes(consumer_public_key), "0" * 64)]
+    document = encode_did_document("asset", access_url, owner_public_key, capsule, grants)
+    yield ("encode_did_document",
+           lambda: encode_did_document("asset", access_url, owner_public_key, capsule, grants), 0)
+    yield "decode_did_document", lambda: decode_did_document(document), 0
+
+    for size, (threshold, shares) in sweep:
+        label = f"size={format_size(size)},policy={threshold}/{shares}"
+        storage = InMemoryStorage()
+        data = bytes(size)
+
+        def store(storage=storage, data=data, t=threshold, n=shares):
+            store_data(storage, "asset", data, access_url, owner_key, owner_signer, consumer_public_key, t, n)
+
+        # The policy's kfrags already exist after the first store, as in steady state
+        store()
+        yield f"store_data[{label}]", store, size
+        del data
+        yield (f"consume_data[{label}]",
+               lambda storage=storage: consume_data(storage, "asset", "consumer_address", consumer_key,
+                                                    owner_public_key, consumer_public_key), size)
+
+
+def run_benchmarks(
+    sizes: Sequence[int],
+    policies: Sequence[Tuple[int, int]],
+    min_time: float = DEFAULT_MIN_TIME,
+    report: Optional[Callable[[str, Dict[str, float]], None]] = None,
+    only: Optional[Set[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Run the benchmark cases.
+
+    Args:
+        sizes (Sequence[int]): Payload sizes in bytes.
+        policies (Sequence[Tuple[int, int]]): Threshold and shares pairs.
+        min_time (float): Minimum seconds spent timing each case.
+        report (Optional[Callable[[str, Dict[str, float]], None]]): Called with each result as it completes.
+        only (Optional[Set[str]]): Names of the cases to run. All cases are run if omitted.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Timings per case, plus ``bytes`` and ``throughput`` in
+        bytes per second for payload-dependent cases.
+    """
+    results = {}
+    for name, func, size in benchmark_cases(sizes, policies):
+        if only is not None and name not in only:
+            continue
+        result = measure(func, min_time, 1 if size >= _SINGLE_ROUND_SIZE else 3)
+        if size:
+            result['bytes'] = size
+            result['throughput'] = size / result['min']
+        results[name] = result
+        if report is not None:
+            report(name, result)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = DEFAULT_TOLERANCE
+) -> Dict[str, float]:
+    """
+    Find cases that got slower than the baseline by more than the tolerance.
+
+    The fastest round is compared, as it is the least affected by scheduling noise.
+    Cases missing from either side are ignored.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Current timings.
+        baseline (Dict[str, Dict[str, float]]): Baseline timings.
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        Dict[str, float]: Ratio of current to baseline time for each regressed case.
+    """
+    regressions = {}
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result['min'] / reference['min']
+        if ratio > 1 + tolerance:
+            regressions[name] = ratio
+    return regressions
+
+
+def describe_environment() -> Dict[str, str]:
+    """Describe the interpreter and machine the results were measured on."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def _print_result(name: str, result: Dict[str, float]) -> None:
+    line = f"{name:<60} {result['min'] * 1e3:>12.3f} ms  ({result['rounds']} rounds)"
+    if 'throughput' in result:
+        line += f"  {result['throughput'] / (1 << 20):>10.1f} MiB/s"
+    print(line, flush=True)
+
+
+def _write_json(path: Path, environment: Dict[str, str], results: Dict[str, Dict[str, float]]) -> None:
+    path.write_text(json.dumps({'environment': environment, 'results': results}, indent=2, sort_keys=True) + "\n")
+
+
+def _check_baseline(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    environment: Dict[str, str],
+    sizes: Sequence[int],
+    policies: Sequence[Tuple[int, int]],
+    args: argparse.Namespace
+) -> Dict[str, float]:
+    """Compare with the baseline, measuring regressed cases again; results are updated in place."""
+    if baseline['environment'].get('platform') != environment['platform']:
+        print("Warning: the baseline was recorded on a different platform; timings may not be comparable.")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for _ in range(args.retries):
+        if not regressions:
+            break
+        # Shared machines have bursts of noise; only a slowdown that persists counts
+        print(f"Measuring {len(regressions)} slower case(s) again...")
+        rerun = run_benchmarks(sizes, policies, args.min_time, _print_result, set(regressions))
+        for name, result in rerun.items():
+            if result['min'] < results[name]['min']:
+                results[name] = result
+        regressions = compare(results, baseline['results'], args.tolerance)
+
+    for name, ratio in regressions.items():
+        print(f"REGRESSION {name}: {results[name]['min'] * 1e3:.3f} ms vs baseline "
+              f"{baseline['results'][name]['min'] * 1e3:.3f} ms (+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the crypto and storage paths.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"Comma-separated payload sizes (default: {DEFAULT_SIZES}).")
+    parser.add_argument('--full', action='store_true',
+                        help=f"Sweep payloads up to 1 GiB ({FULL_SIZES}); needs several GiB of memory.")
+    parser.add_argument('--policies', default=DEFAULT_POLICIES,
+                        help=f"Comma-separated threshold/shares pairs (default: {DEFAULT_POLICIES}).")
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help="Minimum seconds spent timing each case.")
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="Baseline JSON file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown before failing (default: 0.25).")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help="Times a regressed case is measured again before it fails the run.")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Merge the results into the baseline instead of comparing.")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in (FULL_SIZES if args.full else args.sizes).split(',')]
+    policies = [parse_policy(policy) for policy in args.policies.split(',')]
+    results = run_benchmarks(sizes, policies, args.min_time, _print_result)
+    regressions: Dict[str, float] = {}
+    environment = describe_environment()
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    if args.update_baseline:
+        merged = dict(baseline['results']) if baseline else {}
+        merged.update(results)
+        _write_json(baseline_path, environment, merged)
+        print(f"Baseline written to {baseline_path}")
+    elif baseline is None:
+        print(f"No baseline at {baseline_path}; run with --update-baseline to record one.")
+    else:
+        regressions = _check_baseline(results, baseline, environment, sizes, policies, args)
+    if args.output:
+        _write_json(Path(args.output), environment, results)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
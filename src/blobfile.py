@@ -0,0 +1,119 @@
+import hashlib
+import mmap
+import os
+import threading
+from typing import NamedTuple, Optional
+
+# Ciphertexts smaller than this stay in the storage backend, where a lookup is
+# cheaper than a page-aligned mapping
+DEFAULT_MIN_SIZE = 64 * 1024
+
+
+class BlobExtent(NamedTuple):
+    """Location of a blob in a BlobFile and the SHA-256 digest of its contents."""
+    offset: int
+    length: int
+    digest: bytes
+
+
+class BlobFile:
+    """
+    Append-only file of ciphertexts, read through a shared memory map.
+
+    Reads return memoryview slices of the mapping, so serving a blob does not copy
+    it onto the Python heap: the pages are read in and evicted by the OS page cache,
+    and resident memory does not grow with the size of the stored data.
+
+    Appended data is never moved or overwritten, so a blob stays valid at its
+    offset for the lifetime of the file. Space of replaced or deleted blobs is not
+    reclaimed. Only one process may append to a file at a time.
+
+    Args:
+        path (str): Path of the blob file; created if it does not exist.
+        min_size (int): Smallest ciphertext, in bytes, the database module stores
+            in this file rather than in the storage backend.
+        sync (bool): Whether to fsync after each append, so acknowledged blobs survive
+            a power failure and not only a process crash.
+    """
+
+    def __init__(self, path: str, min_size: int = DEFAULT_MIN_SIZE, sync: bool = False):
+        self.path = path
+        self.min_size = min_size
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def size(self) -> int:
+        """Number of bytes appended to the file so far."""
+        return self._size
+
+    def append(self, data: bytes) -> BlobExtent:
+        """
+        Append a blob to the file.
+
+        Args:
+            data (bytes): The blob contents.
+
+        Returns:
+            BlobExtent: The offset, length and digest to read the blob back with.
+        """
+        digest = hashlib.sha256(data).digest()
+        with self._lock:
+            offset = self._size
+            self._file.write(data)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._size += len(data)
+        return BlobExtent(offset, len(data), digest)
+
+    def read(self, extent: BlobExtent, verify: bool = True) -> memoryview:
+        """
+        Read a blob without copying it.
+
+        Args:
+            extent (BlobExtent): The location returned by append.
+            verify (bool): Whether to check the contents against the stored digest.
+
+        Returns:
+            memoryview: Read-only view of the blob in the memory map.
+
+        Raises:
+            ValueError: If the extent lies outside the file or the contents do not
+                match the digest.
+        """
+        offset, length, digest = extent
+        if offset < 0 or length < 0 or offset + length > self._size:
+            raise ValueError("Blob extent lies outside the blob file.")
+        if length == 0:
+            return memoryview(b'')
+        view = memoryview(self._mapping(offset + length))[offset:offset + length]
+        if verify and hashlib.sha256(view).digest() != digest:
+            raise ValueError("Blob contents do not match their digest.")
+        return view
+
+    def _mapping(self, end: int) -> mmap.mmap:
+        """Return a mapping covering the first end bytes, remapping after appends."""
+        current = self._map
+        if current is not None and len(current) >= end:
+            return current
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                # A superseded mapping is unmapped once the last view into it is released
+                self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+            return self._map
+
+    def close(self) -> None:
+        """Close the file. Views returned by read must no longer be used."""
+        with self._lock:
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    # Still exported; the mapping is released with its last view
+                    pass
+            self._map = None
+            self._file.close()
@@ -0,0 +1,185 @@
+import hashlib
+import hmac
+import struct
+import threading
+from typing import Dict, Any, Optional, Tuple, Union
+from umbral import SecretKey
+from .storage import StorageBackend, get_storage
+
+BLOB_COLLECTION = 'blobs'
+BLOB_REF_COLLECTION = 'blob_refs'
+
+# Reference entry layout: the reference count and the length of the compression
+# codec name, followed by the codec name and the serialized capsule
+_REF_HEADER = struct.Struct('>IB')
+_DEDUP_KEY_CONTEXT = b'data-proxy/dedup/v1'
+
+# Serializes reference count updates within this process
+_blob_lock = threading.Lock()
+
+
+def content_digest(owner_key: SecretKey, data: bytes) -> bytes:
+    """
+    Derive the content address of a payload.
+
+    The digest is an HMAC keyed with a secret derived from the owner's key, so
+    identical payloads only collide within one owner's assets and the stored
+    addresses reveal nothing about the plaintext to anyone without that key.
+    Sharing across owners would not be possible anyway, as the ciphertext is
+    encrypted under the owner's public key.
+
+    Args:
+        owner_key (SecretKey): The secret key of the data owner.
+        data (bytes): The plaintext payload.
+
+    Returns:
+        bytes: The 32-byte content digest.
+    """
+    secret = owner_key.to_secret_bytes()
+    key = hashlib.sha256(_DEDUP_KEY_CONTEXT + secret).digest()
+    return hmac.new(key, data, hashlib.sha256).digest()
+
+
+def _read_ref(
+    storage: StorageBackend,
+    digest: bytes
+) -> Optional[Tuple[int, bytes, str]]:
+    entry = storage.get(BLOB_REF_COLLECTION, digest.hex())
+    if entry is None:
+        return None
+    refcount, length = _REF_HEADER.unpack_from(entry)
+    start = _REF_HEADER.size
+    compression = str(entry[start:start + length], 'utf-8')
+    return refcount, bytes(entry[start + length:]), compression
+
+
+def _write_ref(
+    storage: StorageBackend,
+    digest: bytes,
+    refcount: int,
+    capsule: bytes,
+    compression: str
+) -> None:
+    name = compression.encode()
+    header = _REF_HEADER.pack(refcount, len(name))
+    storage.put(BLOB_REF_COLLECTION, digest.hex(), header + name + capsule)
+
+
+def acquire_blob(
+    storage: StorageBackend,
+    digest: bytes
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Take a reference to a stored blob, if it exists.
+
+    Args:
+        storage (StorageBackend): The storage holding the blobs.
+        digest (bytes): The blob's content digest.
+
+    Returns:
+        Optional[Tuple[bytes, str]]: The serialized capsule of the blob's
+        ciphertext and the codec its payload was compressed with, or None if
+        no blob is stored under the digest.
+    """
+    with _blob_lock:
+        ref = _read_ref(storage, digest)
+        if ref is None:
+            return None
+        refcount, capsule, compression = ref
+        _write_ref(storage, digest, refcount + 1, capsule, compression)
+        return capsule, compression
+
+
+def put_blob(
+    storage: StorageBackend,
+    digest: bytes,
+    ciphertext: bytes,
+    capsule: bytes,
+    compression: str = ''
+) -> Tuple[bytes, str]:
+    """
+    Store a blob and take a reference to it.
+
+    If another writer stored the same content first, its blob is referenced
+    instead and the given ciphertext is discarded.
+
+    Args:
+        storage (StorageBackend): The storage holding the blobs.
+        digest (bytes): The blob's content digest.
+        ciphertext (bytes): The encrypted payload.
+        capsule (bytes): The serialized capsule of the ciphertext.
+        compression (str): Codec the payload was compressed with before
+            encryption.
+
+    Returns:
+        Tuple[bytes, str]: The serialized capsule and compression codec of the
+        referenced blob.
+    """
+    with _blob_lock:
+        ref = _read_ref(storage, digest)
+        if ref is not None:
+            refcount, capsule, compression = ref
+            _write_ref(storage, digest, refcount + 1, capsule, compression)
+            return capsule, compression
+        # The ciphertext goes first so a reference never points to missing data
+        storage.put(BLOB_COLLECTION, digest.hex(), ciphertext)
+        _write_ref(storage, digest, 1, capsule, compression)
+        return capsule, compression
+
+
+def release_blob(storage: StorageBackend, digest: bytes) -> bool:
+    """
+    Drop a reference to a blob, deleting the blob with its last reference.
+
+    Args:
+        storage (StorageBackend): The storage holding the blobs.
+        digest (bytes): The blob's content digest.
+
+    Returns:
+        bool: True if the blob was deleted.
+    """
+    with _blob_lock:
+        ref = _read_ref(storage, digest)
+        if ref is None:
+            return False
+        refcount, capsule, compression = ref
+        if refcount > 1:
+            _write_ref(storage, digest, refcount - 1, capsule, compression)
+            return False
+        storage.delete(BLOB_REF_COLLECTION, digest.hex())
+        storage.delete(BLOB_COLLECTION, digest.hex())
+        return True
+
+
+def load_blob(storage: StorageBackend, digest: bytes) -> Optional[bytes]:
+    """
+    Read the ciphertext of a blob.
+
+    Args:
+        storage (StorageBackend): The storage holding the blobs.
+        digest (bytes): The blob's content digest.
+
+    Returns:
+        Optional[bytes]: The ciphertext, or None if no blob is stored under the
+        digest.
+    """
+    return storage.get(BLOB_COLLECTION, digest.hex())
+
+
+def blob_refcount(
+    database: Union[Dict[str, Any], StorageBackend],
+    digest: bytes
+) -> int:
+    """
+    Return the number of assets referencing a blob.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing
+            stored data.
+        digest (bytes): The blob's content digest.
+
+    Returns:
+        int: The reference count, 0 if no blob is stored under the digest.
+    """
+    ref = _read_ref(get_storage(database), digest)
+    return ref[0] if ref is not None else 0
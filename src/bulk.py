@@ -0,0 +1,314 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from umbral import SecretKey, PublicKey, Signer, Capsule, VerifiedKeyFrag
+from .encryption import encrypt_data, reencrypt_threshold, decrypt_reencrypted_data, decrypt_reencrypted_stream
+from .compression import compress_data, decompress_data, decompress_stream, CODEC_NONE
+from .database import (
+    store_encrypted_batch, load_asset_record, load_ciphertext, iter_stored_chunks, DataStorageError, DecryptionError
+)
+from .policy import Policy, get_or_create_policy, load_policy, PolicyNotFound
+from .token_validation import BurnVerifier
+from .storage import StorageBackend, get_storage
+
+DEFAULT_BATCH_SIZE = 256
+
+# Public key of the data owner and compression codec, set once per worker process by _init_worker
+_worker_public_key: Optional[PublicKey] = None
+_worker_compression: Optional[str] = None
+
+# Keys of the consumer and the data owner, set once per worker process by _init_consume_worker
+_worker_consumer_key: Optional[SecretKey] = None
+_worker_delegating_key: Optional[PublicKey] = None
+
+
+def _init_worker(owner_public_key: bytes, compression: Optional[str] = None) -> None:
+    global _worker_public_key, _worker_compression
+    _worker_public_key = PublicKey.from_bytes(owner_public_key)
+    _worker_compression = compression
+
+
+def _encrypt_in_worker(data: bytes) -> Tuple[bytes, bytes, str]:
+    """Compress and encrypt one payload in a worker process; umbral objects are returned serialized."""
+    if not data or not isinstance(data, bytes):
+        raise ValueError("Data is missing or empty.")
+    codec = ''
+    if _worker_compression:
+        selected, data = compress_data(data, _worker_compression)
+        codec = '' if selected.name == CODEC_NONE else selected.name
+    ciphertext, capsule = encrypt_data(data, _worker_public_key)
+    return ciphertext, bytes(capsule), codec
+
+
+def _batches(items: Iterable[Tuple[str, bytes, str]], size: int) -> Iterable[List[Tuple[str, bytes, str]]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def store_many(
+    database: Union[Dict[str, Any], StorageBackend],
+    assets: Iterable[Tuple[str, bytes, str]],
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1,
+    workers: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compression: Optional[str] = None,
+) -> Dict[str, Exception]:
+    """
+    Stores many data assets, encrypting them in parallel on a process pool.
+
+    The owner/consumer policy is resolved once for the whole ingest, so kfrags are
+    generated at most once. Assets are read, encrypted and written in batches of
+    batch_size, with at most two batches held in memory at a time. A failing asset
+    is reported and does not abort the remaining assets.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the data.
+        assets (Iterable[Tuple[str, bytes, str]]): Tuples of asset ID, data and access URL.
+        owner_key (SecretKey): The secret key of the data owner for encryption.
+        owner_signer (Signer): The signer object used for signing the kfrags.
+        consumer_key (PublicKey): The public key of the intended data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags to generate.
+        workers (Optional[int]): Number of worker processes. None uses one per CPU;
+            0 encrypts in the calling process.
+        batch_size (int): Number of assets encrypted and written per batch.
+        compression (Optional[str]): Codec compressing each payload before encryption, or
+            ``auto`` to choose per payload. None stores the payloads as they are.
+
+    Returns:
+        Dict[str, Exception]: The error raised for each asset that could not be stored,
+        keyed by asset ID. Empty if every asset was stored.
+
+    Raises:
+        DataStorageError: If the policy for the owner/consumer pair cannot be created.
+    """
+    if batch_size <= 0:
+        raise ValueError("Batch size must be positive.")
+
+    storage = get_storage(database)
+    owner_public_key = owner_key.public_key()
+    try:
+        policy_id = get_or_create_policy(storage, owner_key, owner_signer, consumer_key, threshold, shares)
+    except ValueError as e:
+        raise DataStorageError(f"Failed to store data: {str(e)}") from e
+    grants = [(bytes(consumer_key), policy_id)]
+
+    executor: Optional[Executor] = None
+    if workers != 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(bytes(owner_public_key), compression))
+    else:
+        _init_worker(bytes(owner_public_key), compression)
+
+    def submit(batch: List[Tuple[str, bytes, str]]) -> List[Tuple[Tuple[str, bytes, str], Any]]:
+        if executor is None:
+            return [(asset, None) for asset in batch]
+        return [(asset, executor.submit(_encrypt_in_worker, asset[1])) for asset in batch]
+
+    failures: Dict[str, Exception] = {}
+    try:
+        # Keep at most two batches in flight: the next one is encrypting while
+        # the current one is written to storage.
+        batches = _batches(assets, batch_size)
+        current = submit(next(batches, []))
+        while current:
+            upcoming = submit(next(batches, []))
+            encrypted = []
+            for (asset_id, data, access_url), future in current:
+                try:
+                    ciphertext, capsule, codec = future.result() if future is not None else _encrypt_in_worker(data)
+                    encrypted.append((asset_id, ciphertext, Capsule.from_bytes(capsule), access_url, codec))
+                except Exception as e:  # pylint: disable=broad-except
+                    failures[asset_id] = e
+            try:
+                failures.update(store_encrypted_batch(storage, encrypted, owner_public_key, grants))
+            except Exception as e:  # pylint: disable=broad-except
+                failures.update((asset[0], e) for asset in encrypted)
+            current = upcoming
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return failures
+
+
+class ConsumeResult(NamedTuple):
+    """Outcome of consuming one asset with consume_many; error is set instead of data on failure."""
+    asset_id: str
+    data: Optional[bytes]
+    access_url: Optional[str]
+    error: Optional[Exception]
+
+
+# Serialized capsule, kfrags, threshold, ciphertext (or its chunks) and compression codec of one asset
+_ConsumeJob = Tuple[bytes, List[bytes], int, Union[bytes, memoryview, List[bytes]], str]
+
+
+def _init_consume_worker(consumer_secret_key: bytes, delegating_public_key: bytes) -> None:
+    global _worker_consumer_key, _worker_delegating_key
+    _worker_consumer_key = SecretKey.from_bytes(consumer_secret_key)
+    _worker_delegating_key = PublicKey.from_bytes(delegating_public_key)
+
+
+def _consume_in_worker(job: _ConsumeJob) -> bytes:
+    """Re-encrypt, decrypt and decompress one asset in a worker process."""
+    capsule_bytes, kfrags, threshold, ciphertext, compression = job
+    try:
+        capsule = Capsule.from_bytes(capsule_bytes)
+        cfrags = reencrypt_threshold(capsule, [VerifiedKeyFrag.from_verified_bytes(kfrag) for kfrag in kfrags],
+                                     threshold)
+        if isinstance(ciphertext, list):
+            plaintext_chunks = decrypt_reencrypted_stream(_worker_consumer_key, _worker_delegating_key,
+                                                          capsule, cfrags, ciphertext)
+            if compression:
+                plaintext_chunks = decompress_stream(plaintext_chunks, compression)
+            return b"".join(plaintext_chunks)
+        data = decrypt_reencrypted_data(_worker_consumer_key, _worker_delegating_key, capsule, cfrags, ciphertext)
+        return decompress_data(data, compression) if compression else data
+    except (ValueError, TypeError) as e:
+        raise DecryptionError(f"Error occurred during decryption: {str(e)}") from e
+
+
+def _prepare_consume(
+    storage: StorageBackend,
+    asset_id: str,
+    receiving_public_key: PublicKey,
+    policies: Dict[str, Policy],
+    copy: bool
+) -> Tuple[_ConsumeJob, str]:
+    """Read everything a worker needs to consume one asset; policies caches the loaded policies by ID."""
+    record = load_asset_record(storage, asset_id)
+    policy_id = record.policy_for(receiving_public_key)
+    if policy_id is None:
+        raise PermissionError("Consumer does not have permission to access the data.")
+    policy = policies.get(policy_id)
+    if policy is None:
+        try:
+            policy = policies[policy_id] = load_policy(storage, policy_id)
+        except PolicyNotFound as e:
+            raise PermissionError("Consumer does not have permission to access the data.") from e
+
+    if record.chunks:
+        ciphertext = list(iter_stored_chunks(storage, record))
+    else:
+        ciphertext = load_ciphertext(storage, record)
+        if copy and isinstance(ciphertext, memoryview):
+            # Views of the blob file cannot be sent to another process
+            ciphertext = bytes(ciphertext)
+    return (record.capsule, policy.kfrags, policy.threshold, ciphertext, record.compression), record.access_url
+
+
+def consume_many(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_ids: Iterable[str],
+    consumer_address: str,
+    consumer_secret_key: SecretKey,
+    delegating_public_key: PublicKey,
+    workers: Optional[int] = None,
+    max_in_flight: int = DEFAULT_BATCH_SIZE,
+    burn_verifier: Optional[BurnVerifier] = None
+) -> Iterator[ConsumeResult]:
+    """
+    Consumes many data assets for one consumer, re-encrypting and decrypting them in parallel on a process pool.
+
+    Assets are read from storage in the calling process and handed to the workers,
+    which re-encrypt the capsule with the consumer's kfrags, decrypt the data and
+    decompress it. Results are yielded as they complete, so they may arrive out of
+    order. At most max_in_flight assets are submitted and not yet yielded at a time,
+    and no new asset is read while the caller is not consuming results, which bounds
+    memory to max_in_flight payloads.
+
+    A failing asset is reported in its result and does not abort the remaining assets.
+    The consumer's secret key is sent to the worker processes once, when they start.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_ids (Iterable[str]): Identifiers of the data assets, read lazily.
+        consumer_address (str): Address of the consumer.
+        consumer_secret_key (SecretKey): Secret key of the consumer.
+        delegating_public_key (PublicKey): Public key of the data owner.
+        workers (Optional[int]): Number of worker processes. None uses one per CPU;
+            0 consumes the assets one by one in the calling process.
+        max_in_flight (int): Maximum number of assets being processed at a time.
+        burn_verifier (Optional[BurnVerifier]): Verifier checking, once for the whole batch,
+            that the consumer address has burned the required tokens.
+
+    Returns:
+        Iterator[ConsumeResult]: The decrypted data and access link of each asset, or
+        the DataStorageError, PermissionError or DecryptionError it failed with.
+
+    Raises:
+        InsufficientTokenBurn: If burn_verifier is given and the consumer's token burn
+            is missing or insufficient, when the first result is requested.
+    """
+    if max_in_flight <= 0:
+        raise ValueError("Maximum number of assets in flight must be positive.")
+
+    storage = get_storage(database)
+    receiving_public_key = consumer_secret_key.public_key()
+    initargs = (consumer_secret_key.to_secret_bytes(), bytes(delegating_public_key))
+    return _consume_many(storage, iter(asset_ids), consumer_address, receiving_public_key, initargs,
+                         workers, max_in_flight, burn_verifier)
+
+
+def _consume_many(
+    storage: StorageBackend,
+    asset_ids: Iterator[str],
+    consumer_address: str,
+    receiving_public_key: PublicKey,
+    initargs: Tuple[bytes, bytes],
+    workers: Optional[int],
+    max_in_flight: int,
+    burn_verifier: Optional[BurnVerifier]
+) -> Iterator[ConsumeResult]:
+    if burn_verifier is not None:
+        burn_verifier.require(consumer_address, receiving_public_key)
+
+    policies: Dict[str, Policy] = {}
+    if workers == 0:
+        _init_consume_worker(*initargs)
+        for asset_id in asset_ids:
+            try:
+                job, access_url = _prepare_consume(storage, asset_id, receiving_public_key, policies, False)
+                result = ConsumeResult(asset_id, _consume_in_worker(job), access_url, None)
+            except (DataStorageError, PermissionError, DecryptionError, ValueError) as e:
+                result = ConsumeResult(asset_id, None, None, e)
+            yield result
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_consume_worker, initargs=initargs)
+    pending: Dict[Future, Tuple[str, str]] = {}
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                asset_id = next(asset_ids, None)
+                if asset_id is None:
+                    exhausted = True
+                    break
+                try:
+                    job, access_url = _prepare_consume(storage, asset_id, receiving_public_key, policies, True)
+                except (DataStorageError, PermissionError, ValueError) as e:
+                    yield ConsumeResult(asset_id, None, None, e)
+                    continue
+                pending[executor.submit(_consume_in_worker, job)] = (asset_id, access_url)
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                asset_id, access_url = pending.pop(future)
+                try:
+                    result = ConsumeResult(asset_id, future.result(), access_url, None)
+                except Exception as e:  # pylint: disable=broad-except
+                    result = ConsumeResult(asset_id, None, None, e)
+                yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+# Value, expiry time (None for never) and group of a cache entry
+_Entry = Tuple[Any, Optional[float], Optional[Hashable]]
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with optional expiry.
+
+    Entries can be tagged with a group (e.g. an asset ID) so that all entries
+    derived from the same record can be invalidated together.
+
+    Args:
+        maxsize (int): Maximum number of entries kept in the cache.
+        ttl (Optional[float]): Seconds after which an entry expires. None keeps
+            entries until they are evicted or invalidated; zero or less
+            disables caching, so every lookup misses.
+        clock (Callable[[], float]): Monotonic time source, replaceable in
+            tests.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value and mark it as recently used.
+
+        Args:
+            key (Hashable): Key of the entry.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss or if the entry
+            expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires, _ = entry
+            if expires is not None and expires <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any,
+            group: Optional[Hashable] = None) -> None:
+        """
+        Insert or replace a cached value, evicting the least recently used
+        entry if full.
+
+        Args:
+            key (Hashable): Key of the entry.
+            value (Any): Value to cache.
+            group (Optional[Hashable]): Group the entry belongs to, for
+                invalidate_group.
+        """
+        if self.ttl is not None and self.ttl <= 0:
+            return
+        expires = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove a single entry, if present.
+
+        Args:
+            key (Hashable): Key of the entry.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_group(self, group: Hashable) -> None:
+        """
+        Remove every entry of a group.
+
+        Args:
+            group (Hashable): The group to invalidate.
+        """
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all entries. Hit and miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: Number of ``hits``, ``misses`` and current
+            ``size``.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries)}
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, group = self._entries.pop(key)
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
@@ -0,0 +1,295 @@
+import lzma
+import zlib
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+CODEC_NONE = 'none'
+CODEC_ZLIB = 'zlib'
+CODEC_LZMA = 'lzma'
+CODEC_ZSTD = 'zstd'
+CODEC_LZ4 = 'lz4'
+CODEC_AUTO = 'auto'
+
+# Payloads smaller than this are never worth the codec framing
+MIN_COMPRESS_SIZE = 256
+# Adaptive selection compresses at most this much of the payload to estimate its ratio
+SAMPLE_SIZE = 64 * 1024
+# Payloads whose sample does not shrink below this fraction are stored uncompressed
+MAX_RATIO = 0.9
+
+
+class CompressionError(ValueError):
+    """Exception raised when a payload cannot be compressed or decompressed."""
+    pass
+
+
+class Codec:
+    """
+    A compression codec with one-shot and incremental interfaces.
+
+    Args:
+        name (str): Name recorded in DID documents.
+        compress (Callable[[bytes], bytes]): One-shot compression.
+        decompress (Callable[[bytes], bytes]): One-shot decompression.
+        compressor (Callable[[], Any]): Factory of incremental compressors with
+            ``compress(data)`` and ``flush()`` methods.
+        decompressor (Callable[[], Any]): Factory of incremental decompressors with a
+            ``decompress(data)`` method.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compress: Callable[[bytes], bytes],
+        decompress: Callable[[bytes], bytes],
+        compressor: Callable[[], Any],
+        decompressor: Callable[[], Any]
+    ):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        self.compressor = compressor
+        self.decompressor = decompressor
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r})"
+
+
+class _Identity:
+    """Incremental pass-through used by the ``none`` codec."""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b''
+
+
+class _LZ4Compressor:
+    """Adapts LZ4FrameCompressor, which needs an explicit frame header, to compress/flush."""
+
+    def __init__(self):
+        self._compressor = lz4_frame.LZ4FrameCompressor()
+        self._started = False
+
+    def compress(self, data: bytes) -> bytes:
+        header = b''
+        if not self._started:
+            header = self._compressor.begin()
+            self._started = True
+        return header + self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        header = b'' if self._started else self._compressor.begin()
+        self._started = True
+        return header + self._compressor.flush()
+
+
+_CODECS: Dict[str, Codec] = {
+    CODEC_NONE: Codec(CODEC_NONE, bytes, bytes, _Identity, _Identity),
+    CODEC_ZLIB: Codec(CODEC_ZLIB, zlib.compress, zlib.decompress, zlib.compressobj, zlib.decompressobj),
+    CODEC_LZMA: Codec(CODEC_LZMA, lzma.compress, lzma.decompress, lzma.LZMACompressor, lzma.LZMADecompressor),
+}
+if zstandard is not None:
+    _CODECS[CODEC_ZSTD] = Codec(
+        CODEC_ZSTD,
+        lambda data: zstandard.ZstdCompressor().compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+        lambda: zstandard.ZstdCompressor().compressobj(),
+        lambda: zstandard.ZstdDecompressor().decompressobj(),
+    )
+if lz4_frame is not None:
+    _CODECS[CODEC_LZ4] = Codec(CODEC_LZ4, lz4_frame.compress, lz4_frame.decompress,
+                               _LZ4Compressor, lz4_frame.LZ4FrameDecompressor)
+
+
+def available_codecs() -> List[str]:
+    """
+    List the codecs usable in this environment.
+
+    Returns:
+        List[str]: Codec names. zstd and lz4 are only listed when installed.
+    """
+    return list(_CODECS)
+
+
+def get_codec(name: Optional[str]) -> Codec:
+    """
+    Look up a codec by name.
+
+    Args:
+        name (Optional[str]): The codec name; None or an empty string means no compression.
+
+    Returns:
+        Codec: The codec.
+
+    Raises:
+        CompressionError: If the codec is unknown or not installed.
+    """
+    codec = _CODECS.get(name or CODEC_NONE)
+    if codec is None:
+        raise CompressionError(f"Unsupported compression codec: {name}.")
+    return codec
+
+
+_DECOMPRESS_ERRORS: Tuple[type, ...] = (zlib.error, lzma.LZMAError, RuntimeError)
+if zstandard is not None:
+    _DECOMPRESS_ERRORS += (zstandard.ZstdError,)
+
+
+def _compressed_size(sample: bytes) -> int:
+    """Compress a sample with the cheapest available codec to estimate compressibility."""
+    for name in (CODEC_LZ4, CODEC_ZSTD):
+        if name in _CODECS:
+            return len(_CODECS[name].compress(sample))
+    return len(zlib.compress(sample, 1))
+
+
+def _default_codec() -> Codec:
+    """The codec chosen for compressible data: zstd when installed, zlib otherwise."""
+    return _CODECS.get(CODEC_ZSTD, _CODECS[CODEC_ZLIB])
+
+
+def select_codec(sample: bytes, preferred: str = CODEC_AUTO) -> Codec:
+    """
+    Choose the codec for a payload from a sample of it.
+
+    With ``auto``, small payloads and payloads whose sample does not compress with
+    the fastest available codec (already compressed or encrypted data) are stored
+    as they are, so incompressible data costs one sample compression at most.
+
+    Args:
+        sample (bytes): The start of the payload.
+        preferred (str): A codec name, or ``auto`` for adaptive selection.
+
+    Returns:
+        Codec: The codec to use.
+
+    Raises:
+        CompressionError: If the preferred codec is unknown or not installed.
+    """
+    if preferred != CODEC_AUTO:
+        return get_codec(preferred)
+    if len(sample) < MIN_COMPRESS_SIZE:
+        return _CODECS[CODEC_NONE]
+    sample = sample[:SAMPLE_SIZE]
+    if _compressed_size(sample) > len(sample) * MAX_RATIO:
+        return _CODECS[CODEC_NONE]
+    return _default_codec()
+
+
+def compress_data(data: bytes, codec: str = CODEC_AUTO) -> Tuple[Codec, bytes]:
+    """
+    Compress a payload before encryption.
+
+    Args:
+        data (bytes): The payload.
+        codec (str): A codec name, or ``auto`` for adaptive selection.
+
+    Returns:
+        Tuple[Codec, bytes]: The codec used and the compressed payload.
+
+    Raises:
+        CompressionError: If the codec is unknown or not installed.
+    """
+    selected = select_codec(data, codec)
+    return selected, selected.compress(data)
+
+
+def decompress_data(data: bytes, codec: Union[Codec, str, None]) -> bytes:
+    """
+    Decompress a decrypted payload.
+
+    Args:
+        data (bytes): The compressed payload.
+        codec (Union[Codec, str, None]): The codec, or its name as recorded in the DID document.
+
+    Returns:
+        bytes: The original payload.
+
+    Raises:
+        CompressionError: If the codec is unsupported or the payload is corrupt.
+    """
+    if not isinstance(codec, Codec):
+        codec = get_codec(codec)
+    try:
+        return codec.decompress(data)
+    except _DECOMPRESS_ERRORS as e:
+        raise CompressionError(f"Failed to decompress data: {str(e)}") from e
+
+
+def compress_stream(chunks: Iterable[bytes], codec: str = CODEC_AUTO) -> Tuple[Codec, Iterator[bytes]]:
+    """
+    Compress a stream of chunks incrementally.
+
+    With ``auto``, the codec is selected from the first chunk.
+
+    Args:
+        chunks (Iterable[bytes]): The payload, in order.
+        codec (str): A codec name, or ``auto`` for adaptive selection.
+
+    Returns:
+        Tuple[Codec, Iterator[bytes]]: The codec used and a lazy iterator over the
+        compressed stream. Empty pieces are skipped.
+
+    Raises:
+        CompressionError: If the codec is unknown or not installed.
+    """
+    iterator = iter(chunks)
+    first = next(iterator, b'')
+    selected = select_codec(first, codec)
+
+    def generate() -> Iterator[bytes]:
+        compressor = selected.compressor()
+        for chunk in chain([first], iterator):
+            piece = compressor.compress(chunk)
+            if piece:
+                yield piece
+        tail = compressor.flush()
+        if tail:
+            yield tail
+
+    return selected, generate()
+
+
+def decompress_stream(chunks: Iterable[bytes], codec: Union[Codec, str, None]) -> Iterator[bytes]:
+    """
+    Decompress a stream of chunks incrementally.
+
+    Args:
+        chunks (Iterable[bytes]): The compressed stream, in order.
+        codec (Union[Codec, str, None]): The codec, or its name as recorded in the DID document.
+
+    Returns:
+        Iterator[bytes]: A lazy iterator over the decompressed payload. Empty pieces are skipped.
+
+    Raises:
+        CompressionError: If the codec is unsupported or the stream is corrupt.
+    """
+    if not isinstance(codec, Codec):
+        codec = get_codec(codec)
+    decompressor = codec.decompressor()
+    try:
+        for chunk in chunks:
+            piece = decompressor.decompress(chunk)
+            if piece:
+                yield piece
+        flush = getattr(decompressor, 'flush', None)
+        tail = flush() if flush is not None else b''
+        if tail:
+            yield tail
+    except _DECOMPRESS_ERRORS as e:
+        raise CompressionError(f"Failed to decompress data: {str(e)}") from e
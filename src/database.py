@@ -1,8 +1,32 @@
-from typing import Dict, Any, Tuple
-from umbral import SecretKey, PublicKey, Signer, Capsule, VerifiedKeyFrag
-from .encryption import encrypt_data, create_kfrags, reencrypt_data, decrypt_reencrypted_data, deserialize_kfrag
-from .did_document import create_did_document
-from .token_validation import validate_token_burn
+import threading
+from concurrent.futures import Executor
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from umbral import SecretKey, PublicKey, Signer, Capsule, KeyFrag, VerifiedKeyFrag, VerifiedCapsuleFrag
+from umbral.errors import VerificationError
+from .encryption import (
+    encrypt_data, reencrypt_threshold, decrypt_reencrypted_data,
+    encrypt_stream, decrypt_reencrypted_stream, iter_chunks, DEFAULT_CHUNK_SIZE
+)
+from .compression import compress_data, compress_stream, decompress_data, decompress_stream, CODEC_NONE
+from .did_document import AssetRecord, encode_did_document, replace_grants
+from .blobfile import BlobExtent
+from .blobs import content_digest, acquire_blob, put_blob, release_blob, load_blob
+from .policy import (
+    Policy, get_or_create_policy, make_policy_id, store_policy, load_policy, PolicyNotFound, POLICY_COLLECTION,
+    REVOKED_COLLECTION, revoke_kfrags, revoke_policy, kfrags_revoked, revocations_for
+)
+from .token_validation import BurnVerifier
+from .cache import LRUCache
+from .metrics import timed
+from .indexes import INDEXES, index_changes, update_indexes
+from .storage import StorageBackend, get_storage
+
+ASSET_COLLECTION = 'collection'
+CIPHERTEXT_COLLECTION = 'ciphertexts'
+CHUNK_COLLECTION = 'chunks'
+
+# Serializes read-modify-write updates of asset records and their index entries within this process
+_grants_lock = threading.Lock()
 
 
 class DataStorageError(Exception):
@@ -15,26 +39,60 @@ class DecryptionError(Exception):
     pass
 
 
+class AssetTooLarge(DataStorageError):
+    """Exception raised when an asset's ciphertext exceeds the size a caller accepts."""
+    pass
+
+
+class AssetVersion(NamedTuple):
+    """Owner and version of a stored asset."""
+    owner: bytes
+    version: int
+
+
 def store_data(
-    database: Dict[str, Any],
+    database: Union[Dict[str, Any], StorageBackend],
     asset_id: str,
     data: bytes,
     access_url: str,
     owner_key: SecretKey,
     owner_signer: Signer,
     consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1,
+    deduplicate: bool = False,
+    compression: Optional[str] = None,
 ) -> None:
     """
-    Stores encrypted data along with its metadata in a simulated in-memory database.
+    Stores encrypted data along with its metadata in the given database.
+
+    Key fragments are generated once per owner/consumer policy and shared by all
+    assets stored for the same pair, threshold and shares. The consumer receives
+    the asset's first grant; use grant_access to share it with more consumers.
+
+    With deduplicate, the ciphertext is stored once per distinct payload of an
+    owner: assets with identical data reference the same reference-counted blob
+    and capsule, and the payload is only encrypted the first time it is seen.
+
+    With compression, the payload is compressed before encryption and the codec is
+    recorded in the DID document, so consume_data decompresses it transparently.
 
     Args:
-        database (Dict[str, Any]): The database to store the data.
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the data,
+            either a storage backend or an in-memory dictionary.
         asset_id (str): The unique identifier for the data asset.
         data (bytes): The data to be encrypted and stored.
         access_url (str): A URL or link where the data can be accessed.
         owner_key (SecretKey): The secret key of the data owner for encryption.
         owner_signer (Signer): The signer object used for signing the data.
         consumer_key (PublicKey): The public key of the intended data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags to generate.
+        deduplicate (bool): Whether to share the stored ciphertext with other assets
+            of the owner holding the same data.
+        compression (Optional[str]): Codec compressing the payload before encryption
+            (see compression.available_codecs), or ``auto`` to pick one and skip data
+            that does not compress. None stores the payload as it is.
 
     Raises:
         DataStorageError: If there is an error during the storage of data.
@@ -42,35 +100,592 @@ def store_data(
     if not (asset_id and data and access_url and owner_key and owner_signer and consumer_key):
         raise ValueError("All parameters are required")
 
+    storage = get_storage(database)
+    if deduplicate:
+        _store_deduplicated(storage, asset_id, data, access_url, owner_key, owner_signer, consumer_key,
+                            threshold, shares, compression)
+        return
+    with timed('store_data', len(data)):
+        try:
+            payload, codec = _compress(data, compression)
+            with timed('store.encrypt', len(payload)):
+                ciphertext, capsule = encrypt_data(payload, owner_key.public_key())
+            with timed('store.policy'):
+                policy_id = get_or_create_policy(storage, owner_key, owner_signer, consumer_key, threshold, shares)
+        except ValueError as e:
+            raise DataStorageError(f"Failed to store data: {str(e)}") from e
+
+        with timed('store.write', len(ciphertext)):
+            store_encrypted_data(storage, asset_id, ciphertext, capsule, access_url, owner_key.public_key(),
+                                 [(bytes(consumer_key), policy_id)], codec)
+
+
+def _compress(data: bytes, compression: Optional[str]) -> Tuple[bytes, str]:
+    """Compress a payload before encryption; returns it with the codec name to record."""
+    if not compression:
+        return data, ''
+    with timed('store.compress', len(data)):
+        codec, payload = compress_data(data, compression)
+    return payload, '' if codec.name == CODEC_NONE else codec.name
+
+
+def _store_deduplicated(
+    storage: StorageBackend,
+    asset_id: str,
+    data: bytes,
+    access_url: str,
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int,
+    shares: int,
+    compression: Optional[str],
+) -> None:
+    """Store an asset referencing the content-addressed blob of its data."""
+    with timed('store_data', len(data)):
+        digest = content_digest(owner_key, data)
+        with timed('store.dedup'):
+            blob = acquire_blob(storage, digest)
+        if blob is None:
+            try:
+                payload, codec = _compress(data, compression)
+                with timed('store.encrypt', len(payload)):
+                    ciphertext, capsule = encrypt_data(payload, owner_key.public_key())
+            except ValueError as e:
+                raise DataStorageError(f"Failed to store data: {str(e)}") from e
+            with timed('store.write', len(ciphertext)):
+                blob = put_blob(storage, digest, ciphertext, bytes(capsule), codec)
+        capsule_bytes, codec = blob
+
+        # The reference taken above is owned by the record from here on
+        try:
+            with timed('store.policy'):
+                policy_id = get_or_create_policy(storage, owner_key, owner_signer, consumer_key, threshold, shares)
+            previous_chunks = _stored_chunk_count(storage, asset_id)
+            document = encode_did_document(asset_id, access_url, owner_key.public_key(),
+                                           Capsule.from_bytes(capsule_bytes), [(bytes(consumer_key), policy_id)],
+                                           blob=digest, compression=codec)
+        except ValueError as e:
+            release_blob(storage, digest)
+            raise DataStorageError(f"Failed to store data: {str(e)}") from e
+
+        with timed('store.write'):
+            _replace_record(storage, asset_id, document)
+            _invalidate_asset(storage, asset_id)
+            storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+            _delete_chunks(storage, asset_id, 0, previous_chunks)
+
+
+def store_encrypted_data(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    ciphertext: bytes,
+    capsule: Capsule,
+    access_url: str,
+    owner_public_key: PublicKey,
+    grants: Optional[Iterable[Tuple[bytes, str]]],
+    compression: str = '',
+    version: int = 0,
+) -> None:
+    """
+    Stores data that was already encrypted under the owner's public key.
+
+    If the storage has a blob file, ciphertexts of at least its min_size are
+    appended to it and the DID record holds their offset, length and digest.
+    With grants None, a re-stored asset keeps the grants of its previous record
+    if it has the same owner.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the data.
+        asset_id (str): The unique identifier for the data asset.
+        ciphertext (bytes): The encrypted data.
+        capsule (Capsule): The capsule associated with the ciphertext.
+        access_url (str): A URL or link where the data can be accessed.
+        owner_public_key (PublicKey): The public key of the data owner.
+        grants (Optional[Iterable[Tuple[bytes, str]]]): Pairs of serialized consumer public
+            key and ID of the policy holding the consumer's kfrags, or None to keep the
+            grants of the previously stored record.
+        compression (str): Codec the payload was compressed with before encryption, if any.
+        version (int): Version of the asset set by its owner (see asset_version).
+
+    Raises:
+        DataStorageError: If there is an error during the storage of data.
+    """
+    storage = get_storage(database)
+    try:
+        previous_chunks = _stored_chunk_count(storage, asset_id)
+        document, extent = _encode_encrypted(storage, asset_id, ciphertext, capsule, access_url,
+                                             owner_public_key, grants or [], compression, version)
+    except ValueError as e:
+        raise DataStorageError(f"Failed to store data: {str(e)}") from e
+
+    if extent is None:
+        storage.put(CIPHERTEXT_COLLECTION, asset_id, ciphertext)
+    _replace_record(storage, asset_id, document, keep_grants=grants is None)
+    _invalidate_asset(storage, asset_id)
+    if extent is not None:
+        storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+    _delete_chunks(storage, asset_id, 0, previous_chunks)
+
+
+def _encode_encrypted(
+    storage: StorageBackend,
+    asset_id: str,
+    ciphertext: bytes,
+    capsule: Capsule,
+    access_url: str,
+    owner_public_key: PublicKey,
+    grants: Iterable[Tuple[bytes, str]],
+    compression: str,
+    version: int = 0,
+) -> Tuple[bytes, Optional[BlobExtent]]:
+    """Encode the record of an encrypted asset, appending its ciphertext to the blob file if it goes there."""
+    if not ciphertext or not isinstance(ciphertext, bytes):
+        raise ValueError("Invalid ciphertext.")
+    grants = list(grants)
+    # Encoded before anything is appended: space in the blob file is never reclaimed,
+    # so a record that fails validation must not leave its ciphertext behind
+    document = encode_did_document(asset_id, access_url, owner_public_key, capsule, grants,
+                                   compression=compression, version=version)
+    blob_file = storage.blob_file
+    extent = None
+    if blob_file is not None and len(ciphertext) >= blob_file.min_size:
+        extent = blob_file.append(ciphertext)
+        document = encode_did_document(asset_id, access_url, owner_public_key, capsule, grants,
+                                       compression=compression, extent=extent, version=version)
+    return document, extent
+
+
+def store_encrypted_batch(
+    database: Union[Dict[str, Any], StorageBackend],
+    assets: Iterable[Tuple[str, bytes, Capsule, str, str]],
+    owner_public_key: PublicKey,
+    grants: Iterable[Tuple[bytes, str]],
+) -> Dict[str, Exception]:
+    """
+    Stores a batch of data assets that were already encrypted under the owner's public key.
+
+    The ciphertexts, DID records and index entries of the whole batch are written with
+    a single put_many, i.e. one transaction on SQLite storage and one flush of the log on
+    log storage. An asset that fails validation is reported and left out of the batch.
+    If an asset ID occurs more than once, its last occurrence is stored.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the data.
+        assets (Iterable[Tuple[str, bytes, Capsule, str, str]]): Tuples of asset ID, ciphertext,
+            capsule, access URL and the codec the payload was compressed with ('' for none).
+        owner_public_key (PublicKey): The public key of the data owner.
+        grants (Iterable[Tuple[bytes, str]]): Pairs of serialized consumer public key and
+            ID of the policy holding the consumer's kfrags, applied to every asset.
+
+    Returns:
+        Dict[str, Exception]: The DataStorageError of each asset that could not be stored,
+        keyed by asset ID. Empty if every asset was stored.
+    """
+    storage = get_storage(database)
+    grants = list(grants)
+    failures: Dict[str, Exception] = {}
+    prepared: Dict[str, Tuple[Optional[bytes], bytes]] = {}
+    for asset_id, ciphertext, capsule, access_url, compression in assets:
+        try:
+            document, extent = _encode_encrypted(storage, asset_id, ciphertext, capsule, access_url,
+                                                 owner_public_key, grants, compression)
+        except ValueError as e:
+            failures[asset_id] = DataStorageError(f"Failed to store data: {str(e)}")
+            prepared.pop(asset_id, None)
+            continue
+        failures.pop(asset_id, None)
+        prepared[asset_id] = (ciphertext if extent is None else None, document)
+    if not prepared:
+        return failures
+
+    # Ciphertexts go first, so no record is written before the data it points to
+    items = [(CIPHERTEXT_COLLECTION, asset_id, ciphertext)
+             for asset_id, (ciphertext, _) in prepared.items() if ciphertext is not None]
+    previous: Dict[str, Optional[AssetRecord]] = {}
+    with _grants_lock:
+        for asset_id, (_, document) in prepared.items():
+            previous[asset_id] = _read_record(storage, asset_id)
+            removed, added = index_changes(previous[asset_id], AssetRecord.from_bytes(document))
+            for collection, key in removed:
+                storage.delete(collection, key)
+            items.append((ASSET_COLLECTION, asset_id, document))
+            items.extend((collection, key, b'') for collection, key in added)
+        storage.put_many(items)
+
+    for asset_id, (ciphertext, _) in prepared.items():
+        previous_record = previous[asset_id]
+        if previous_record is not None and previous_record.blob:
+            release_blob(storage, previous_record.blob)
+        _invalidate_asset(storage, asset_id)
+        if ciphertext is None:
+            storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+        if previous_record is not None:
+            _delete_chunks(storage, asset_id, 0, previous_record.chunks)
+    return failures
+
+
+def _write_record(
+    storage: StorageBackend,
+    asset_id: str,
+    document: bytes,
+    previous: Optional[AssetRecord]
+) -> None:
+    """Store an asset's DID record and update its index entries. Callers hold _grants_lock."""
+    storage.put(ASSET_COLLECTION, asset_id, document)
+    update_indexes(storage, previous, AssetRecord.from_bytes(document))
+
+
+def _read_record(storage: StorageBackend, asset_id: str) -> Optional[AssetRecord]:
+    """Return the stored record of an asset, or None if it is missing or unreadable."""
+    document = storage.get(ASSET_COLLECTION, asset_id)
+    try:
+        return AssetRecord.from_bytes(document) if document is not None else None
+    except ValueError:
+        # Entries of an unreadable record cannot be removed; rebuild_indexes drops them
+        return None
+
+
+def _replace_record(storage: StorageBackend, asset_id: str, document: bytes, keep_grants: bool = False) -> None:
+    """
+    Store a new version of an asset's DID record, replacing any previous one.
+
+    With keep_grants, the grants of a previous record by the same owner are
+    carried over, under the same lock as grant and revoke updates.
+    """
+    with _grants_lock:
+        previous_record = _read_record(storage, asset_id)
+        if keep_grants and previous_record is not None and previous_record.grants and \
+                previous_record.public_key == AssetRecord.from_bytes(document).public_key:
+            document = replace_grants(document, previous_record.grants)
+        _write_record(storage, asset_id, document, previous_record)
+    if previous_record is not None and previous_record.blob:
+        release_blob(storage, previous_record.blob)
+
+
+def _chunk_key(asset_id: str, index: int) -> str:
+    return f"{asset_id}:{index}"
+
+
+def _stored_chunk_count(storage: StorageBackend, asset_id: str) -> int:
+    """Return the number of chunks of a previously stored asset, if any."""
+    document = storage.get(ASSET_COLLECTION, asset_id)
+    return AssetRecord.from_bytes(document).chunks if document is not None else 0
+
+
+def _delete_chunks(storage: StorageBackend, asset_id: str, start: int, stop: int) -> None:
+    """Remove chunks left over from a previously stored version of an asset."""
+    for index in range(start, stop):
+        storage.delete(CHUNK_COLLECTION, _chunk_key(asset_id, index))
+
+
+def store_stream(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    source: Union[BinaryIO, Iterable[bytes]],
+    access_url: str,
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compression: Optional[str] = None,
+) -> None:
+    """
+    Stores a large payload as independently authenticated encrypted chunks.
+
+    The payload is read, compressed, encrypted and written one chunk at a time, so
+    memory use does not depend on the payload size.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the data.
+        asset_id (str): The unique identifier for the data asset.
+        source (Union[BinaryIO, Iterable[bytes]]): Readable binary file-like object or iterable of bytes.
+        access_url (str): A URL or link where the data can be accessed.
+        owner_key (SecretKey): The secret key of the data owner for encryption.
+        owner_signer (Signer): The signer object used for signing the data.
+        consumer_key (PublicKey): The public key of the intended data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags to generate.
+        chunk_size (int): Maximum plaintext size of each chunk in bytes.
+        compression (Optional[str]): Codec compressing the payload before encryption, or
+            ``auto`` to pick one from the first chunk. None stores the payload as it is.
+
+    Raises:
+        DataStorageError: If there is an error during the storage of data.
+    """
+    if not (asset_id and source is not None and access_url and owner_key and owner_signer and consumer_key):
+        raise ValueError("All parameters are required")
+
+    storage = get_storage(database)
     try:
-        ciphertext, capsule = encrypt_data(data, owner_key.public_key())
-        kfrags = create_kfrags(owner_key, consumer_key, owner_signer, threshold=1, shares=1)
-        did_doc = create_did_document(asset_id, access_url, owner_key.public_key(), ciphertext, capsule, kfrags)
+        previous_chunks = _stored_chunk_count(storage, asset_id)
+        policy_id = get_or_create_policy(storage, owner_key, owner_signer, consumer_key, threshold, shares)
+        plaintext_chunks = iter_chunks(source, chunk_size)
+        codec = ''
+        if compression:
+            selected, plaintext_chunks = compress_stream(plaintext_chunks, compression)
+            codec = '' if selected.name == CODEC_NONE else selected.name
+        capsule, encrypted_chunks = encrypt_stream(plaintext_chunks, owner_key.public_key(), chunk_size)
+        chunks = 0
+        for index, chunk in enumerate(encrypted_chunks):
+            storage.put(CHUNK_COLLECTION, _chunk_key(asset_id, index), chunk)
+            chunks = index + 1
+        document = encode_did_document(asset_id, access_url, owner_key.public_key(), capsule,
+                                       [(bytes(consumer_key), policy_id)], chunks=chunks, compression=codec)
     except ValueError as e:
-        raise DataStorageError(f"Failed to store data: {str(e)}")
+        raise DataStorageError(f"Failed to store data: {str(e)}") from e
+
+    _replace_record(storage, asset_id, document)
+    _invalidate_asset(storage, asset_id)
+    storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+    _delete_chunks(storage, asset_id, chunks, previous_chunks)
+
+
+def _load_did_document(storage: StorageBackend, data_asset_id: str) -> AssetRecord:
+    document = storage.get(ASSET_COLLECTION, data_asset_id)
+    if document is None:
+        raise DataStorageError("No encrypted data found for the specified data asset ID.")
+    return AssetRecord.from_bytes(document)
+
+
+def _reencrypt_asset(
+    storage: StorageBackend,
+    data_asset_id: str,
+    receiving_public_key: PublicKey,
+    executor: Optional[Executor] = None
+) -> Tuple[AssetRecord, Capsule, List[VerifiedCapsuleFrag]]:
+    """
+    Load a stored asset and re-encrypt its capsule with the receiver's kfrags,
+    stopping once the policy's threshold is reached.
+
+    Returns:
+        Tuple[AssetRecord, Capsule, List[VerifiedCapsuleFrag]]: The asset's record,
+        its capsule and the re-encrypted capsule fragments.
+    """
+    with timed('consume.load'):
+        record = _load_did_document(storage, data_asset_id)
+    policy_id = record.policy_for(receiving_public_key)
+    if policy_id is None:
+        raise PermissionError("Consumer does not have permission to access the data.")
+
+    with timed('consume.parse'):
+        capsule, threshold, verified_kfrags = _parse_grant(storage, record, policy_id)
+    with timed('consume.reencrypt'):
+        if storage.cfrag_cache is None:
+            cfrags = reencrypt_threshold(capsule, verified_kfrags, threshold, executor)
+        else:
+            cfrags = _reencrypt_cached(storage.cfrag_cache, record.asset_id, policy_id, capsule,
+                                       verified_kfrags, threshold, executor)
+    return record, capsule, cfrags
+
+
+def _reencrypt_cached(
+    cache: LRUCache,
+    asset_id: str,
+    policy_id: str,
+    capsule: Capsule,
+    verified_kfrags: List[VerifiedKeyFrag],
+    threshold: int,
+    executor: Optional[Executor]
+) -> List[VerifiedCapsuleFrag]:
+    """
+    Re-encrypt a capsule, reusing cached capsule fragments keyed by asset, grant and kfrag ID.
+
+    Only the kfrags without a cached fragment are re-encrypted, and only as many as
+    are needed to reach the threshold.
+    """
+    cfrags = []
+    missing = []
+    for kfrag in verified_kfrags:
+        cfrag = cache.get((asset_id, policy_id, bytes(kfrag.kfrag.id)))
+        if cfrag is None:
+            missing.append(kfrag)
+        else:
+            cfrags.append(cfrag)
+            if len(cfrags) == threshold:
+                return cfrags
+
+    for cfrag in reencrypt_threshold(capsule, missing, threshold - len(cfrags), executor):
+        cache.put((asset_id, policy_id, bytes(cfrag.cfrag.kfrag_id)), cfrag, group=asset_id)
+        cfrags.append(cfrag)
+    return cfrags
+
+
+def _parse_grant(
+    storage: StorageBackend,
+    record: AssetRecord,
+    policy_id: str
+) -> Tuple[Capsule, int, List[VerifiedKeyFrag]]:
+    """
+    Deserialize the capsule and the kfrags of one grant, using the storage's object cache if configured.
+
+    Returns:
+        Tuple[Capsule, int, List[VerifiedKeyFrag]]: The capsule, the policy threshold and its kfrags.
+    """
+    cache = storage.object_cache
+    key = (record.asset_id, policy_id)
+    if cache is not None:
+        parsed = cache.get(key)
+        if parsed is not None:
+            return parsed
+
+    # PyUmbral only accepts bytes, so each slice is copied exactly once here
+    capsule = Capsule.from_bytes(record.capsule)
+    try:
+        policy = load_policy(storage, policy_id)
+    except PolicyNotFound as e:
+        raise PermissionError("Consumer does not have permission to access the data.") from e
+
+    parsed = (capsule, policy.threshold, policy.verified_kfrags())
+    if cache is not None:
+        cache.put(key, parsed, group=record.asset_id)
+    return parsed
+
+
+def clear_caches(database: Union[Dict[str, Any], StorageBackend]) -> None:
+    """
+    Drop every cached capsule, kfrag and capsule fragment of a database.
+
+    Needed whenever a policy's kfrags change, as a policy is shared by every asset
+    of its owner/consumer pair.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database whose caches are cleared.
+    """
+    storage = get_storage(database)
+    for cache in (storage.object_cache, storage.cfrag_cache):
+        if cache is not None:
+            cache.clear()
+
+
+def _invalidate_asset(storage: StorageBackend, asset_id: str) -> None:
+    """Drop cached objects derived from a previously stored version of an asset."""
+    for cache in (storage.object_cache, storage.cfrag_cache):
+        if cache is not None:
+            cache.invalidate_group(asset_id)
+
+
+def _load_ciphertext(storage: StorageBackend, record: AssetRecord) -> Union[bytes, memoryview]:
+    if record.extent:
+        if storage.blob_file is None:
+            raise DataStorageError("The asset's encrypted data is stored in a blob file that is not configured.")
+        try:
+            # A view of the memory map; it is only copied where bytes are required
+            return storage.blob_file.read(record.extent)
+        except ValueError as e:
+            raise DataStorageError(f"Failed to read encrypted data: {str(e)}") from e
+    if record.blob:
+        ciphertext = load_blob(storage, record.blob)
+    else:
+        ciphertext = storage.get(CIPHERTEXT_COLLECTION, record.asset_id)
+    if ciphertext is None:
+        raise DataStorageError("No encrypted data found for the specified data asset ID.")
+    return ciphertext
+
+
+def _iter_stored_chunks(storage: StorageBackend, asset_id: str, chunks: int) -> Iterator[bytes]:
+    for index in range(chunks):
+        chunk = storage.get(CHUNK_COLLECTION, _chunk_key(asset_id, index))
+        if chunk is None:
+            raise DataStorageError(f"Missing chunk {index} of the specified data asset.")
+        yield chunk
+
+
+def asset_version(database: Union[Dict[str, Any], StorageBackend], asset_id: str) -> Optional[AssetVersion]:
+    """
+    Return the owner and version of a stored asset.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier of the data asset.
+
+    Returns:
+        Optional[AssetVersion]: The owner's serialized public key and the version the asset
+        was last stored with, or None if no asset is stored under the ID.
+    """
+    record = _read_record(get_storage(database), asset_id)
+    return AssetVersion(record.public_key, record.version) if record is not None else None
+
+
+def load_asset_record(database: Union[Dict[str, Any], StorageBackend], asset_id: str) -> AssetRecord:
+    """
+    Load the decoded DID record of a stored asset.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier of the data asset.
+
+    Returns:
+        AssetRecord: The asset's record.
+
+    Raises:
+        DataStorageError: If no data is stored for the asset.
+    """
+    return _load_did_document(get_storage(database), asset_id)
+
+
+def load_ciphertext(database: Union[Dict[str, Any], StorageBackend], record: AssetRecord) -> Union[bytes, memoryview]:
+    """
+    Load the ciphertext of a stored asset that is not stored in chunks.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        record (AssetRecord): The asset's record, as returned by load_asset_record.
+
+    Returns:
+        Union[bytes, memoryview]: The ciphertext; a view of the memory map for assets
+        stored in a blob file.
+
+    Raises:
+        DataStorageError: If the ciphertext is missing or cannot be read.
+    """
+    return _load_ciphertext(get_storage(database), record)
+
+
+def iter_stored_chunks(database: Union[Dict[str, Any], StorageBackend], record: AssetRecord) -> Iterator[bytes]:
+    """
+    Iterate over the encrypted chunks of a streamed asset, reading one at a time.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        record (AssetRecord): The asset's record, as returned by load_asset_record.
 
-    document = {'did_document': did_doc}
-    database.setdefault('collection', {})[asset_id] = document
+    Returns:
+        Iterator[bytes]: The encrypted chunks in order.
+
+    Raises:
+        DataStorageError: If a chunk is missing, when it is reached.
+    """
+    return _iter_stored_chunks(get_storage(database), record.asset_id, record.chunks)
 
 
 def consume_data(
-    database: Dict[str, Any],
+    database: Union[Dict[str, Any], StorageBackend],
     data_asset_id: str,
     consumer_address: str,
     consumer_secret_key: SecretKey,
     delegating_public_key: PublicKey,
-    receiving_public_key: PublicKey
+    receiving_public_key: PublicKey,
+    executor: Optional[Executor] = None,
+    burn_verifier: Optional[BurnVerifier] = None
 ) -> Tuple[bytes, str]:
     """
     Consume encrypted data, attempting to decrypt it using the consumer's secret key and verified capsule fragments.
 
     Args:
-        database (Dict[str, Any]): Database containing stored data.
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
         data_asset_id (str): Identifier for the data asset.
         consumer_address (str): Address of the consumer.
         consumer_secret_key (SecretKey): Secret key of the consumer.
         delegating_public_key (PublicKey): Public key of the original data owner.
         receiving_public_key (PublicKey): Public key of the data receiver.
+        executor (Optional[Executor]): Thread or process pool re-encrypting the capsule with
+            all kfrags concurrently. Without it, kfrags are used one at a time. Either way,
+            re-encryption stops once the policy's threshold is reached.
+        burn_verifier (Optional[BurnVerifier]): Verifier checking that the consumer address
+            has burned the required tokens. Without it, no token burn is required.
 
     Returns:
         Tuple[bytes, str]: Decrypted data and access link, if successful.
@@ -78,32 +693,577 @@ def consume_data(
     Raises:
         DataStorageError: If no encrypted data is found for the specified data asset ID.
         PermissionError: If the consumer does not have permission to access the data.
+        InsufficientTokenBurn: If burn_verifier is given and the consumer's token burn
+            is missing or insufficient.
         DecryptionError: If an error occurs during the decryption process.
     """
+    storage = get_storage(database)
+    with timed('consume_data') as total:
+        if burn_verifier is not None:
+            with timed('consume.burn'):
+                burn_verifier.require(consumer_address, receiving_public_key)
+        try:
+            record, capsule, cfrags = _reencrypt_asset(storage, data_asset_id, receiving_public_key, executor)
+
+            if record.chunks:
+                # Chunks are read from storage while they are decrypted
+                with timed('consume.decrypt') as stage:
+                    plaintext_chunks = decrypt_reencrypted_stream(
+                        receiving_sk=consumer_secret_key,
+                        delegating_pk=delegating_public_key,
+                        capsule=capsule,
+                        verified_cfrags=cfrags,
+                        chunks=_iter_stored_chunks(storage, data_asset_id, record.chunks)
+                    )
+                    if record.compression:
+                        plaintext_chunks = decompress_stream(plaintext_chunks, record.compression)
+                    decrypted_data = b"".join(plaintext_chunks)
+                    stage.nbytes = len(decrypted_data)
+            else:
+                with timed('consume.read'):
+                    ciphertext = _load_ciphertext(storage, record)
+                with timed('consume.decrypt', len(ciphertext)):
+                    decrypted_data = decrypt_reencrypted_data(
+                        receiving_sk=consumer_secret_key,
+                        delegating_pk=delegating_public_key,
+                        capsule=capsule,
+                        verified_cfrags=cfrags,
+                        ciphertext=ciphertext
+                    )
+                if record.compression:
+                    with timed('consume.decompress', len(decrypted_data)):
+                        decrypted_data = decompress_data(decrypted_data, record.compression)
+            total.nbytes = len(decrypted_data)
+            return decrypted_data, record.access_url
+        except (ValueError, TypeError) as e:
+            raise DecryptionError(f"Error occurred during decryption: {str(e)}") from e
+
+
+def reencrypt_for_consumer(
+    database: Union[Dict[str, Any], StorageBackend],
+    data_asset_id: str,
+    receiving_public_key: PublicKey,
+    executor: Optional[Executor] = None,
+    max_size: Optional[int] = None
+) -> Tuple[Capsule, List[VerifiedCapsuleFrag], Union[bytes, memoryview, List[bytes]], str, str]:
+    """
+    Re-encrypt an asset's capsule for a consumer without decrypting the data.
+
+    This is the relayer's half of consume_data: the consumer receives the capsule,
+    the capsule fragments and the ciphertext, decrypts them locally with
+    decrypt_reencrypted_data or decrypt_reencrypted_stream and, if the asset was
+    compressed, decompresses the result with the returned codec.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        data_asset_id (str): Identifier for the data asset.
+        receiving_public_key (PublicKey): Public key of the data receiver.
+        executor (Optional[Executor]): Thread or process pool re-encrypting the capsule with
+            all kfrags concurrently.
+        max_size (Optional[int]): Largest ciphertext, in bytes, to return. Chunks of streamed
+            assets are read only until they exceed it. None returns assets of any size.
+
+    Returns:
+        Tuple[Capsule, List[VerifiedCapsuleFrag], Union[bytes, memoryview, List[bytes]], str, str]:
+        The capsule, the capsule fragments, the ciphertext (a view of the blob file for
+        assets stored there, a list of encrypted chunks for assets stored with store_stream),
+        the access link and the compression codec, or an empty string for uncompressed assets.
+
+    Raises:
+        DataStorageError: If no encrypted data is found for the specified data asset ID.
+        AssetTooLarge: If the ciphertext is larger than max_size.
+        PermissionError: If the consumer does not have permission to access the data.
+    """
+    storage = get_storage(database)
+    record, capsule, cfrags = _reencrypt_asset(storage, data_asset_id, receiving_public_key, executor)
+    if record.chunks:
+        ciphertext, size = [], 0
+        for chunk in _iter_stored_chunks(storage, data_asset_id, record.chunks):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise AssetTooLarge(f"The asset's encrypted data exceeds {max_size} bytes.")
+            ciphertext.append(chunk)
+    else:
+        ciphertext = _load_ciphertext(storage, record)
+        if max_size is not None and len(ciphertext) > max_size:
+            raise AssetTooLarge(f"The asset's encrypted data exceeds {max_size} bytes.")
+    return capsule, cfrags, ciphertext, record.access_url, record.compression
+
+
+def _decrypt_stored_stream(plaintext_chunks: Iterator[bytes]) -> Iterator[bytes]:
     try:
-        if 'collection' in database and data_asset_id in database['collection']:
-            document = database['collection'][data_asset_id]
-            did_doc = document['did_document']
-            ciphertext = bytes.fromhex(did_doc['access'][0]['data'])
-            capsule = Capsule.from_bytes(bytes.fromhex(did_doc['access'][0]['capsule']))
-            kfrags_bytes = [bytes.fromhex(hex_kfrag) for hex_kfrag in did_doc['access'][0]['kfrags']]
+        yield from plaintext_chunks
+    except (ValueError, TypeError) as e:
+        raise DecryptionError(f"Error occurred during decryption: {str(e)}") from e
 
-            verified_kfrags = [VerifiedKeyFrag.from_verified_bytes(kfrag_bytes) for kfrag_bytes in kfrags_bytes]
 
-            cfrags = [reencrypt_data(capsule, vkfrag) for vkfrag in verified_kfrags if vkfrag]
+def consume_stream(
+    database: Union[Dict[str, Any], StorageBackend],
+    data_asset_id: str,
+    consumer_address: str,
+    consumer_secret_key: SecretKey,
+    delegating_public_key: PublicKey,
+    receiving_public_key: PublicKey,
+    executor: Optional[Executor] = None,
+    burn_verifier: Optional[BurnVerifier] = None
+) -> Tuple[Iterator[bytes], str]:
+    """
+    Consume encrypted data chunk by chunk.
 
-            if not cfrags:
-                raise PermissionError("Consumer does not have permission to access the data.")
+    Chunks are loaded and decrypted lazily while the returned iterator is consumed,
+    so memory use does not depend on the payload size. Assets stored with store_data
+    are yielded as a single chunk.
 
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        data_asset_id (str): Identifier for the data asset.
+        consumer_address (str): Address of the consumer.
+        consumer_secret_key (SecretKey): Secret key of the consumer.
+        delegating_public_key (PublicKey): Public key of the original data owner.
+        receiving_public_key (PublicKey): Public key of the data receiver.
+        executor (Optional[Executor]): Thread or process pool re-encrypting the capsule with
+            all kfrags concurrently. Without it, kfrags are used one at a time. Either way,
+            re-encryption stops once the policy's threshold is reached.
+        burn_verifier (Optional[BurnVerifier]): Verifier checking that the consumer address
+            has burned the required tokens. Without it, no token burn is required.
+
+    Returns:
+        Tuple[Iterator[bytes], str]: Iterator over the decrypted chunks and the access link.
+
+    Raises:
+        DataStorageError: If no encrypted data is found for the specified data asset ID.
+        PermissionError: If the consumer does not have permission to access the data.
+        InsufficientTokenBurn: If burn_verifier is given and the consumer's token burn
+            is missing or insufficient.
+        DecryptionError: If an error occurs during the decryption process. Errors in
+            later chunks are raised while iterating.
+    """
+    storage = get_storage(database)
+    if burn_verifier is not None:
+        burn_verifier.require(consumer_address, receiving_public_key)
+    try:
+        record, capsule, cfrags = _reencrypt_asset(storage, data_asset_id, receiving_public_key, executor)
+
+        if not record.chunks:
             decrypted_data = decrypt_reencrypted_data(
                 receiving_sk=consumer_secret_key,
                 delegating_pk=delegating_public_key,
                 capsule=capsule,
                 verified_cfrags=cfrags,
-                ciphertext=ciphertext
+                ciphertext=_load_ciphertext(storage, record)
             )
-            return decrypted_data, did_doc['access'][0]['accessUrl']
-        else:
-            raise DataStorageError("No encrypted data found for the specified data asset ID.")
+            if record.compression:
+                decrypted_data = decompress_data(decrypted_data, record.compression)
+            return iter([decrypted_data]), record.access_url
+
+        plaintext_chunks = decrypt_reencrypted_stream(
+            receiving_sk=consumer_secret_key,
+            delegating_pk=delegating_public_key,
+            capsule=capsule,
+            verified_cfrags=cfrags,
+            chunks=_iter_stored_chunks(storage, data_asset_id, record.chunks)
+        )
+        if record.compression:
+            plaintext_chunks = decompress_stream(plaintext_chunks, record.compression)
+        return _decrypt_stored_stream(plaintext_chunks), record.access_url
     except (ValueError, TypeError) as e:
         raise DecryptionError(f"Error occurred during decryption: {str(e)}") from e
+
+
+def grant_access(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1,
+) -> str:
+    """
+    Grants a consumer access to a stored asset without re-encrypting its data.
+
+    Only the asset's grant list is updated; the stored ciphertext and capsule are
+    left untouched. Granting again to the same consumer replaces the previous grant.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+        owner_key (SecretKey): The secret key of the data owner.
+        owner_signer (Signer): The signer object used for signing the kfrags.
+        consumer_key (PublicKey): The public key of the consumer to grant access to.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags to generate.
+
+    Returns:
+        str: The identifier of the policy referenced by the grant.
+
+    Raises:
+        DataStorageError: If no data is found for the specified data asset ID.
+        PermissionError: If the owner key does not match the asset's owner.
+    """
+    if not (asset_id and owner_key and owner_signer and consumer_key):
+        raise ValueError("All parameters are required")
+
+    storage = get_storage(database)
+    with _grants_lock:
+        document = storage.get(ASSET_COLLECTION, asset_id)
+        if document is None:
+            raise DataStorageError("No encrypted data found for the specified data asset ID.")
+        record = AssetRecord.from_bytes(document)
+        if record.public_key != bytes(owner_key.public_key()):
+            raise PermissionError("Only the data owner can grant access to the data.")
+        try:
+            policy_id = get_or_create_policy(storage, owner_key, owner_signer, consumer_key, threshold, shares)
+        except ValueError as e:
+            raise DataStorageError(f"Failed to grant access: {str(e)}") from e
+        _put_grant(storage, asset_id, document, record, consumer_key, policy_id)
+    return policy_id
+
+
+def grant_kfrags(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    consumer_key: PublicKey,
+    threshold: int,
+    kfrags: List[bytes],
+) -> str:
+    """
+    Grants a consumer access to a stored asset using kfrags generated by the data owner.
+
+    This lets a relayer accept grants without ever holding the owner's secret key:
+    every kfrag must be signed by the asset's owner for the given consumer, so
+    only the owner can produce a valid grant. Kfrags revoked by revoke_access,
+    rotate_access, revoke_consumer or by a grant that replaced them are refused,
+    so replaying an old grant cannot restore access. Replacing a policy with new
+    kfrags revokes the old ones for every asset of the owner.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+        consumer_key (PublicKey): The public key of the consumer to grant access to.
+        threshold (int): Minimum number of kfrags required for decryption.
+        kfrags (List[bytes]): Serialized kfrags signed by the data owner.
+
+    Returns:
+        str: The identifier of the policy referenced by the grant.
+
+    Raises:
+        DataStorageError: If no data is found for the specified data asset ID, or the
+            threshold does not match the kfrags.
+        PermissionError: If a kfrag was not issued by the asset's owner for this consumer,
+            or was revoked.
+    """
+    if not (asset_id and consumer_key and kfrags):
+        raise ValueError("All parameters are required")
+
+    storage = get_storage(database)
+    with _grants_lock:
+        document = storage.get(ASSET_COLLECTION, asset_id)
+        if document is None:
+            raise DataStorageError("No encrypted data found for the specified data asset ID.")
+        record = AssetRecord.from_bytes(document)
+        owner_public_key = PublicKey.from_bytes(record.public_key)
+        try:
+            verified_kfrags = [
+                KeyFrag.from_bytes(kfrag).verify(
+                    verifying_pk=owner_public_key,
+                    delegating_pk=owner_public_key,
+                    receiving_pk=consumer_key,
+                )
+                for kfrag in kfrags
+            ]
+        except (ValueError, VerificationError) as e:
+            raise PermissionError("Key fragments were not issued by the data owner for this consumer.") from e
+        if kfrags_revoked(storage, record.public_key, kfrags, asset_id):
+            raise PermissionError("Key fragments were revoked by the data owner.")
+        previous = storage.get(POLICY_COLLECTION,
+                               make_policy_id(owner_public_key, consumer_key, threshold, len(kfrags)))
+        replaced = previous is not None and Policy.from_bytes(previous).kfrags != [bytes(kfrag) for kfrag in kfrags]
+        try:
+            policy_id = store_policy(storage, owner_public_key, consumer_key, threshold, verified_kfrags)
+        except ValueError as e:
+            raise DataStorageError(f"Failed to grant access: {str(e)}") from e
+        if replaced:
+            # The replaced kfrags must not be granted again by replaying their grant
+            revoke_kfrags(storage, record.public_key, Policy.from_bytes(previous).kfrags)
+        _put_grant(storage, asset_id, document, record, consumer_key, policy_id)
+    if replaced:
+        # The policy was replaced with new kfrags under the same ID, and it is shared by
+        # every asset of the owner/consumer pair
+        clear_caches(storage)
+    else:
+        _invalidate_asset(storage, asset_id)
+    return policy_id
+
+
+def _put_grant(
+    storage: StorageBackend,
+    asset_id: str,
+    document: bytes,
+    record: AssetRecord,
+    consumer_key: PublicKey,
+    policy_id: str
+) -> None:
+    """Add or replace one consumer's grant in a stored DID record. Callers hold _grants_lock."""
+    grants = dict(record.grants)
+    grants[bytes(consumer_key)] = policy_id
+    _write_record(storage, asset_id, replace_grants(document, grants.items()), record)
+
+
+def revoke_access(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    consumer_key: PublicKey,
+) -> bool:
+    """
+    Revokes a consumer's access to a stored asset.
+
+    The consumer's grant is removed from the asset and the kfrags of its policy
+    are revoked for the asset, so they cannot be granted on it again; the stored
+    ciphertext and capsule are left untouched.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+        consumer_key (PublicKey): The public key of the consumer to revoke.
+
+    Returns:
+        bool: True if a grant was removed, False if the consumer had no grant.
+
+    Raises:
+        DataStorageError: If no data is found for the specified data asset ID.
+    """
+    storage = get_storage(database)
+    with _grants_lock:
+        document = storage.get(ASSET_COLLECTION, asset_id)
+        if document is None:
+            raise DataStorageError("No encrypted data found for the specified data asset ID.")
+        record = AssetRecord.from_bytes(document)
+        grants = dict(record.grants)
+        policy_id = grants.pop(bytes(consumer_key), None)
+        if policy_id is None:
+            return False
+        revoke_policy(storage, policy_id, asset_id)
+        _write_record(storage, asset_id, replace_grants(document, grants.items()), record)
+    if storage.object_cache is not None:
+        storage.object_cache.invalidate((asset_id, policy_id))
+    if storage.cfrag_cache is not None:
+        # Capsule fragments must never outlive the grant they were produced for
+        storage.cfrag_cache.invalidate_group(asset_id)
+    return True
+
+
+def update_grant(
+    database: Union[Dict[str, Any], StorageBackend],
+    asset_id: str,
+    owner_public_key: PublicKey,
+    consumer_key: PublicKey,
+    policy_id: Optional[str],
+) -> bool:
+    """
+    Points a consumer's existing grant on an owner's asset at another policy, or removes it.
+
+    Used to re-grant or revoke access across many assets; the stored ciphertext and
+    capsule are left untouched. Assets of other owners are not changed.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+        owner_public_key (PublicKey): The public key of the asset's owner.
+        consumer_key (PublicKey): The public key of the consumer whose grant is updated.
+        policy_id (Optional[str]): The policy the grant should reference, or None to revoke it.
+
+    Returns:
+        bool: True if the grant was changed, False if the asset does not exist, belongs
+        to another owner, has no grant for the consumer or already references policy_id.
+    """
+    storage = get_storage(database)
+    with _grants_lock:
+        document = storage.get(ASSET_COLLECTION, asset_id)
+        if document is None:
+            return False
+        record = AssetRecord.from_bytes(document)
+        grants = dict(record.grants)
+        consumer = bytes(consumer_key)
+        previous = grants.get(consumer)
+        if record.public_key != bytes(owner_public_key) or previous is None or previous == policy_id:
+            return False
+        if policy_id is None:
+            del grants[consumer]
+        else:
+            grants[consumer] = policy_id
+        _write_record(storage, asset_id, replace_grants(document, grants.items()), record)
+    if storage.object_cache is not None:
+        storage.object_cache.invalidate((asset_id, previous))
+    if storage.cfrag_cache is not None:
+        storage.cfrag_cache.invalidate_group(asset_id)
+    return True
+
+
+def delete_data(database: Union[Dict[str, Any], StorageBackend], asset_id: str) -> bool:
+    """
+    Deletes a stored asset, its encrypted data and its index entries.
+
+    A deduplicated asset releases its reference to the shared ciphertext, which is
+    only deleted with its last reference. Policies are kept, as they may be shared with other assets of the same owner.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+
+    Returns:
+        bool: True if the asset was deleted, False if it did not exist.
+    """
+    storage = get_storage(database)
+    with _grants_lock:
+        document = storage.get(ASSET_COLLECTION, asset_id)
+        if document is None:
+            return False
+        record = AssetRecord.from_bytes(document)
+        # The record goes first so readers never see a record without its data
+        storage.delete(ASSET_COLLECTION, asset_id)
+        update_indexes(storage, record, None)
+    if record.blob:
+        release_blob(storage, record.blob)
+    storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+    _delete_chunks(storage, asset_id, 0, record.chunks)
+    _invalidate_asset(storage, asset_id)
+    return True
+
+
+def export_asset(database: Union[Dict[str, Any], StorageBackend], asset_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Export a stored asset with everything needed to import it into another database.
+
+    The export is self-contained: ciphertexts stored as shared blobs or in a blob
+    file are copied out, and the policies of the asset's grants and the kfrag
+    revocations that apply to the asset are included.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        asset_id (str): Identifier for the data asset.
+
+    Returns:
+        Optional[Dict[str, Any]]: The DID ``record``, the ``ciphertext`` or the list of
+        encrypted ``chunks``, and the encoded ``policies``, all as bytes, and the keys of
+        the ``revoked`` kfrag entries; None if the asset does not exist.
+
+    Raises:
+        DataStorageError: If the asset's encrypted data cannot be read.
+    """
+    storage = get_storage(database)
+    document = storage.get(ASSET_COLLECTION, asset_id)
+    if document is None:
+        return None
+    record = AssetRecord.from_bytes(document)
+    exported: Dict[str, Any] = {'record': None, 'ciphertext': None, 'chunks': [], 'policies': [],
+                                'revoked': revocations_for(storage, record.public_key, asset_id)}
+    if record.chunks:
+        exported['chunks'] = list(_iter_stored_chunks(storage, asset_id, record.chunks))
+    else:
+        exported['ciphertext'] = bytes(_load_ciphertext(storage, record))
+    for _, policy_id in record.grants:
+        policy = storage.get(POLICY_COLLECTION, policy_id)
+        if policy is not None:
+            exported['policies'].append(bytes(policy))
+    record.blob = record.extent = None
+    exported['record'] = record.to_bytes()
+    return exported
+
+
+def import_asset(database: Union[Dict[str, Any], StorageBackend], exported: Dict[str, Any]) -> str:
+    """
+    Store an asset exported with export_asset, replacing any asset with the same ID.
+
+    The asset keeps its creation time and grants; policies already present are kept.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database to store the asset.
+        exported (Dict[str, Any]): The export returned by export_asset.
+
+    Returns:
+        str: The imported asset's ID.
+
+    Raises:
+        DataStorageError: If the export is not valid.
+    """
+    storage = get_storage(database)
+    try:
+        record = AssetRecord.from_bytes(exported['record'])
+        if len(exported['chunks']) != record.chunks:
+            raise ValueError("Unexpected number of chunks.")
+        if not record.chunks and not exported['ciphertext']:
+            raise ValueError("Invalid ciphertext.")
+    except (KeyError, TypeError, ValueError) as e:
+        raise DataStorageError(f"Failed to import data: {str(e)}") from e
+    asset_id = record.asset_id
+
+    for policy in exported['policies']:
+        policy_id = Policy.from_bytes(policy).policy_id
+        if not storage.contains(POLICY_COLLECTION, policy_id):
+            storage.put(POLICY_COLLECTION, policy_id, policy)
+    storage.put_many([(REVOKED_COLLECTION, key, b'') for key in exported.get('revoked', [])])
+    previous_chunks = _stored_chunk_count(storage, asset_id)
+    ciphertext = exported['ciphertext']
+    if record.chunks:
+        for index, chunk in enumerate(exported['chunks']):
+            storage.put(CHUNK_COLLECTION, _chunk_key(asset_id, index), chunk)
+    elif storage.blob_file is not None and len(ciphertext) >= storage.blob_file.min_size:
+        record.extent = storage.blob_file.append(ciphertext)
+    else:
+        storage.put(CIPHERTEXT_COLLECTION, asset_id, ciphertext)
+
+    _replace_record(storage, asset_id, record.to_bytes())
+    _invalidate_asset(storage, asset_id)
+    if record.chunks or record.extent:
+        storage.delete(CIPHERTEXT_COLLECTION, asset_id)
+    _delete_chunks(storage, asset_id, record.chunks, previous_chunks)
+    return asset_id
+
+
+def rebuild_indexes(database: Union[Dict[str, Any], StorageBackend]) -> int:
+    """
+    Rebuilds the secondary indexes from the stored DID records.
+
+    Indexes are maintained on every write, so this is only needed for data stored
+    before indexing existed or after an interrupted write.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+
+    Returns:
+        int: The number of indexed assets.
+    """
+    storage = get_storage(database)
+    with _grants_lock:
+        for collection in INDEXES:
+            for key in list(storage.scan(collection)):
+                storage.delete(collection, key)
+        count = 0
+        for asset_id in list(storage.keys(ASSET_COLLECTION)):
+            document = storage.get(ASSET_COLLECTION, asset_id)
+            if document is not None:
+                update_indexes(storage, None, AssetRecord.from_bytes(document))
+                count += 1
+    return count
+
+
+def get_did_document(database: Union[Dict[str, Any], StorageBackend], data_asset_id: str) -> Dict:
+    """
+    Retrieve the W3C DID JSON representation of a stored data asset.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        data_asset_id (str): Identifier for the data asset.
+
+    Returns:
+        Dict: DID document with hex-encoded binary fields and one access entry per grant.
+
+    Raises:
+        DataStorageError: If no data is found for the specified data asset ID.
+    """
+    storage = get_storage(database)
+    record = _load_did_document(storage, data_asset_id)
+    ciphertext = None if record.chunks else _load_ciphertext(storage, record)
+    kfrags = {policy_id: load_policy(storage, policy_id).kfrags for policy_id in {policy_id for _, policy_id in record.grants}}
+    return record.to_json(ciphertext, kfrags)
@@ -1,6 +1,36 @@
+import struct
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 from umbral import PublicKey, Capsule, VerifiedKeyFrag
+from .blobfile import BlobExtent
+
+# Binary DID document layout: a magic/version prefix followed by
+# (tag: uint8, length: uint32 big-endian, value) fields. Repeated tags
+# (such as grants) are collected on decoding.
+DID_MAGIC = b'DID\x01'
+_FIELD_HEADER = struct.Struct('>BI')
+_COUNT = struct.Struct('>I')
+# Offset and length of a ciphertext in a blob file, followed by its SHA-256 digest
+_EXTENT = struct.Struct('>QQ32s')
+# Version of a stored asset, increased by the owner on every store
+_VERSION = struct.Struct('>Q')
+_PUBLIC_KEY_SIZE = PublicKey.serialized_size()
+
+FIELD_ID = 1
+FIELD_CREATED = 2
+FIELD_ACCESS_URL = 3
+FIELD_PUBLIC_KEY = 4
+FIELD_CAPSULE = 6
+FIELD_CHUNKS = 8
+FIELD_GRANT = 10
+FIELD_BLOB = 12
+FIELD_COMPRESSION = 14
+FIELD_EXTENT = 16
+FIELD_VERSION = 18
+
+_TEXT_FIELDS = {FIELD_ID: 'id', FIELD_CREATED: 'created', FIELD_ACCESS_URL: 'accessUrl',
+                FIELD_COMPRESSION: 'compression'}
+_BINARY_FIELDS = {FIELD_PUBLIC_KEY: 'publicKey', FIELD_CAPSULE: 'capsule'}
 
 
 class InvalidKeyFrag(Exception):
@@ -8,6 +38,65 @@ class InvalidKeyFrag(Exception):
     pass
 
 
+def _validate_did_inputs(
+    data_asset_id: str,
+    access_url: str,
+    owner_public_key: PublicKey,
+    capsule: Capsule
+) -> None:
+    """
+    Validate the inputs of a DID document.
+
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+    """
+    if not data_asset_id:
+        raise ValueError("Data asset ID is missing or empty.")
+    if not access_url:
+        raise ValueError("Access URL is missing or empty.")
+    if not owner_public_key or not isinstance(owner_public_key, PublicKey):
+        raise ValueError("Invalid owner public key.")
+    if not capsule or not isinstance(capsule, Capsule):
+        raise ValueError("Invalid capsule.")
+
+
+def _access_entry(
+    access_url: str,
+    ciphertext: Optional[Union[bytes, memoryview]],
+    capsule: Union[bytes, memoryview],
+    kfrags: Sequence[Union[bytes, memoryview]]
+) -> Dict:
+    """Build one entry of the ``access`` list of the DID JSON representation."""
+    entry = {
+        "type": "rest",
+        "accessUrl": access_url,
+    }
+    if ciphertext is not None:
+        entry["data"] = ciphertext.hex()
+    entry["capsule"] = capsule.hex()
+    entry["kfrags"] = [kfrag.hex() for kfrag in kfrags]
+    return entry
+
+
+def _json_view(
+    data_asset_id: str,
+    created: str,
+    public_key: Union[bytes, memoryview],
+    access: List[Dict]
+) -> Dict:
+    """Build the W3C DID JSON representation from raw fields."""
+    return {
+        "@context": "https://w3id.org/did/v1",
+        "id": f"did:op:{data_asset_id}",
+        "created": created,
+        "access": access,
+        "encryption": {
+            "type": "PyUmbral",
+            "publicKey": public_key.hex(),
+        },
+    }
+
+
 def create_did_document(
     data_asset_id: str,
     access_url: str,
@@ -35,39 +124,409 @@ def create_did_document(
         InvalidKeyFrag: If an invalid key fragment is encountered.
     """
     try:
-        if not data_asset_id:
-            raise ValueError("Data asset ID is missing or empty.")
-        if not access_url:
-            raise ValueError("Access URL is missing or empty.")
-        if not owner_public_key or not isinstance(owner_public_key, PublicKey):
-            raise ValueError("Invalid owner public key.")
+        _validate_did_inputs(data_asset_id, access_url, owner_public_key, capsule)
         if not ciphertext or not isinstance(ciphertext, bytes):
             raise ValueError("Invalid ciphertext.")
-        if not capsule or not isinstance(capsule, Capsule):
-            raise ValueError("Invalid capsule.")
         if not kfrags or not all(isinstance(kfrag, VerifiedKeyFrag) for kfrag in kfrags):
             raise InvalidKeyFrag("Invalid key fragments.")
-
-        did_document = {
-            "@context": "https://w3id.org/did/v1",
-            "id": f"did:op:{data_asset_id}",
-            "created": datetime.now(timezone.utc).isoformat(),
-            "access": [
-                {
-                    "type": "rest",
-                    "accessUrl": access_url,
-                    "data": ciphertext.hex(),
-                    "capsule": bytes(capsule).hex(),
-                    "kfrags": [bytes(kfrag).hex() for kfrag in kfrags],
-                }
-            ],
-            "encryption": {
-                "type": "PyUmbral",
-                "publicKey": bytes(owner_public_key).hex(),
-            },
-        }
-        return did_document
+        access = _access_entry(access_url, ciphertext, bytes(capsule), [bytes(kfrag) for kfrag in kfrags])
+        return _json_view(
+            data_asset_id,
+            datetime.now(timezone.utc).isoformat(),
+            bytes(owner_public_key),
+            [access],
+        )
     except (ValueError, InvalidKeyFrag) as e:
         raise e
     except Exception as e:
         raise ValueError(f"Error occurred while creating DID document: {str(e)}") from e
+
+
+def encode_grant(consumer_public_key: Union[PublicKey, bytes], policy_id: str) -> bytes:
+    """
+    Encode an access grant: the consumer's public key followed by the policy ID.
+
+    Args:
+        consumer_public_key (Union[PublicKey, bytes]): Public key of the consumer.
+        policy_id (str): Identifier of the policy holding the consumer's kfrags.
+
+    Returns:
+        bytes: The encoded grant.
+    """
+    return bytes(consumer_public_key) + policy_id.encode()
+
+
+def encode_did_document(
+    data_asset_id: str,
+    access_url: str,
+    owner_public_key: PublicKey,
+    capsule: Capsule,
+    grants: Iterable[Tuple[bytes, str]],
+    created: Optional[str] = None,
+    chunks: int = 0,
+    blob: Optional[bytes] = None,
+    compression: Optional[str] = None,
+    extent: Optional[BlobExtent] = None,
+    version: int = 0
+) -> bytes:
+    """
+    Create a DID document for a data asset in the compact binary format.
+
+    Binary fields (capsule, public keys) are stored as raw bytes instead of hex
+    strings. Neither the ciphertext nor key fragments are embedded: the
+    ciphertext is stored separately and each grant references the policy
+    holding the consumer's kfrags, so grants can change without rewriting the
+    ciphertext.
+
+    Args:
+        data_asset_id (str): Unique identifier for the data asset.
+        access_url (str): URL or link to access the data asset.
+        owner_public_key (PublicKey): Public key of the data owner.
+        capsule (Capsule): Capsule used for encryption.
+        grants (Iterable[Tuple[bytes, str]]): Pairs of serialized consumer public key and policy ID.
+        created (Optional[str]): ISO 8601 creation timestamp. Defaults to the current time.
+        chunks (int): Number of separately stored ciphertext chunks for streamed assets.
+        blob (Optional[bytes]): Digest of the shared content-addressed ciphertext, for
+            deduplicated assets.
+        compression (Optional[str]): Codec the payload was compressed with before encryption.
+        extent (Optional[BlobExtent]): Location of the ciphertext, for assets stored in a blob file.
+        version (int): Version of the asset set by its owner, 0 if unversioned.
+
+    Returns:
+        bytes: The encoded DID document.
+
+    Raises:
+        ValueError: If any of the required parameters are missing or invalid.
+    """
+    _validate_did_inputs(data_asset_id, access_url, owner_public_key, capsule)
+    fields = [
+        (FIELD_ID, data_asset_id.encode()),
+        (FIELD_CREATED, (created or datetime.now(timezone.utc).isoformat()).encode()),
+        (FIELD_ACCESS_URL, access_url.encode()),
+        (FIELD_PUBLIC_KEY, bytes(owner_public_key)),
+        (FIELD_CAPSULE, bytes(capsule)),
+    ]
+    for consumer_public_key, policy_id in grants:
+        if len(consumer_public_key) != _PUBLIC_KEY_SIZE or not policy_id:
+            raise ValueError("Invalid grant.")
+        fields.append((FIELD_GRANT, encode_grant(consumer_public_key, policy_id)))
+    if chunks:
+        fields.append((FIELD_CHUNKS, _COUNT.pack(chunks)))
+    if blob:
+        fields.append((FIELD_BLOB, blob))
+    if compression:
+        fields.append((FIELD_COMPRESSION, compression.encode()))
+    if extent:
+        fields.append((FIELD_EXTENT, _EXTENT.pack(*extent)))
+    if version:
+        fields.append((FIELD_VERSION, _VERSION.pack(version)))
+
+    return _encode_fields(fields)
+
+
+def _encode_fields(fields: Iterable[Tuple[int, Union[bytes, memoryview]]]) -> bytes:
+    parts = [DID_MAGIC]
+    for tag, value in fields:
+        parts.append(_FIELD_HEADER.pack(tag, len(value)))
+        parts.append(value)
+    return b''.join(parts)
+
+
+def _iter_fields(view: memoryview) -> Iterable[Tuple[int, memoryview]]:
+    if bytes(view[:len(DID_MAGIC)]) != DID_MAGIC:
+        raise ValueError("Invalid DID document: unknown format.")
+    offset = len(DID_MAGIC)
+    while offset < len(view):
+        if offset + _FIELD_HEADER.size > len(view):
+            raise ValueError("Invalid DID document: truncated field header.")
+        tag, length = _FIELD_HEADER.unpack_from(view, offset)
+        offset += _FIELD_HEADER.size
+        if offset + length > len(view):
+            raise ValueError("Invalid DID document: truncated field value.")
+        yield tag, view[offset:offset + length]
+        offset += length
+
+
+def _decode_chunks(value: memoryview) -> int:
+    if len(value) != _COUNT.size:
+        raise ValueError("Invalid DID document: malformed chunk count.")
+    return _COUNT.unpack(value)[0]
+
+
+def _decode_extent(value: memoryview) -> BlobExtent:
+    if len(value) != _EXTENT.size:
+        raise ValueError("Invalid DID document: malformed blob extent.")
+    return BlobExtent(*_EXTENT.unpack(value))
+
+
+def _decode_version(value: memoryview) -> int:
+    if len(value) != _VERSION.size:
+        raise ValueError("Invalid DID document: malformed version.")
+    return _VERSION.unpack(value)[0]
+
+
+def replace_grants(buffer: Union[bytes, memoryview], grants: Iterable[Tuple[bytes, str]]) -> bytes:
+    """
+    Re-encode a binary DID document with a new set of grants.
+
+    All other fields are copied verbatim, so no key material is parsed.
+
+    Args:
+        buffer (Union[bytes, memoryview]): The encoded DID document.
+        grants (Iterable[Tuple[bytes, str]]): Pairs of serialized consumer public key and policy ID.
+
+    Returns:
+        bytes: The encoded DID document with the new grants.
+
+    Raises:
+        ValueError: If the buffer is not a valid binary DID document.
+    """
+    fields = [(tag, value) for tag, value in _iter_fields(memoryview(buffer)) if tag != FIELD_GRANT]
+    fields.extend((FIELD_GRANT, encode_grant(consumer_public_key, policy_id))
+                  for consumer_public_key, policy_id in grants)
+    return _encode_fields(fields)
+
+
+def decode_did_document(buffer: Union[bytes, memoryview]) -> Dict[str, Any]:
+    """
+    Decode a binary DID document.
+
+    Binary fields are returned as memoryview slices of the given buffer, so no
+    key material is copied.
+
+    Args:
+        buffer (Union[bytes, memoryview]): The encoded DID document.
+
+    Returns:
+        Dict[str, Any]: The decoded fields: ``id``, ``created``, ``accessUrl`` and,
+        for compressed payloads, ``compression`` as strings, ``publicKey`` and ``capsule`` as memoryviews, ``chunks`` as an
+        integer, ``blob`` as a memoryview or None, ``extent`` as a BlobExtent or
+        None, ``version`` as an integer and ``grants`` as a dictionary mapping serialized consumer public keys
+        to policy IDs.
+
+    Raises:
+        ValueError: If the buffer is not a valid binary DID document.
+    """
+    document: Dict[str, Any] = {'grants': {}, 'chunks': 0, 'blob': None, 'extent': None, 'version': 0}
+    for tag, value in _iter_fields(memoryview(buffer)):
+        if tag in _TEXT_FIELDS:
+            document[_TEXT_FIELDS[tag]] = str(value, 'utf-8')
+        elif tag in _BINARY_FIELDS:
+            document[_BINARY_FIELDS[tag]] = value
+        elif tag == FIELD_GRANT:
+            document['grants'][bytes(value[:_PUBLIC_KEY_SIZE])] = str(value[_PUBLIC_KEY_SIZE:], 'utf-8')
+        elif tag == FIELD_CHUNKS:
+            document['chunks'] = _decode_chunks(value)
+        elif tag == FIELD_BLOB:
+            document['blob'] = value
+        elif tag == FIELD_EXTENT:
+            document['extent'] = _decode_extent(value)
+        elif tag == FIELD_VERSION:
+            document['version'] = _decode_version(value)
+        # Unknown tags are skipped for forward compatibility
+
+    missing = [name for name in ('id', 'accessUrl', 'publicKey', 'capsule') if name not in document]
+    if missing:
+        raise ValueError(f"Invalid DID document: missing fields {', '.join(missing)}.")
+    return document
+
+
+class AssetRecord:
+    """
+    Decoded binary DID document of a stored asset.
+
+    Fields are held in slots as raw bytes and strings, without per-instance
+    dictionaries or hex strings; the W3C DID JSON view is only built by to_json.
+
+    Args:
+        asset_id (str): Unique identifier for the data asset.
+        access_url (str): URL or link to access the data asset.
+        public_key (bytes): Serialized public key of the data owner.
+        capsule (bytes): Serialized capsule used for encryption.
+        grants (Iterable[Tuple[bytes, str]]): Pairs of serialized consumer public key and policy ID.
+        created (str): ISO 8601 creation timestamp.
+        chunks (int): Number of separately stored ciphertext chunks for streamed assets.
+        blob (Optional[bytes]): Digest of the shared content-addressed ciphertext, for
+            deduplicated assets.
+        compression (str): Codec the payload was compressed with before encryption, or
+            an empty string.
+        extent (Optional[BlobExtent]): Location of the ciphertext, for assets stored in a blob file.
+        version (int): Version of the asset set by its owner, 0 if unversioned.
+    """
+
+    __slots__ = ('asset_id', 'access_url', 'public_key', 'capsule', 'grants', 'created', 'chunks', 'blob',
+                 'compression', 'extent', 'version')
+
+    def __init__(
+        self,
+        asset_id: str,
+        access_url: str,
+        public_key: bytes,
+        capsule: bytes,
+        grants: Iterable[Tuple[bytes, str]] = (),
+        created: str = '',
+        chunks: int = 0,
+        blob: Optional[bytes] = None,
+        compression: str = '',
+        extent: Optional[BlobExtent] = None,
+        version: int = 0
+    ):
+        self.asset_id = asset_id
+        self.access_url = access_url
+        self.public_key = public_key
+        self.capsule = capsule
+        self.grants: Tuple[Tuple[bytes, str], ...] = tuple(grants)
+        self.created = created
+        self.chunks = chunks
+        self.blob = blob
+        self.compression = compression
+        self.extent = extent
+        self.version = version
+
+    @classmethod
+    def from_bytes(cls, buffer: Union[bytes, memoryview]) -> 'AssetRecord':
+        """
+        Decode a binary DID document.
+
+        Args:
+            buffer (Union[bytes, memoryview]): The encoded DID document.
+
+        Returns:
+            AssetRecord: The decoded record.
+
+        Raises:
+            ValueError: If the buffer is not a valid binary DID document.
+        """
+        text: Dict[int, str] = {}
+        binary: Dict[int, bytes] = {}
+        grants = []
+        chunks = 0
+        blob = None
+        extent = None
+        version = 0
+        for tag, value in _iter_fields(memoryview(buffer)):
+            if tag in _TEXT_FIELDS:
+                text[tag] = str(value, 'utf-8')
+            elif tag in _BINARY_FIELDS:
+                binary[tag] = bytes(value)
+            elif tag == FIELD_GRANT:
+                grants.append((bytes(value[:_PUBLIC_KEY_SIZE]), str(value[_PUBLIC_KEY_SIZE:], 'utf-8')))
+            elif tag == FIELD_CHUNKS:
+                chunks = _decode_chunks(value)
+            elif tag == FIELD_BLOB:
+                blob = bytes(value)
+            elif tag == FIELD_EXTENT:
+                extent = _decode_extent(value)
+            elif tag == FIELD_VERSION:
+                version = _decode_version(value)
+
+        missing = [_TEXT_FIELDS[tag] for tag in (FIELD_ID, FIELD_ACCESS_URL) if tag not in text]
+        missing += [name for tag, name in _BINARY_FIELDS.items() if tag not in binary]
+        if missing:
+            raise ValueError(f"Invalid DID document: missing fields {', '.join(missing)}.")
+        return cls(text[FIELD_ID], text[FIELD_ACCESS_URL], binary[FIELD_PUBLIC_KEY], binary[FIELD_CAPSULE],
+                   grants, text.get(FIELD_CREATED, ''), chunks, blob, text.get(FIELD_COMPRESSION, ''), extent,
+                   version)
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the record in the binary DID document format.
+
+        Returns:
+            bytes: The encoded DID document.
+        """
+        fields = [
+            (FIELD_ID, self.asset_id.encode()),
+            (FIELD_CREATED, self.created.encode()),
+            (FIELD_ACCESS_URL, self.access_url.encode()),
+            (FIELD_PUBLIC_KEY, self.public_key),
+            (FIELD_CAPSULE, self.capsule),
+        ]
+        fields.extend((FIELD_GRANT, encode_grant(consumer, policy_id)) for consumer, policy_id in self.grants)
+        if self.chunks:
+            fields.append((FIELD_CHUNKS, _COUNT.pack(self.chunks)))
+        if self.blob:
+            fields.append((FIELD_BLOB, self.blob))
+        if self.compression:
+            fields.append((FIELD_COMPRESSION, self.compression.encode()))
+        if self.extent:
+            fields.append((FIELD_EXTENT, _EXTENT.pack(*self.extent)))
+        if self.version:
+            fields.append((FIELD_VERSION, _VERSION.pack(self.version)))
+        return _encode_fields(fields)
+
+    def policy_for(self, consumer_public_key: Union[PublicKey, bytes]) -> Optional[str]:
+        """
+        Look up the policy granting a consumer access to the asset.
+
+        Args:
+            consumer_public_key (Union[PublicKey, bytes]): The consumer's public key.
+
+        Returns:
+            Optional[str]: The policy ID, or None if the consumer has no grant.
+        """
+        consumer = bytes(consumer_public_key)
+        for grantee, policy_id in self.grants:
+            if grantee == consumer:
+                return policy_id
+        return None
+
+    def to_json(
+        self,
+        ciphertext: Optional[Union[bytes, memoryview]] = None,
+        kfrags: Optional[Mapping[str, Sequence[Union[bytes, memoryview]]]] = None
+    ) -> Dict:
+        """
+        Produce the W3C DID JSON representation, with one access entry per grant.
+
+        Args:
+            ciphertext (Optional[Union[bytes, memoryview]]): Ciphertext to include in each access entry.
+            kfrags (Optional[Mapping[str, Sequence[Union[bytes, memoryview]]]]): Serialized kfrags
+                of each referenced policy, keyed by policy ID.
+
+        Returns:
+            Dict: DID document with hex-encoded binary fields, as returned by create_did_document.
+        """
+        return did_document_to_json({
+            'id': self.asset_id,
+            'created': self.created,
+            'accessUrl': self.access_url,
+            'publicKey': self.public_key,
+            'capsule': self.capsule,
+            'chunks': self.chunks,
+            'compression': self.compression,
+            'grants': dict(self.grants),
+        }, ciphertext, kfrags)
+
+
+def did_document_to_json(
+    document: Dict[str, Any],
+    ciphertext: Optional[Union[bytes, memoryview]] = None,
+    kfrags: Optional[Mapping[str, Sequence[Union[bytes, memoryview]]]] = None
+) -> Dict:
+    """
+    Produce the W3C DID JSON representation of a decoded binary DID document.
+
+    The ``access`` list holds one entry per grant.
+
+    Args:
+        document (Dict[str, Any]): A document returned by decode_did_document.
+        ciphertext (Optional[Union[bytes, memoryview]]): Ciphertext to include in each access entry.
+        kfrags (Optional[Mapping[str, Sequence[Union[bytes, memoryview]]]]): Serialized kfrags
+            of each referenced policy, keyed by policy ID.
+
+    Returns:
+        Dict: DID document with hex-encoded binary fields, as returned by create_did_document.
+    """
+    kfrags = kfrags or {}
+    access = []
+    for consumer_public_key, policy_id in document['grants'].items():
+        entry = _access_entry(document['accessUrl'], ciphertext, document['capsule'], kfrags.get(policy_id, []))
+        entry["consumer"] = consumer_public_key.hex()
+        entry["policy"] = policy_id
+        if document['chunks']:
+            entry["chunks"] = document['chunks']
+        if document.get('compression'):
+            entry["compression"] = document['compression']
+        access.append(entry)
+    return _json_view(document['id'], document.get('created', ''), document['publicKey'], access)
@@ -1,11 +1,23 @@
-from typing import List, Tuple
+import struct
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from umbral import (
     SecretKey, PublicKey, Signer, Capsule,
     encrypt, decrypt_original, generate_kfrags, reencrypt, decrypt_reencrypted,
     VerifiedKeyFrag, KeyFrag, VerifiedCapsuleFrag
 )
+from umbral.dem import DEM
+from .metrics import instrumented
 
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
+# Streams derive their symmetric key separately from single-shot encryption
+_STREAM_DEM_INFO = b"mini-data-proxy/stream/v1"
+# Per-chunk associated data: chunk index and final-chunk flag
+_CHUNK_HEADER = struct.Struct('>Q?')
+
+
+@instrumented('encrypt_data', size_arg='data')
 def encrypt_data(data: bytes, public_key: PublicKey) -> Tuple[bytes, Capsule]:
     """
     Encrypts the given data using the provided public key.
@@ -21,6 +33,7 @@ def encrypt_data(data: bytes, public_key: PublicKey) -> Tuple[bytes, Capsule]:
     return ciphertext, capsule
 
 
+@instrumented('create_kfrags')
 def create_kfrags(
     delegating_sk: SecretKey,
     receiving_pk: PublicKey,
@@ -41,7 +54,6 @@ def create_kfrags(
     Returns:
         List[KeyFrag]: List of generated key fragments (kfrags).
     """
-    signer = Signer(delegating_sk)  # Ensure the signer is correctly initialized
     kfrags = generate_kfrags(
         delegating_sk=delegating_sk,
         receiving_pk=receiving_pk,
@@ -54,6 +66,7 @@ def create_kfrags(
     return kfrags
 
 
+@instrumented('reencrypt_data')
 def reencrypt_data(capsule: Capsule, verified_kfrag: VerifiedKeyFrag) -> VerifiedCapsuleFrag:
     """
     Reencrypts a capsule using a verified key fragment.
@@ -69,28 +82,101 @@ def reencrypt_data(capsule: Capsule, verified_kfrag: VerifiedKeyFrag) -> Verifie
     return cfrag
 
 
-def decrypt_data(secret_key: SecretKey, capsule: Capsule, ciphertext: bytes) -> bytes:
+def _reencrypt_serialized(capsule: bytes, kfrag: bytes) -> bytes:
+    """Re-encrypt in a worker process; umbral objects cannot be pickled."""
+    return bytes(reencrypt(Capsule.from_bytes(capsule), VerifiedKeyFrag.from_verified_bytes(kfrag)))
+
+
+def reencrypt_threshold(
+    capsule: Capsule,
+    verified_kfrags: Sequence[VerifiedKeyFrag],
+    threshold: int,
+    executor: Optional[Executor] = None
+) -> List[VerifiedCapsuleFrag]:
+    """
+    Reencrypts a capsule with just enough key fragments to reach the threshold.
+
+    Without an executor, kfrags are used one after another and re-encryption stops
+    once threshold cfrags are available. With an executor, every kfrag is
+    re-encrypted concurrently, as if by separate proxies; the first threshold
+    successful results are used and the remaining work is cancelled.
+
+    Args:
+        capsule (Capsule): The capsule associated with the ciphertext.
+        verified_kfrags (Sequence[VerifiedKeyFrag]): The verified key fragments of the policy.
+        threshold (int): Number of capsule fragments required for decryption.
+        executor (Optional[Executor]): Thread or process pool running the re-encryptions.
+
+    Returns:
+        List[VerifiedCapsuleFrag]: Exactly threshold capsule fragments.
+
+    Raises:
+        ValueError: If fewer than threshold capsule fragments could be produced.
+    """
+    cfrags: List[VerifiedCapsuleFrag] = []
+    if executor is None:
+        for kfrag in verified_kfrags:
+            try:
+                cfrags.append(reencrypt_data(capsule, kfrag))
+            except (ValueError, TypeError):
+                continue
+            if len(cfrags) >= threshold:
+                break
+    else:
+        if isinstance(executor, ProcessPoolExecutor):
+            capsule_bytes = bytes(capsule)
+            futures = [executor.submit(_reencrypt_serialized, capsule_bytes, bytes(kfrag))
+                       for kfrag in verified_kfrags]
+        else:
+            futures = [executor.submit(reencrypt_data, capsule, kfrag) for kfrag in verified_kfrags]
+        try:
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    continue
+                cfrag = future.result()
+                if isinstance(cfrag, bytes):
+                    cfrag = VerifiedCapsuleFrag.from_verified_bytes(cfrag)
+                cfrags.append(cfrag)
+                if len(cfrags) >= threshold:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+
+    if len(cfrags) < threshold:
+        raise ValueError(f"Only {len(cfrags)} of {threshold} required capsule fragments could be produced.")
+    return cfrags
+
+
+def _as_bytes(ciphertext: Union[bytes, memoryview]) -> bytes:
+    """PyUmbral's DEM and PyNaCl only accept bytes, so views are copied once here."""
+    return ciphertext if isinstance(ciphertext, bytes) else bytes(ciphertext)
+
+
+@instrumented('decrypt_data', size_arg='ciphertext')
+def decrypt_data(secret_key: SecretKey, capsule: Capsule, ciphertext: Union[bytes, memoryview]) -> bytes:
     """
     Decrypts data that was encrypted directly with the recipient's public key.
 
     Args:
         secret_key (SecretKey): The secret key of the receiver to decrypt the data.
         capsule (Capsule): The capsule associated with the ciphertext.
-        ciphertext (bytes): The encrypted data.
+        ciphertext (Union[bytes, memoryview]): The encrypted data.
 
     Returns:
         bytes: The decrypted data.
     """
-    decrypted_data = decrypt_original(secret_key, capsule, ciphertext)
+    decrypted_data = decrypt_original(secret_key, capsule, _as_bytes(ciphertext))
     return decrypted_data
 
 
+@instrumented('decrypt_reencrypted_data', size_arg='ciphertext')
 def decrypt_reencrypted_data(
     receiving_sk: SecretKey,
     delegating_pk: PublicKey,
     capsule: Capsule,
     verified_cfrags: List[VerifiedCapsuleFrag],
-    ciphertext: bytes
+    ciphertext: Union[bytes, memoryview]
 ) -> bytes:
     """
     Decrypts the re-encrypted data using the receiving party's secret key.
@@ -100,7 +186,7 @@ def decrypt_reencrypted_data(
         delegating_pk (PublicKey): Public key of the delegating party.
         capsule (Capsule): Capsule used for decryption.
         verified_cfrags (List[VerifiedCapsuleFrag]): List of verified re-encrypted capsule fragments.
-        ciphertext (bytes): Ciphertext to be decrypted.
+        ciphertext (Union[bytes, memoryview]): Ciphertext to be decrypted.
 
     Returns:
         bytes: Decrypted data.
@@ -110,7 +196,7 @@ def decrypt_reencrypted_data(
         delegating_pk=delegating_pk,
         capsule=capsule,
         verified_cfrags=verified_cfrags,
-        ciphertext=ciphertext
+        ciphertext=_as_bytes(ciphertext)
     )
     return decrypted_data
 
@@ -125,4 +211,131 @@ def deserialize_kfrag(hex_kfrag: str) -> KeyFrag:
     Returns:
         KeyFrag: The deserialized Kfrag object.
     """
-    return KeyFrag.from_bytes(bytes.fromhex(hex_kfrag))
\ No newline at end of file
+    return KeyFrag.from_bytes(bytes.fromhex(hex_kfrag))
+
+
+def iter_chunks(source: Union[BinaryIO, Iterable[bytes]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Split a file-like object or an iterable of byte strings into chunks.
+
+    Args:
+        source (Union[BinaryIO, Iterable[bytes]]): Readable binary file-like object or iterable of bytes.
+        chunk_size (int): Maximum size of each chunk in bytes.
+
+    Returns:
+        Iterator[bytes]: Chunks of at most chunk_size bytes. Only the last chunk may be shorter.
+
+    Raises:
+        ValueError: If chunk_size is not positive.
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive.")
+
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    buffer = bytearray()
+    for piece in source:
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _with_last_flag(chunks: Iterable[bytes]) -> Iterator[Tuple[int, bytes, bool]]:
+    """Yield (index, chunk, is_last) tuples, looking ahead by one chunk."""
+    iterator = iter(chunks)
+    current = next(iterator, None)
+    if current is None:
+        # An empty stream still produces one authenticated final chunk
+        yield 0, b"", True
+        return
+    index = 0
+    for upcoming in iterator:
+        yield index, current, False
+        current = upcoming
+        index += 1
+    yield index, current, True
+
+
+def _encrypt_chunks(dem: DEM, capsule_bytes: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    for index, chunk, is_last in _with_last_flag(chunks):
+        yield dem.encrypt(chunk, authenticated_data=capsule_bytes + _CHUNK_HEADER.pack(index, is_last))
+
+
+def _decrypt_chunks(dem: DEM, capsule_bytes: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    for index, chunk, is_last in _with_last_flag(chunks):
+        yield dem.decrypt(chunk, authenticated_data=capsule_bytes + _CHUNK_HEADER.pack(index, is_last))
+
+
+def encrypt_stream(
+    source: Union[BinaryIO, Iterable[bytes]],
+    public_key: PublicKey,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[Capsule, Iterator[bytes]]:
+    """
+    Encrypts a stream of data as independently authenticated chunks under a single capsule.
+
+    Each chunk is authenticated together with the capsule, its index and a final-chunk
+    flag, so chunks cannot be reordered, dropped or truncated without detection.
+
+    Args:
+        source (Union[BinaryIO, Iterable[bytes]]): Readable binary file-like object or iterable of bytes.
+        public_key (PublicKey): Public key used for encryption.
+        chunk_size (int): Maximum plaintext size of each chunk in bytes.
+
+    Returns:
+        Tuple[Capsule, Iterator[bytes]]: The capsule and a lazy iterator over the encrypted chunks.
+    """
+    capsule, key_seed = Capsule.from_public_key(public_key)
+    dem = DEM(bytes(key_seed), info=_STREAM_DEM_INFO)
+    return capsule, _encrypt_chunks(dem, bytes(capsule), iter_chunks(source, chunk_size))
+
+
+def decrypt_stream(secret_key: SecretKey, capsule: Capsule, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Decrypts a chunked stream that was encrypted directly with the recipient's public key.
+
+    Args:
+        secret_key (SecretKey): The secret key of the receiver to decrypt the data.
+        capsule (Capsule): The capsule associated with the stream.
+        chunks (Iterable[bytes]): The encrypted chunks, in order.
+
+    Returns:
+        Iterator[bytes]: A lazy iterator over the decrypted chunks.
+    """
+    key_seed = capsule.open_original(secret_key)
+    dem = DEM(bytes(key_seed), info=_STREAM_DEM_INFO)
+    return _decrypt_chunks(dem, bytes(capsule), chunks)
+
+
+def decrypt_reencrypted_stream(
+    receiving_sk: SecretKey,
+    delegating_pk: PublicKey,
+    capsule: Capsule,
+    verified_cfrags: List[VerifiedCapsuleFrag],
+    chunks: Iterable[bytes]
+) -> Iterator[bytes]:
+    """
+    Decrypts a re-encrypted chunked stream using the receiving party's secret key.
+
+    Args:
+        receiving_sk (SecretKey): Secret key of the receiving party.
+        delegating_pk (PublicKey): Public key of the delegating party.
+        capsule (Capsule): Capsule used for decryption.
+        verified_cfrags (List[VerifiedCapsuleFrag]): List of verified re-encrypted capsule fragments.
+        chunks (Iterable[bytes]): The encrypted chunks, in order.
+
+    Returns:
+        Iterator[bytes]: A lazy iterator over the decrypted chunks.
+    """
+    cfrags = [vcfrag.cfrag for vcfrag in verified_cfrags]
+    key_seed = capsule.open_reencrypted(receiving_sk, delegating_pk, cfrags)
+    dem = DEM(bytes(key_seed), info=_STREAM_DEM_INFO)
+    return _decrypt_chunks(dem, bytes(capsule), chunks)
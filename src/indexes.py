@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Set, Tuple, Union
+from umbral import PublicKey
+from .did_document import AssetRecord
+from .storage import StorageBackend, get_storage
+
+OWNER_INDEX = 'index_owner'
+CONSUMER_INDEX = 'index_consumer'
+CREATED_INDEX = 'index_created'
+INDEXES = (OWNER_INDEX, CONSUMER_INDEX, CREATED_INDEX)
+
+# Separates the indexed value from the asset ID; it sorts before every hex digit
+# and timestamp character, so all entries of one value are contiguous
+_SEPARATOR = '/'
+_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+def _timestamp(value: Union[datetime, str]) -> str:
+    """Normalize a timestamp to UTC with a fixed width so index keys sort chronologically."""
+    if isinstance(value, str):
+        text = value
+        # fromisoformat only accepts a 'Z' suffix from Python 3.11 on
+        if text.endswith(('Z', 'z')):
+            text = text[:-1] + '+00:00'
+        try:
+            value = datetime.fromisoformat(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid ISO 8601 timestamp '{value}'.") from e
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime(_TIMESTAMP_FORMAT)
+
+
+def _key_text(key: Union[PublicKey, bytes, memoryview]) -> str:
+    return bytes(key).hex()
+
+
+def index_entries(record: AssetRecord) -> Set[Tuple[str, str]]:
+    """
+    Compute the index entries of an asset.
+
+    Args:
+        record (AssetRecord): The asset's decoded DID document.
+
+    Returns:
+        Set[Tuple[str, str]]: Pairs of index collection and entry key.
+    """
+    asset_id = record.asset_id
+    entries = {
+        (OWNER_INDEX, record.public_key.hex() + _SEPARATOR + asset_id),
+        (CREATED_INDEX, _timestamp(record.created) + _SEPARATOR + asset_id),
+    }
+    entries.update((CONSUMER_INDEX, consumer.hex() + _SEPARATOR + asset_id)
+                   for consumer, _ in record.grants)
+    return entries
+
+
+def update_indexes(
+    storage: StorageBackend,
+    previous: Optional[AssetRecord],
+    current: Optional[AssetRecord]
+) -> None:
+    """
+    Apply the index changes between two versions of an asset's record.
+
+    Only entries that differ are written or deleted, so a grant change touches a
+    single consumer entry.
+
+    Args:
+        storage (StorageBackend): The storage holding the indexes.
+        previous (Optional[AssetRecord]): The record before the change, or None for a new asset.
+        current (Optional[AssetRecord]): The record after the change, or None for a deleted asset.
+    """
+    removed, added = index_changes(previous, current)
+    for collection, key in removed:
+        storage.delete(collection, key)
+    for collection, key in added:
+        storage.put(collection, key, b'')
+
+
+def index_changes(
+    previous: Optional[AssetRecord],
+    current: Optional[AssetRecord]
+) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+    """
+    Compute the index entries to remove and to add between two versions of an asset's record.
+
+    Args:
+        previous (Optional[AssetRecord]): The record before the change, or None for a new asset.
+        current (Optional[AssetRecord]): The record after the change, or None for a deleted asset.
+
+    Returns:
+        Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]: The entries to remove and
+        the entries to add, as pairs of index collection and entry key.
+    """
+    old = index_entries(previous) if previous is not None else set()
+    new = index_entries(current) if current is not None else set()
+    return old - new, new - old
+
+
+def _prefix_end(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with prefix."""
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _asset_ids(keys: Iterator[str]) -> Iterator[str]:
+    for key in keys:
+        yield key.split(_SEPARATOR, 1)[1]
+
+
+def _by_key(
+    database: Union[Dict[str, Any], StorageBackend],
+    collection: str,
+    public_key: Union[PublicKey, bytes, str],
+    after: Optional[str] = None
+) -> Iterator[str]:
+    storage = get_storage(database)
+    if isinstance(public_key, str):
+        if after is not None:
+            raise ValueError("Resuming a scan requires a full public key.")
+        prefix = public_key.lower()
+    else:
+        prefix = _key_text(public_key) + _SEPARATOR
+    # The smallest key sorting after the entry of the given asset
+    start = prefix + after + '\0' if after is not None else prefix
+    return _asset_ids(storage.scan(collection, start, _prefix_end(prefix)))
+
+
+def assets_by_owner(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: Union[PublicKey, bytes, str],
+    after: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Find the assets owned by a public key.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        owner_public_key (Union[PublicKey, bytes, str]): The owner's public key, or a
+            hex prefix of it to match every owner whose key starts with the prefix.
+        after (Optional[str]): Only return assets whose ID sorts after this one, to
+            resume a previous scan. Requires a full public key.
+
+    Returns:
+        Iterator[str]: IDs of the matching assets, ordered by owner key and asset ID.
+    """
+    return _by_key(database, OWNER_INDEX, owner_public_key, after)
+
+
+def assets_by_consumer(
+    database: Union[Dict[str, Any], StorageBackend],
+    consumer_public_key: Union[PublicKey, bytes, str],
+    after: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Find the assets a consumer has been granted access to.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        consumer_public_key (Union[PublicKey, bytes, str]): The consumer's public key, or a
+            hex prefix of it to match every consumer whose key starts with the prefix.
+        after (Optional[str]): Only return assets whose ID sorts after this one, to
+            resume a previous scan. Requires a full public key.
+
+    Returns:
+        Iterator[str]: IDs of the matching assets, ordered by consumer key and asset ID.
+    """
+    return _by_key(database, CONSUMER_INDEX, consumer_public_key, after)
+
+
+def assets_created(
+    database: Union[Dict[str, Any], StorageBackend],
+    since: Optional[Union[datetime, str]] = None,
+    until: Optional[Union[datetime, str]] = None
+) -> Iterator[str]:
+    """
+    Find the assets created within a time range.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        since (Optional[Union[datetime, str]]): Earliest creation time, included. Naive
+            datetimes are taken as UTC.
+        until (Optional[Union[datetime, str]]): Latest creation time, excluded.
+
+    Returns:
+        Iterator[str]: IDs of the matching assets, oldest first.
+
+    Raises:
+        ValueError: If since or until is a string that is not an ISO 8601 timestamp.
+    """
+    storage = get_storage(database)
+    start = _timestamp(since) if since is not None else ''
+    stop = _timestamp(until) if until is not None else None
+    return _asset_ids(storage.scan(CREATED_INDEX, start, stop))
@@ -0,0 +1,400 @@
+import bisect
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from .blobfile import BlobFile
+from .cache import LRUCache
+from .storage import StorageBackend
+
+DEFAULT_WAL_LIMIT = 64 * 1024 * 1024
+
+WAL_MAGIC = b'DPWAL001'
+SNAPSHOT_MAGIC = b'DPSNAP01'
+
+# Entry kinds: values stored as raw bytes or as JSON text, and deletions
+KIND_BYTES = 1
+KIND_JSON = 2
+KIND_DELETE = 3
+
+# Log entry: kind, collection length, key length, value length and CRC-32 of the
+# value, followed by the collection, the key and the value
+_ENTRY = struct.Struct('>BBHQI')
+# Snapshot index entry: kind, collection length, key length, value offset, value
+# length and CRC-32, followed by the collection and the key
+_INDEX_ENTRY = struct.Struct('>BBHQQI')
+# Snapshot footer: offset of the index block, number of entries and the magic
+_FOOTER = struct.Struct('>QQ8s')
+
+_FILE_NAME = re.compile(r'^(wal|snapshot)-(\d+)\.log$')
+
+
+class StorageCorruption(Exception):
+    """Exception raised when a stored value does not match its checksum."""
+    pass
+
+
+class _Segment:
+    """An open log or snapshot file that values are read from by offset."""
+
+    def __init__(self, path: str, file: BinaryIO):
+        self.path = path
+        self.file = file
+
+    def read(self, offset: int, length: int) -> bytes:
+        return os.pread(self.file.fileno(), length, offset)
+
+
+# Location of a live value: segment, value offset, value length, CRC-32 and kind
+_Location = Tuple[_Segment, int, int, int, int]
+
+
+class LogStorage(StorageBackend):
+    """
+    Storage backend persisting writes to a write-ahead log with periodic snapshots.
+
+    Every put and delete is appended to the log, so the store, grant and revoke
+    operations of the database module are durable as soon as they return. Once the
+    log exceeds wal_limit, a compact snapshot of the live values is written in the
+    background and the log is restarted.
+
+    Opening the storage only reads the snapshot's index block and replays the log
+    tail: it maps every key to the offset of its value, and values are read and
+    decoded on first access. Startup time therefore depends on the number of keys,
+    not on the size of the stored data.
+
+    Args:
+        path (str): Directory holding the log and snapshot files; created if missing.
+        object_cache (Optional[LRUCache]): Cache of parsed capsules and kfrags.
+        cfrag_cache (Optional[LRUCache]): Cache of capsule fragments.
+        blob_file (Optional[BlobFile]): Memory-mapped file for large ciphertexts.
+        sync (bool): Whether to fsync the log after every write, so acknowledged writes
+            survive a power failure and not only a process crash.
+        wal_limit (int): Log size in bytes after which a snapshot is taken. 0 disables
+            automatic snapshots.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        object_cache: Optional[LRUCache] = None,
+        cfrag_cache: Optional[LRUCache] = None,
+        blob_file: Optional[BlobFile] = None,
+        sync: bool = False,
+        wal_limit: int = DEFAULT_WAL_LIMIT
+    ):
+        super().__init__(object_cache, cfrag_cache, blob_file)
+        self.path = path
+        self.sync = sync
+        self.wal_limit = wal_limit
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._index: Dict[str, Dict[str, _Location]] = {}
+        # Sorted keys of the collections that have been scanned, kept up to date on writes
+        self._sorted: Dict[str, List[str]] = {}
+        self._segments: List[_Segment] = []
+        # Segments replaced by a snapshot; closed by the next one, so that reads that
+        # looked up a location just before the swap can still complete
+        self._retired: List[_Segment] = []
+        # The log file appended to and its size; set by _open
+        self._wal: Optional[_Segment] = None
+        self._wal_size = 0
+        self._generation = 0
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _file(self, kind: str, generation: int) -> str:
+        return os.path.join(self.path, f"{kind}-{generation}.log")
+
+    def _open(self) -> None:
+        """Load the latest snapshot's index, replay the logs written since and open the log."""
+        generations: Dict[str, List[int]] = {'wal': [], 'snapshot': []}
+        for name in os.listdir(self.path):
+            match = _FILE_NAME.match(name)
+            if match:
+                generations[match.group(1)].append(int(match.group(2)))
+            elif name.endswith('.tmp'):
+                # An interrupted snapshot
+                os.remove(os.path.join(self.path, name))
+
+        snapshot = max(generations['snapshot'], default=0)
+        if snapshot:
+            self._load_snapshot(self._file('snapshot', snapshot))
+        logs = sorted(generation for generation in generations['wal'] if generation >= snapshot)
+        for generation in logs:
+            self._replay(self._file('wal', generation))
+        self._remove_older(snapshot)
+
+        self._generation = logs[-1] if logs else snapshot
+        if logs:
+            self._wal = self._segments[-1]
+            self._wal_size = os.fstat(self._wal.file.fileno()).st_size
+        else:
+            self._wal, self._wal_size = self._create_wal(self._generation)
+            self._segments.append(self._wal)
+
+    def _remove_older(self, generation: int) -> None:
+        """Delete snapshots and logs superseded by the snapshot of the given generation."""
+        for name in os.listdir(self.path):
+            match = _FILE_NAME.match(name)
+            if match and int(match.group(2)) < generation:
+                os.remove(os.path.join(self.path, name))
+
+    def _create_wal(self, generation: int) -> Tuple[_Segment, int]:
+        path = self._file('wal', generation)
+        file = open(path, 'a+b')
+        if file.tell() == 0:
+            file.write(WAL_MAGIC)
+            file.flush()
+        return _Segment(path, file), file.tell()
+
+    def _load_snapshot(self, path: str) -> None:
+        file = open(path, 'rb')
+        size = os.fstat(file.fileno()).st_size
+        file.seek(size - _FOOTER.size)
+        index_offset, count, magic = _FOOTER.unpack(file.read(_FOOTER.size))
+        if magic != SNAPSHOT_MAGIC:
+            file.close()
+            raise StorageCorruption(f"Invalid snapshot file: {path}.")
+        file.seek(index_offset)
+        block = file.read(size - _FOOTER.size - index_offset)
+        segment = _Segment(path, file)
+        self._segments.append(segment)
+
+        # Collection names are shared by many entries; decode each only once
+        names: Dict[bytes, str] = {}
+        position = 0
+        for _ in range(count):
+            kind, collection_length, key_length, offset, length, crc = _INDEX_ENTRY.unpack_from(block, position)
+            position += _INDEX_ENTRY.size
+            raw = block[position:position + collection_length]
+            collection = names.get(raw)
+            if collection is None:
+                collection = names[raw] = raw.decode()
+            position += collection_length
+            key = block[position:position + key_length].decode()
+            position += key_length
+            self._index.setdefault(collection, {})[key] = (segment, offset, length, crc, kind)
+
+    def _replay(self, path: str) -> None:
+        """
+        Apply the entries of a log, truncating a torn tail left by a crash.
+
+        Raises:
+            StorageCorruption: If an entry before the end of the log fails its checksum.
+        """
+        file = open(path, 'a+b')
+        file.seek(0)
+        data = file.read()
+        segment = _Segment(path, file)
+        self._segments.append(segment)
+        position = len(WAL_MAGIC) if data.startswith(WAL_MAGIC) else 0
+        valid = position
+        while position + _ENTRY.size <= len(data):
+            kind, collection_length, key_length, length, crc = _ENTRY.unpack_from(data, position)
+            start = position + _ENTRY.size
+            offset = start + collection_length + key_length
+            end = offset + length
+            if end > len(data):
+                break
+            if zlib.crc32(data[offset:end]) != crc:
+                # Only the last entry can be incomplete after a crash
+                if end == len(data):
+                    break
+                file.close()
+                raise StorageCorruption(f"Log entry at offset {position} of {path} does not match its checksum.")
+            collection = data[start:start + collection_length].decode()
+            key = data[start + collection_length:offset].decode()
+            if kind == KIND_DELETE:
+                self._index.get(collection, {}).pop(key, None)
+            else:
+                self._index.setdefault(collection, {})[key] = (segment, offset, length, crc, kind)
+            position = valid = end
+        if valid < len(data):
+            file.truncate(valid)
+        if valid == 0:
+            file.write(WAL_MAGIC)
+            file.flush()
+
+    def _append(self, kind: int, collection: str, key: str, value: bytes = b'', flush: bool = True) -> _Location:
+        """Append an entry to the log, flushing it unless flush is False. Callers hold _lock."""
+        collection_bytes, key_bytes = collection.encode(), key.encode()
+        if len(collection_bytes) > 0xFF or len(key_bytes) > 0xFFFF:
+            raise ValueError("Collection or key name too long.")
+        crc = zlib.crc32(value)
+        file = self._wal.file
+        file.write(_ENTRY.pack(kind, len(collection_bytes), len(key_bytes), len(value), crc))
+        file.write(collection_bytes)
+        file.write(key_bytes)
+        file.write(value)
+        if flush:
+            self._flush()
+        offset = self._wal_size + _ENTRY.size + len(collection_bytes) + len(key_bytes)
+        self._wal_size = offset + len(value)
+        return self._wal, offset, len(value), crc, kind
+
+    def _flush(self) -> None:
+        """Flush appended entries to the log file. Callers hold _lock."""
+        self._wal.file.flush()
+        if self.sync:
+            os.fsync(self._wal.file.fileno())
+
+    @staticmethod
+    def _encode(value: Any) -> Tuple[int, bytes]:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return KIND_BYTES, bytes(value)
+        return KIND_JSON, json.dumps(value, separators=(",", ":")).encode()
+
+    def _set(self, collection: str, key: str, location: _Location) -> None:
+        """Point a key at its new value. Callers hold _lock."""
+        values = self._index.setdefault(collection, {})
+        keys = self._sorted.get(collection)
+        if keys is not None and key not in values:
+            bisect.insort(keys, key)
+        values[key] = location
+
+    def get(self, collection: str, key: str) -> Optional[Any]:
+        with self._lock:
+            location = self._index.get(collection, {}).get(key)
+        if location is None:
+            return None
+        segment, offset, length, crc, kind = location
+        value = segment.read(offset, length)
+        if zlib.crc32(value) != crc:
+            raise StorageCorruption(f"Stored value of {collection}/{key} does not match its checksum.")
+        return value if kind == KIND_BYTES else json.loads(value)
+
+    def put(self, collection: str, key: str, value: Any) -> None:
+        kind, encoded = self._encode(value)
+        with self._lock:
+            self._set(collection, key, self._append(kind, collection, key, encoded))
+            self._maybe_snapshot()
+
+    def put_many(self, items: Iterable[Tuple[str, str, Any]]) -> None:
+        # The batch is flushed, and synced if enabled, once instead of per value
+        encoded = [(collection, key, *self._encode(value)) for collection, key, value in items]
+        with self._lock:
+            try:
+                for collection, key, kind, value in encoded:
+                    self._set(collection, key, self._append(kind, collection, key, value, flush=False))
+            finally:
+                self._flush()
+            self._maybe_snapshot()
+
+    def delete(self, collection: str, key: str) -> bool:
+        with self._lock:
+            values = self._index.get(collection, {})
+            if key not in values:
+                return False
+            self._append(KIND_DELETE, collection, key)
+            del values[key]
+            keys = self._sorted.get(collection)
+            if keys is not None:
+                del keys[bisect.bisect_left(keys, key)]
+            self._maybe_snapshot()
+        return True
+
+    def keys(self, collection: str) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._index.get(collection, {})))
+
+    def contains(self, collection: str, key: str) -> bool:
+        with self._lock:
+            return key in self._index.get(collection, {})
+
+    def scan(self, collection: str, start: str = '', stop: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            keys = self._sorted.get(collection)
+            if keys is None:
+                keys = self._sorted[collection] = sorted(self._index.get(collection, {}))
+            begin = bisect.bisect_left(keys, start)
+            end = len(keys) if stop is None else bisect.bisect_left(keys, stop)
+            return iter(keys[begin:end])
+
+    def _maybe_snapshot(self) -> None:
+        """Start a background snapshot once the log is over its limit. Callers hold _lock."""
+        if not self.wal_limit or self._wal_size < self.wal_limit:
+            return
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        self._snapshot_thread = threading.Thread(target=self.snapshot, name="log-storage-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def snapshot(self) -> None:
+        """
+        Write a compact snapshot of the live values and discard the logs it covers.
+
+        Writes continue while the snapshot is written: the log is switched to a new
+        file first, and the snapshot only holds the values written before the switch.
+        """
+        with self._snapshot_lock:
+            with self._lock:
+                frozen = [(collection, dict(values)) for collection, values in self._index.items() if values]
+                self._generation += 1
+                generation = self._generation
+                self._wal, self._wal_size = self._create_wal(generation)
+                self._segments.append(self._wal)
+
+            path = self._file('snapshot', generation)
+            moved = self._write_snapshot(path, frozen)
+            segment = _Segment(path, open(path, 'rb'))
+
+            with self._lock:
+                for collection, values in frozen:
+                    current = self._index.get(collection, {})
+                    for key, location in values.items():
+                        # Values written or deleted since the switch stay where they are
+                        if current.get(key) is location:
+                            current[key] = (segment, moved[location], *location[2:])
+                for retired in self._retired:
+                    retired.file.close()
+                self._retired = [old for old in self._segments if old is not self._wal]
+                self._segments = [segment, self._wal]
+            self._remove_older(generation)
+
+    def _write_snapshot(self, path: str, frozen: List[Tuple[str, Dict[str, _Location]]]) -> Dict[Any, int]:
+        """Write the given values to a snapshot file; returns the new offset of each location."""
+        moved: Dict[Any, int] = {}
+        index = []
+        with open(path + '.tmp', 'wb') as file:
+            file.write(SNAPSHOT_MAGIC)
+            position = len(SNAPSHOT_MAGIC)
+            for collection, values in frozen:
+                collection_bytes = collection.encode()
+                for key, location in values.items():
+                    segment, offset, length, crc, kind = location
+                    key_bytes = key.encode()
+                    names = collection_bytes + key_bytes
+                    file.write(_ENTRY.pack(kind, len(collection_bytes), len(key_bytes), length, crc))
+                    file.write(names)
+                    file.write(segment.read(offset, length))
+                    value_offset = position + _ENTRY.size + len(names)
+                    position = value_offset + length
+                    moved[location] = value_offset
+                    index.append(_INDEX_ENTRY.pack(kind, len(collection_bytes), len(key_bytes),
+                                                   value_offset, length, crc) + names)
+            file.write(b''.join(index))
+            file.write(_FOOTER.pack(position, len(index), SNAPSHOT_MAGIC))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)
+        directory = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        return moved
+
+    def close(self) -> None:
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            for segment in self._segments + self._retired:
+                segment.file.close()
+            self._segments = []
+            self._retired = []
@@ -0,0 +1,269 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+# Upper bounds in seconds, from fast in-memory lookups to multi-second payloads
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'data_proxy'
+
+# Called with the stage, its duration in seconds, the bytes processed and the
+# name of the exception raised, if any
+MetricsCallback = Callable[[str, float, int, Optional[str]], None]
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds.
+
+    Args:
+        buckets (Sequence[float]): Sorted upper bounds of the buckets, in seconds.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        Return the cumulative count of each bucket, as exported to Prometheus.
+
+        Returns:
+            List[Tuple[str, int]]: Pairs of upper bound (``'+Inf'`` last) and count.
+        """
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        result = []
+        running = 0
+        for bound, count in zip(bounds, self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Collects per-stage latency histograms and operation, byte and error counters.
+
+    Args:
+        buckets (Sequence[float]): Upper bounds of the latency histogram buckets.
+        callback (Optional[MetricsCallback]): Called after every recorded stage, e.g. to
+            forward measurements to another metrics system.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, callback: Optional[MetricsCallback] = None):
+        self.buckets = tuple(buckets)
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.operations: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0, error: Optional[str] = None) -> None:
+        """
+        Record one execution of a stage.
+
+        Args:
+            stage (str): Name of the stage, e.g. ``'consume.reencrypt'``.
+            seconds (float): Time spent in the stage.
+            nbytes (int): Payload bytes processed by the stage.
+            error (Optional[str]): Name of the exception raised by the stage, if any.
+        """
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self.operations[stage] = self.operations.get(stage, 0) + 1
+            if nbytes:
+                self.bytes[stage] = self.bytes.get(stage, 0) + nbytes
+            if error is not None:
+                self.errors[(stage, error)] = self.errors.get((stage, error), 0) + 1
+        if self.callback is not None:
+            self.callback(stage, seconds, nbytes, error)
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        with self._lock:
+            self.histograms.clear()
+            self.operations.clear()
+            self.bytes.clear()
+            self.errors.clear()
+
+    def to_prometheus(self) -> str:
+        """
+        Export the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        name = METRIC_PREFIX + '_stage'
+        lines = [
+            f"# HELP {name}_duration_seconds Time spent in each stage.",
+            f"# TYPE {name}_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                label = f'stage="{_escape(stage)}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f"{name}_duration_seconds_sum{{{label}}} {histogram.total!r}")
+                lines.append(f"{name}_duration_seconds_count{{{label}}} {histogram.count}")
+            for metric, help_text, values in (
+                ('operations', "Executions of each stage.", self.operations),
+                ('bytes', "Payload bytes processed by each stage.", self.bytes),
+            ):
+                lines.append(f"# HELP {name}_{metric}_total {help_text}")
+                lines.append(f"# TYPE {name}_{metric}_total counter")
+                for stage, value in sorted(values.items()):
+                    lines.append(f'{name}_{metric}_total{{stage="{_escape(stage)}"}} {value}')
+            lines.append(f"# HELP {name}_errors_total Failed executions of each stage by exception type.")
+            lines.append(f"# TYPE {name}_errors_total counter")
+            for (stage, error), value in sorted(self.errors.items()):
+                lines.append(f'{name}_errors_total{{stage="{_escape(stage)}",error="{_escape(error)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# The active registry; None while instrumentation is disabled
+_registry: Optional[MetricsRegistry] = None
+
+
+def enable_metrics(registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """
+    Turn on instrumentation for this process.
+
+    Args:
+        registry (Optional[MetricsRegistry]): Registry to record into. A new one is
+            created if omitted.
+
+    Returns:
+        MetricsRegistry: The active registry.
+    """
+    global _registry
+    _registry = registry if registry is not None else MetricsRegistry()
+    return _registry
+
+
+def disable_metrics() -> None:
+    """Turn off instrumentation; stages are no longer timed."""
+    global _registry
+    _registry = None
+
+
+def get_registry() -> Optional[MetricsRegistry]:
+    """
+    Return the active registry.
+
+    Returns:
+        Optional[MetricsRegistry]: The registry, or None while instrumentation is disabled.
+    """
+    return _registry
+
+
+class _Timer:
+    """Times one stage; nbytes may be set inside the block once the size is known."""
+
+    __slots__ = ('registry', 'stage', 'nbytes', 'start')
+
+    def __init__(self, registry: MetricsRegistry, stage: str, nbytes: int):
+        self.registry = registry
+        self.stage = stage
+        self.nbytes = nbytes
+        self.start = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.registry.record(self.stage, time.perf_counter() - self.start, self.nbytes,
+                             exc_type.__name__ if exc_type is not None else None)
+        return False
+
+
+class _NullTimer:
+    """Shared stand-in for _Timer while instrumentation is disabled."""
+
+    __slots__ = ('nbytes',)
+
+    def __init__(self):
+        self.nbytes = 0
+
+    def __enter__(self) -> '_NullTimer':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(stage: str, nbytes: int = 0) -> Any:
+    """
+    Context manager timing a stage into the active registry.
+
+    Exceptions propagate unchanged and are counted by type. While instrumentation is
+    disabled, a shared no-op context manager is returned.
+
+    Args:
+        stage (str): Name of the stage.
+        nbytes (int): Payload bytes processed by the stage, if known up front.
+
+    Returns:
+        Any: The context manager; set its ``nbytes`` attribute inside the block to
+        record a size only known later.
+    """
+    registry = _registry
+    if registry is None:
+        return _NULL_TIMER
+    return _Timer(registry, stage, nbytes)
+
+
+def instrumented(stage: str, size_arg: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Decorator timing every call of a function as a stage.
+
+    Args:
+        stage (str): Name of the stage.
+        size_arg (Optional[str]): Name of the bytes argument whose length is recorded.
+
+    Returns:
+        Callable[[F], F]: The decorator.
+    """
+
+    def decorator(func: F) -> F:
+        position = list(inspect.signature(func).parameters).index(size_arg) if size_arg else -1
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            registry = _registry
+            if registry is None:
+                return func(*args, **kwargs)
+            nbytes = 0
+            if size_arg:
+                value = args[position] if position < len(args) else kwargs.get(size_arg)
+                nbytes = len(value) if value is not None else 0
+            with _Timer(registry, stage, nbytes):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,361 @@
+import hashlib
+import struct
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Union
+from umbral import SecretKey, PublicKey, Signer, VerifiedKeyFrag, KeyFrag
+from .encryption import create_kfrags
+from .storage import StorageBackend, get_storage
+
+POLICY_COLLECTION = 'policies'
+# Key fragments that were revoked, for all of an owner's assets or for one asset
+REVOKED_COLLECTION = 'revoked_kfrags'
+
+_PUBLIC_KEY_SIZE = PublicKey.serialized_size()
+_KFRAG_SIZE = KeyFrag.serialized_size()
+_POLICY_HEADER = struct.Struct('>HH')
+
+
+class PolicyNotFound(Exception):
+    """Exception raised when a referenced policy does not exist."""
+    pass
+
+
+def make_policy_id(
+    owner_public_key: Union[PublicKey, bytes],
+    consumer_public_key: Union[PublicKey, bytes],
+    threshold: int,
+    shares: int
+) -> str:
+    """
+    Derive the identifier of the policy for an owner/consumer pair.
+
+    Args:
+        owner_public_key (Union[PublicKey, bytes]): Public key of the data owner.
+        consumer_public_key (Union[PublicKey, bytes]): Public key of the data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags.
+
+    Returns:
+        str: Hex-encoded SHA-256 digest identifying the policy.
+    """
+    digest = hashlib.sha256()
+    digest.update(bytes(owner_public_key))
+    digest.update(bytes(consumer_public_key))
+    digest.update(_POLICY_HEADER.pack(threshold, shares))
+    return digest.hexdigest()
+
+
+class Policy:
+    """
+    Delegation of decryption rights from a data owner to a consumer.
+
+    A policy holds one set of key fragments and is shared by every asset the
+    owner grants to the consumer with the same threshold and shares.
+
+    Args:
+        owner_public_key (bytes): Serialized public key of the data owner.
+        consumer_public_key (bytes): Serialized public key of the data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags.
+        kfrags (List[bytes]): Serialized verified key fragments.
+    """
+
+    def __init__(
+        self,
+        owner_public_key: bytes,
+        consumer_public_key: bytes,
+        threshold: int,
+        shares: int,
+        kfrags: List[bytes]
+    ):
+        self.owner_public_key = owner_public_key
+        self.consumer_public_key = consumer_public_key
+        self.threshold = threshold
+        self.shares = shares
+        self.kfrags = kfrags
+
+    @property
+    def policy_id(self) -> str:
+        return make_policy_id(self.owner_public_key, self.consumer_public_key, self.threshold, self.shares)
+
+    def verified_kfrags(self) -> List[VerifiedKeyFrag]:
+        """
+        Restore the policy's key fragments for re-encryption.
+
+        Returns:
+            List[VerifiedKeyFrag]: The verified key fragments.
+        """
+        return [VerifiedKeyFrag.from_verified_bytes(kfrag) for kfrag in self.kfrags]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the policy: both public keys, threshold and shares, then the kfrags.
+
+        Returns:
+            bytes: The encoded policy.
+        """
+        return b''.join([
+            self.owner_public_key,
+            self.consumer_public_key,
+            _POLICY_HEADER.pack(self.threshold, self.shares),
+            *self.kfrags,
+        ])
+
+    @classmethod
+    def from_bytes(cls, buffer: Union[bytes, memoryview]) -> 'Policy':
+        """
+        Deserialize a policy produced by to_bytes.
+
+        Args:
+            buffer (Union[bytes, memoryview]): The encoded policy.
+
+        Returns:
+            Policy: The decoded policy.
+
+        Raises:
+            ValueError: If the buffer is not a valid encoded policy.
+        """
+        data = bytes(buffer)
+        offset = 2 * _PUBLIC_KEY_SIZE
+        if len(data) < offset + _POLICY_HEADER.size:
+            raise ValueError("Invalid policy: truncated header.")
+        threshold, shares = _POLICY_HEADER.unpack_from(data, offset)
+        offset += _POLICY_HEADER.size
+        if len(data) != offset + shares * _KFRAG_SIZE:
+            raise ValueError("Invalid policy: unexpected number of key fragments.")
+        kfrags = [data[start:start + _KFRAG_SIZE] for start in range(offset, len(data), _KFRAG_SIZE)]
+        return cls(data[:_PUBLIC_KEY_SIZE], data[_PUBLIC_KEY_SIZE:2 * _PUBLIC_KEY_SIZE],
+                   threshold, shares, kfrags)
+
+
+def get_or_create_policy(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1
+) -> str:
+    """
+    Return the policy for an owner/consumer pair, generating its kfrags only once.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_key (SecretKey): The secret key of the data owner.
+        owner_signer (Signer): The signer object used for signing the kfrags.
+        consumer_key (PublicKey): The public key of the data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        shares (int): Total number of kfrags to generate.
+
+    Returns:
+        str: The identifier of the stored policy.
+
+    Raises:
+        ValueError: If threshold and shares do not describe a valid policy.
+    """
+    storage = get_storage(database)
+    owner_public_key = owner_key.public_key()
+    policy_id = make_policy_id(owner_public_key, consumer_key, threshold, shares)
+    if storage.contains(POLICY_COLLECTION, policy_id):
+        return policy_id
+
+    kfrags = create_kfrags(owner_key, consumer_key, owner_signer, threshold=threshold, shares=shares)
+    return store_policy(storage, owner_public_key, consumer_key, threshold, kfrags)
+
+
+def store_policy(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: PublicKey,
+    consumer_key: PublicKey,
+    threshold: int,
+    kfrags: Sequence[VerifiedKeyFrag]
+) -> str:
+    """
+    Store a policy from key fragments generated by the data owner, replacing any
+    existing policy for the same owner, consumer, threshold and number of kfrags.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_public_key (PublicKey): The public key of the data owner.
+        consumer_key (PublicKey): The public key of the data consumer.
+        threshold (int): Minimum number of kfrags required for decryption.
+        kfrags (Sequence[VerifiedKeyFrag]): The verified key fragments of the policy.
+
+    Returns:
+        str: The identifier of the stored policy.
+
+    Raises:
+        ValueError: If there are fewer kfrags than the threshold.
+    """
+    if not 0 < threshold <= len(kfrags):
+        raise ValueError("Threshold must be between 1 and the number of kfrags.")
+    policy = Policy(bytes(owner_public_key), bytes(consumer_key), threshold, len(kfrags),
+                    [bytes(kfrag) for kfrag in kfrags])
+    get_storage(database).put(POLICY_COLLECTION, policy.policy_id, policy.to_bytes())
+    return policy.policy_id
+
+
+def load_policy(database: Union[Dict[str, Any], StorageBackend], policy_id: str) -> Policy:
+    """
+    Load a stored policy.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        policy_id (str): The identifier of the policy.
+
+    Returns:
+        Policy: The stored policy.
+
+    Raises:
+        PolicyNotFound: If no policy exists with the given identifier.
+    """
+    encoded = get_storage(database).get(POLICY_COLLECTION, policy_id)
+    if encoded is None:
+        raise PolicyNotFound(f"No policy found with ID {policy_id}.")
+    return Policy.from_bytes(encoded)
+
+
+def delete_policy(database: Union[Dict[str, Any], StorageBackend], policy_id: str) -> bool:
+    """
+    Delete a stored policy. Assets whose grants still reference it can no longer be consumed.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        policy_id (str): The identifier of the policy.
+
+    Returns:
+        bool: True if the policy was deleted, False if it did not exist.
+    """
+    return get_storage(database).delete(POLICY_COLLECTION, policy_id)
+
+
+def policies_for(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: PublicKey,
+    consumer_key: PublicKey
+) -> List[str]:
+    """
+    Find every stored policy of an owner/consumer pair, whatever its threshold and shares.
+
+    All policies are read, so the cost grows with the number of owner/consumer pairs,
+    not with the number of assets.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_public_key (PublicKey): The public key of the data owner.
+        consumer_key (PublicKey): The public key of the data consumer.
+
+    Returns:
+        List[str]: The identifiers of the matching policies.
+    """
+    storage = get_storage(database)
+    keys = bytes(owner_public_key) + bytes(consumer_key)
+    found = []
+    for policy_id in list(storage.keys(POLICY_COLLECTION)):
+        encoded = storage.get(POLICY_COLLECTION, policy_id)
+        if encoded is not None and bytes(encoded[:len(keys)]) == keys:
+            found.append(policy_id)
+    return found
+
+
+def _kfrag_id(kfrag: Union[bytes, memoryview]) -> str:
+    return bytes(KeyFrag.from_bytes(bytes(kfrag)).id).hex()
+
+
+def _revocation_prefix(owner_public_key: Union[PublicKey, bytes], asset_id: Optional[str]) -> str:
+    if asset_id is None:
+        return f"owner:{bytes(owner_public_key).hex()}:"
+    return f"asset:{asset_id}:"
+
+
+def revoke_kfrags(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: Union[PublicKey, bytes],
+    kfrags: Iterable[Union[bytes, memoryview]],
+    asset_id: Optional[str] = None
+) -> None:
+    """
+    Record key fragments as revoked, so that they can never be granted again.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_public_key (Union[PublicKey, bytes]): Public key of the owner who issued the kfrags.
+        kfrags (Iterable[Union[bytes, memoryview]]): Serialized key fragments.
+        asset_id (Optional[str]): Asset the kfrags are revoked for. None revokes them for
+            every asset of the owner.
+    """
+    prefix = _revocation_prefix(owner_public_key, asset_id)
+    get_storage(database).put_many([(REVOKED_COLLECTION, prefix + _kfrag_id(kfrag), b'') for kfrag in kfrags])
+
+
+def revoke_policy(
+    database: Union[Dict[str, Any], StorageBackend],
+    policy_id: str,
+    asset_id: Optional[str] = None
+) -> bool:
+    """
+    Record the key fragments of a stored policy as revoked (see revoke_kfrags).
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        policy_id (str): The identifier of the policy.
+        asset_id (Optional[str]): Asset the kfrags are revoked for. None revokes them for
+            every asset of the owner.
+
+    Returns:
+        bool: True if the policy's kfrags were revoked, False if the policy does not exist.
+    """
+    storage = get_storage(database)
+    encoded = storage.get(POLICY_COLLECTION, policy_id)
+    if encoded is None:
+        return False
+    policy = Policy.from_bytes(encoded)
+    revoke_kfrags(storage, policy.owner_public_key, policy.kfrags, asset_id)
+    return True
+
+
+def kfrags_revoked(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: Union[PublicKey, bytes],
+    kfrags: Iterable[Union[bytes, memoryview]],
+    asset_id: str
+) -> bool:
+    """
+    Check whether any of an owner's key fragments was revoked for an asset.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_public_key (Union[PublicKey, bytes]): Public key of the owner who issued the kfrags.
+        kfrags (Iterable[Union[bytes, memoryview]]): Serialized key fragments.
+        asset_id (str): The asset the kfrags would grant access to.
+
+    Returns:
+        bool: True if a kfrag was revoked for every asset of the owner or for this asset.
+    """
+    storage = get_storage(database)
+    prefixes = (_revocation_prefix(owner_public_key, None), _revocation_prefix(owner_public_key, asset_id))
+    return any(storage.contains(REVOKED_COLLECTION, prefix + _kfrag_id(kfrag))
+               for kfrag in kfrags for prefix in prefixes)
+
+
+def revocations_for(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: Union[PublicKey, bytes],
+    asset_id: str
+) -> List[str]:
+    """
+    List the revocation entries that apply to an owner's asset, to copy it to another database.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): The database holding the policies.
+        owner_public_key (Union[PublicKey, bytes]): Public key of the asset's owner.
+        asset_id (str): Identifier of the asset.
+
+    Returns:
+        List[str]: Keys of the REVOKED_COLLECTION entries.
+    """
+    storage = get_storage(database)
+    found = []
+    for prefix in (_revocation_prefix(owner_public_key, None), _revocation_prefix(owner_public_key, asset_id)):
+        # ';' follows ':', so the range holds exactly the keys starting with the prefix
+        found.extend(storage.scan(REVOKED_COLLECTION, prefix, prefix[:-1] + ';'))
+    return found
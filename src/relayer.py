@@ -0,0 +1,633 @@
+import argparse
+import asyncio
+import hashlib
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, Union
+from umbral import SecretKey, PublicKey, Signer, Signature, Capsule, CapsuleFrag
+from umbral.errors import VerificationError
+from .encryption import decrypt_reencrypted_data, decrypt_reencrypted_stream
+from .compression import get_codec, decompress_data, decompress_stream, CompressionError
+from .database import (
+    store_encrypted_data, grant_kfrags, reencrypt_for_consumer, asset_version,
+    AssetTooLarge, DataStorageError, DecryptionError
+)
+from .metrics import enable_metrics, get_registry
+from .token_validation import BurnVerifier
+from .storage import StorageBackend, InMemoryStorage, SQLiteStorage, get_storage
+from .blobfile import BlobFile
+from .log_storage import LogStorage
+from .sharding import ShardedDatabase
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8470
+MAX_BODY_SIZE = 64 * 1024 * 1024
+# Largest consume response body; hex encoding makes it twice the size of the ciphertext
+MAX_RESPONSE_SIZE = 64 * 1024 * 1024
+
+# Domain separation of the message an owner signs to authorize a store request
+_STORE_CONTEXT = b'data-proxy/store/v2'
+
+_MAX_HEADER_LINES = 100
+
+
+class RelayerError(Exception):
+    """Exception raised for invalid relayer requests, carrying the HTTP status to answer with."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _field(payload: Dict[str, Any], name: str, kind: type = str) -> Any:
+    value = payload.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise RelayerError(HTTPStatus.BAD_REQUEST, f"Missing or invalid field '{name}'.")
+    return value
+
+
+def _hex_field(payload: Dict[str, Any], name: str) -> bytes:
+    try:
+        return bytes.fromhex(_field(payload, name))
+    except ValueError as e:
+        raise RelayerError(HTTPStatus.BAD_REQUEST, f"Field '{name}' is not valid hex.") from e
+
+
+def _public_key_field(payload: Dict[str, Any], name: str) -> PublicKey:
+    try:
+        return PublicKey.from_bytes(_hex_field(payload, name))
+    except ValueError as e:
+        raise RelayerError(HTTPStatus.BAD_REQUEST, f"Field '{name}' is not a valid public key.") from e
+
+
+def _store_message(asset_id: str, access_url: str, capsule: bytes, ciphertext: bytes, compression: str,
+                   version: int) -> bytes:
+    """Return the digest an owner signs to authorize storing a version of an asset."""
+    digest = hashlib.sha256(_STORE_CONTEXT)
+    for field in (asset_id.encode(), access_url.encode(), capsule, compression.encode()):
+        digest.update(len(field).to_bytes(4, 'big'))
+        digest.update(field)
+    digest.update(version.to_bytes(8, 'big'))
+    digest.update(hashlib.sha256(ciphertext).digest())
+    return digest.digest()
+
+
+def sign_store_request(payload: Dict[str, Any], owner_signer: Signer) -> Dict[str, Any]:
+    """
+    Sign a store request with the owner's key, as the relayer requires.
+
+    Args:
+        payload (Dict[str, Any]): The store request, with the fields described in Relayer.store.
+        owner_signer (Signer): Signer holding the secret key matching ``ownerPublicKey``.
+
+    Returns:
+        Dict[str, Any]: A copy of the request with the hex ``signature`` added.
+    """
+    message = _store_message(payload['assetId'], payload['accessUrl'], bytes.fromhex(payload['capsule']),
+                             bytes.fromhex(payload['ciphertext']), payload.get('compression') or '',
+                             payload['version'])
+    return {**payload, 'signature': bytes(owner_signer.sign(message)).hex()}
+
+
+class Relayer:
+    """
+    Asyncio front end serving store, grant and consume requests for one database.
+
+    The event loop only parses requests; storage access and the re-encryption run
+    on an executor, so a single process can keep thousands of connections open.
+    Concurrent consume requests for the same asset and consumer share a single
+    re-encryption.
+
+    The relayer never holds secret keys: data is stored already encrypted under the
+    owner's public key, grants carry kfrags signed by the owner, and consumers
+    decrypt the returned capsule fragments locally (see open_consume_response).
+    Store requests must be signed by the owner (see sign_store_request), and an
+    asset can only be replaced by the owner it was first stored by, with a higher
+    version than the stored one, so a captured request cannot be replayed.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend, None]): Database to serve. A new
+            in-memory storage is used if omitted.
+        executor (Optional[Executor]): Thread pool running storage access and
+            re-encryption. A default thread pool is created if omitted.
+        reencrypt_executor (Optional[Executor]): Thread or process pool passed to the
+            database module to re-encrypt each capsule with all kfrags concurrently.
+        burn_verifier (Optional[BurnVerifier]): Verifier checking each consumer address's
+            token burn before consuming. Without it, no token burn is required.
+        shards (Optional[ShardedDatabase]): Sharded database serving requests instead of
+            database; storage access and re-encryption then run in the shard processes.
+        max_response_size (int): Largest consume response body in bytes. Larger assets are
+            answered with 413 before their ciphertext is encoded, which bounds the memory
+            a response takes.
+    """
+
+    def __init__(
+        self,
+        database: Union[Dict[str, Any], StorageBackend, None] = None,
+        executor: Optional[Executor] = None,
+        reencrypt_executor: Optional[Executor] = None,
+        burn_verifier: Optional[BurnVerifier] = None,
+        shards: Optional[ShardedDatabase] = None,
+        max_response_size: int = MAX_RESPONSE_SIZE
+    ):
+        # Resolve dictionaries once so caches configured on the storage are kept
+        self.storage = get_storage(database) if database is not None else InMemoryStorage()
+        self.shards = shards
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(thread_name_prefix='relayer')
+        self.reencrypt_executor = reencrypt_executor
+        self.burn_verifier = burn_verifier
+        self.max_response_size = max_response_size
+        # IDs of the assets being stored; a concurrent store of the same asset is rejected
+        self._storing: Set[str] = set()
+        self._inflight: Dict[Hashable, 'asyncio.Future[Any]'] = {}
+        self._routes: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            '/store': self.store,
+            '/grant': self.grant,
+            '/consume': self.consume,
+        }
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    async def _coalesce(self, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func on the executor, or join the identical call already in flight."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(func, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled waiter must not cancel the work shared with the other waiters
+        return await asyncio.shield(future)
+
+    async def store(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store data encrypted by the owner.
+
+        Args:
+            payload (Dict[str, Any]): ``assetId``, ``accessUrl``, hex ``ownerPublicKey``,
+                ``capsule`` and ``ciphertext``, ``compression`` naming the codec the owner
+                compressed the data with before encrypting it, if any, a positive ``version``
+                higher than that of the stored asset and the hex ``signature`` of the request
+                by the owner (see sign_store_request). Existing grants are kept.
+
+        Returns:
+            Dict[str, Any]: The stored ``assetId``.
+
+        Raises:
+            PermissionError: If the signature is invalid or the asset belongs to another owner.
+            RelayerError: With status 409 if the version is not higher than the stored one.
+        """
+        asset_id = _field(payload, 'assetId')
+        access_url = _field(payload, 'accessUrl')
+        owner_public_key = _public_key_field(payload, 'ownerPublicKey')
+        capsule_bytes = _hex_field(payload, 'capsule')
+        try:
+            capsule = Capsule.from_bytes(capsule_bytes)
+        except ValueError as e:
+            raise RelayerError(HTTPStatus.BAD_REQUEST, "Field 'capsule' is not a valid capsule.") from e
+        compression = payload.get('compression') or ''
+        if compression:
+            try:
+                get_codec(_field(payload, 'compression'))
+            except CompressionError as e:
+                raise RelayerError(HTTPStatus.BAD_REQUEST, str(e)) from e
+        try:
+            signature = Signature.from_bytes(_hex_field(payload, 'signature'))
+        except ValueError as e:
+            raise RelayerError(HTTPStatus.BAD_REQUEST, "Field 'signature' is not a valid signature.") from e
+        ciphertext = _hex_field(payload, 'ciphertext')
+        version = _field(payload, 'version', int)
+        if not 0 < version < 2 ** 64:
+            raise RelayerError(HTTPStatus.BAD_REQUEST, "Field 'version' must be a positive 64-bit integer.")
+
+        # Checking the owner and writing must not interleave with another store of the asset
+        if asset_id in self._storing:
+            raise RelayerError(HTTPStatus.CONFLICT, "The asset is already being stored.")
+        self._storing.add(asset_id)
+        try:
+            await self._run(self._store, asset_id, ciphertext, capsule, access_url, owner_public_key,
+                            compression, version, signature)
+        finally:
+            self._storing.discard(asset_id)
+        return {'assetId': asset_id}
+
+    def _store(
+        self,
+        asset_id: str,
+        ciphertext: bytes,
+        capsule: Capsule,
+        access_url: str,
+        owner_public_key: PublicKey,
+        compression: str,
+        version: int,
+        signature: Signature
+    ) -> None:
+        message = _store_message(asset_id, access_url, bytes(capsule), ciphertext, compression, version)
+        if not signature.verify(owner_public_key, message):
+            raise PermissionError("The store request is not signed by the owner.")
+        if self.shards is not None:
+            stored = self.shards.asset_version(asset_id)
+        else:
+            stored = asset_version(self.storage, asset_id)
+        if stored is not None:
+            if stored.owner != bytes(owner_public_key):
+                raise PermissionError("The asset belongs to another owner.")
+            if version <= stored.version:
+                raise RelayerError(HTTPStatus.CONFLICT, f"Version {version} is not newer than the stored "
+                                                        f"version {stored.version}.")
+
+        # None keeps the grants of the stored version
+        args = (asset_id, ciphertext, capsule, access_url, owner_public_key, None, compression, version)
+        if self.shards is not None:
+            self.shards.store_encrypted_data(*args)
+        else:
+            store_encrypted_data(self.storage, *args)
+
+    async def grant(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Grant a consumer access with kfrags generated and signed by the owner.
+
+        Args:
+            payload (Dict[str, Any]): ``assetId``, hex ``consumerPublicKey``, ``threshold``
+                and a list of hex ``kfrags``.
+
+        Returns:
+            Dict[str, Any]: The ``assetId`` and the ``policyId`` of the grant.
+        """
+        asset_id = _field(payload, 'assetId')
+        kfrags = _field(payload, 'kfrags', list)
+        if not kfrags or not all(isinstance(kfrag, str) for kfrag in kfrags):
+            raise RelayerError(HTTPStatus.BAD_REQUEST, "Missing or invalid field 'kfrags'.")
+        try:
+            kfrags = [bytes.fromhex(kfrag) for kfrag in kfrags]
+        except ValueError as e:
+            raise RelayerError(HTTPStatus.BAD_REQUEST, "Field 'kfrags' is not valid hex.") from e
+        args = (asset_id, _public_key_field(payload, 'consumerPublicKey'), _field(payload, 'threshold', int), kfrags)
+        if self.shards is not None:
+            policy_id = await self._run(self.shards.grant_kfrags, *args)
+        else:
+            policy_id = await self._run(grant_kfrags, self.storage, *args)
+        return {'assetId': asset_id, 'policyId': policy_id}
+
+    async def consume(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Re-encrypt an asset for a consumer.
+
+        Identical requests arriving while one is being processed receive the same response.
+
+        Args:
+            payload (Dict[str, Any]): ``assetId``, ``consumerAddress`` and hex ``consumerPublicKey``.
+
+        Returns:
+            Dict[str, Any]: The ``accessUrl`` and hex ``capsule``, ``cfrags`` and either
+            ``ciphertext`` or, for streamed assets, the list of encrypted ``chunks``.
+        """
+        asset_id = _field(payload, 'assetId')
+        consumer_address = _field(payload, 'consumerAddress')
+        consumer_public_key = _public_key_field(payload, 'consumerPublicKey')
+        # Burns are checked per request, before joining a shared re-encryption;
+        # cached verifications are answered without leaving the event loop
+        verifier = self.burn_verifier
+        if verifier is not None and not verifier.cached(consumer_address, consumer_public_key):
+            await self._run(verifier.require, consumer_address, consumer_public_key)
+        return await self._coalesce(('consume', asset_id, bytes(consumer_public_key)),
+                                    self._consume, asset_id, consumer_public_key)
+
+    def _consume(self, asset_id: str, consumer_public_key: PublicKey) -> Dict[str, Any]:
+        # Checked before the ciphertext is hex encoded, and for streamed assets while the
+        # chunks are read, so an oversized asset is never held in memory as a whole
+        max_size = self.max_response_size // 2
+        if self.shards is not None:
+            reencrypted = self.shards.reencrypt_for_consumer(asset_id, consumer_public_key, max_size)
+        else:
+            reencrypted = reencrypt_for_consumer(self.storage, asset_id, consumer_public_key,
+                                                 self.reencrypt_executor, max_size)
+        capsule, cfrags, ciphertext, access_url, compression = reencrypted
+        response = {
+            'accessUrl': access_url,
+            'capsule': bytes(capsule).hex(),
+            'cfrags': [bytes(cfrag).hex() for cfrag in cfrags],
+        }
+        if isinstance(ciphertext, list):
+            response['chunks'] = [chunk.hex() for chunk in ciphertext]
+        else:
+            response['ciphertext'] = ciphertext.hex()
+        if compression:
+            response['compression'] = compression
+        return response
+
+    async def dispatch(self, path: str, payload: Any) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        """
+        Route one request and map errors to HTTP statuses.
+
+        Args:
+            path (str): The request path.
+            payload (Any): The decoded JSON body.
+
+        Returns:
+            Tuple[HTTPStatus, Dict[str, Any]]: The response status and JSON body.
+        """
+        handler = self._routes.get(path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint {path}."}
+        if not isinstance(payload, dict):
+            return HTTPStatus.BAD_REQUEST, {'error': "Request body must be a JSON object."}
+        try:
+            return HTTPStatus.OK, await handler(payload)
+        except RelayerError as e:
+            return e.status, {'error': str(e)}
+        except PermissionError as e:
+            return HTTPStatus.FORBIDDEN, {'error': str(e)}
+        except AssetTooLarge as e:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': str(e)}
+        except DataStorageError as e:
+            status = HTTPStatus.NOT_FOUND if path == '/consume' else HTTPStatus.BAD_REQUEST
+            return status, {'error': str(e)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                content_type = 'application/json'
+                registry = get_registry()
+                if method == 'GET' and path == '/metrics' and registry is not None:
+                    status, response = HTTPStatus.OK, registry.to_prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif method != 'POST':
+                    status, response = HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Only POST is supported."}
+                else:
+                    try:
+                        payload = json.loads(body)
+                    except ValueError:
+                        status, response = HTTPStatus.BAD_REQUEST, {'error': "Request body is not valid JSON."}
+                    else:
+                        status, response = await self.dispatch(path, payload)
+                writer.write(_encode_response(status, response, keep_alive, content_type))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RelayerError as e:
+            writer.write(_encode_response(e.status, {'error': str(e)}, False))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        unix_path: Optional[str] = None
+    ) -> asyncio.AbstractServer:
+        """
+        Start listening on a TCP port, or on a Unix socket if unix_path is given.
+
+        Returns:
+            asyncio.AbstractServer: The running server.
+        """
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self) -> None:
+        """Shut down the executor if it was created by the relayer."""
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes, bool]]:
+    """Read one HTTP request; returns None if the connection was closed between requests."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, version = request_line.decode('latin-1').split()
+    except ValueError as e:
+        raise RelayerError(HTTPStatus.BAD_REQUEST, "Malformed request line.") from e
+
+    headers = {}
+    for _ in range(_MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise RelayerError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many header lines.")
+
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError as e:
+        raise RelayerError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.") from e
+    if not 0 <= length <= MAX_BODY_SIZE:
+        raise RelayerError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+    body = await reader.readexactly(length)
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method, path.split('?', 1)[0], body, keep_alive
+
+
+def _encode_response(
+    status: HTTPStatus,
+    payload: Union[Dict[str, Any], bytes],
+    keep_alive: bool,
+    content_type: str = 'application/json'
+) -> bytes:
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, separators=(',', ':')).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+async def relayer_request(
+    path: str,
+    payload: Dict[str, Any],
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_path: Optional[str] = None
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Send one request to a relayer.
+
+    Args:
+        path (str): The endpoint, e.g. ``'/consume'``.
+        payload (Dict[str, Any]): The JSON request body.
+        host (str): Host of the relayer.
+        port (int): TCP port of the relayer.
+        unix_path (Optional[str]): Unix socket of the relayer, used instead of host and port.
+
+    Returns:
+        Tuple[int, Dict[str, Any]]: The HTTP status and the decoded JSON response.
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        response = await reader.readexactly(int(headers.get('content-length', '0')))
+        return int(status_line.split()[1]), json.loads(response)
+    finally:
+        writer.close()
+
+
+def open_consume_response(
+    response: Dict[str, Any],
+    receiving_sk: SecretKey,
+    delegating_pk: PublicKey,
+    verifying_pk: Optional[PublicKey] = None
+) -> bytes:
+    """
+    Verify the capsule fragments returned by a relayer, decrypt the data and
+    decompress it if the owner stored it compressed.
+
+    Args:
+        response (Dict[str, Any]): The JSON body returned by the consume endpoint.
+        receiving_sk (SecretKey): Secret key of the consumer.
+        delegating_pk (PublicKey): Public key of the data owner.
+        verifying_pk (Optional[PublicKey]): Public key that signed the kfrags.
+            Defaults to the data owner's public key.
+
+    Returns:
+        bytes: The decrypted data.
+
+    Raises:
+        DecryptionError: If a capsule fragment fails verification or decryption fails.
+    """
+    try:
+        capsule = Capsule.from_bytes(bytes.fromhex(response['capsule']))
+        cfrags = [
+            CapsuleFrag.from_bytes(bytes.fromhex(cfrag)).verify(
+                capsule,
+                verifying_pk=verifying_pk or delegating_pk,
+                delegating_pk=delegating_pk,
+                receiving_pk=receiving_sk.public_key(),
+            )
+            for cfrag in response['cfrags']
+        ]
+        compression = response.get('compression')
+        if 'chunks' in response:
+            chunks = decrypt_reencrypted_stream(
+                receiving_sk, delegating_pk, capsule, cfrags,
+                (bytes.fromhex(chunk) for chunk in response['chunks'])
+            )
+            if compression:
+                chunks = decompress_stream(chunks, compression)
+            return b''.join(chunks)
+        data = decrypt_reencrypted_data(receiving_sk, delegating_pk, capsule, cfrags,
+                                        bytes.fromhex(response['ciphertext']))
+        return decompress_data(data, compression) if compression else data
+    except (KeyError, ValueError, TypeError, VerificationError) as e:
+        raise DecryptionError(f"Error occurred during decryption: {str(e)}") from e
+
+
+async def serve(
+    database: Union[Dict[str, Any], StorageBackend, None] = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_path: Optional[str] = None,
+    shards: Optional[ShardedDatabase] = None,
+    max_response_size: int = MAX_RESPONSE_SIZE
+) -> None:
+    """Run a relayer until cancelled."""
+    relayer = Relayer(database, shards=shards, max_response_size=max_response_size)
+    server = await relayer.start(host, port, unix_path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        relayer.close()
+
+
+def _open_storage(
+    db: Optional[str],
+    log: Optional[str],
+    blob_file: Optional[str],
+    shard: Optional[str] = None
+) -> StorageBackend:
+    """Open the storage selected on the command line; each shard gets its own files, suffixed with its name."""
+    def path(base: str) -> str:
+        return f"{base}.{shard}" if shard is not None else base
+
+    blobs = BlobFile(path(blob_file)) if blob_file else None
+    if db:
+        return SQLiteStorage(path(db), blob_file=blobs)
+    if log:
+        return LogStorage(path(log), blob_file=blobs)
+    return InMemoryStorage(blob_file=blobs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the data proxy relayer.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', dest='unix_path', help="Listen on a Unix socket instead of TCP.")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument('--db', help="SQLite database file. Data is kept in memory if omitted.")
+    storage.add_argument('--log', help="Directory of a write-ahead log with snapshots, for fast restarts.")
+    parser.add_argument('--blob-file',
+                        help="Append-only file large ciphertexts are stored in and served from via mmap.")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record per-stage metrics and serve them on GET /metrics.")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Partition assets across this many worker processes by consistent hashing.")
+    parser.add_argument('--max-response-size', type=int, default=MAX_RESPONSE_SIZE,
+                        help="Largest consume response in bytes; larger assets are answered with 413.")
+    args = parser.parse_args()
+
+    if args.metrics:
+        enable_metrics()
+
+    if args.shards > 0:
+        shards = ShardedDatabase(args.shards, partial(_open_storage, args.db, args.log, args.blob_file))
+        try:
+            asyncio.run(serve(host=args.host, port=args.port, unix_path=args.unix_path, shards=shards,
+                              max_response_size=args.max_response_size))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            shards.close()
+        return
+
+    database = _open_storage(args.db, args.log, args.blob_file)
+    try:
+        asyncio.run(serve(database, args.host, args.port, args.unix_path,
+                          max_response_size=args.max_response_size))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        database.close()
+        if database.blob_file is not None:
+            database.blob_file.close()
+
+
+if __name__ == "__main__":
+    main()
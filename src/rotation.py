@@ -0,0 +1,198 @@
+"""
+Bulk rotation and revocation of the kfrags an owner granted to a consumer.
+
+The key change itself happens once, when a job starts: the pair's policies are
+replaced or deleted and the caches cleared, so old kfrags stop working at once.
+The job then updates the consumer's grant in each asset record, in batches.
+
+Within one database the batches run one after another. Every record write holds
+the database module's grants lock, so threads would only queue behind it. To
+update records in parallel, shard the catalogue: ShardedDatabase.rotate_access
+and ShardedDatabase.revoke_consumer run the job on every shard at the same time,
+one process per shard.
+"""
+from itertools import islice
+from typing import Dict, Any, Callable, Optional, NamedTuple, Union
+from umbral import SecretKey, PublicKey, Signer
+from .encryption import create_kfrags
+from .database import update_grant, clear_caches
+from .indexes import assets_by_consumer
+from .policy import make_policy_id, store_policy, delete_policy, policies_for, revoke_policy
+from .storage import StorageBackend, get_storage
+
+ROTATION_COLLECTION = 'rotations'
+DEFAULT_BATCH_SIZE = 1000
+
+
+class RotationProgress(NamedTuple):
+    """Progress of a rotation or revocation job, reported after every batch."""
+    job_id: str
+    scanned: int
+    updated: int
+    done: bool
+
+
+def _run_job(
+    storage: StorageBackend,
+    job_id: str,
+    owner_public_key: PublicKey,
+    consumer_key: PublicKey,
+    policy_id: Optional[str],
+    start: Callable[[], bool],
+    batch_size: int,
+    progress: Optional[Callable[[RotationProgress], None]]
+) -> RotationProgress:
+    """
+    Update the consumer's grant on every asset of the owner, in batches, checkpointing after each one.
+
+    The checkpoint holds the last asset ID of the consumer index that was processed;
+    start only runs for a job without a checkpoint and returns whether any grant
+    needs updating. If not, the job ends without scanning.
+    """
+    if batch_size <= 0:
+        raise ValueError("Batch size must be positive.")
+    checkpoint = storage.get(ROTATION_COLLECTION, job_id)
+    if checkpoint is None:
+        if not start():
+            result = RotationProgress(job_id, 0, 0, True)
+            if progress is not None:
+                progress(result)
+            return result
+        checkpoint = {'last': None, 'scanned': 0, 'updated': 0}
+        storage.put(ROTATION_COLLECTION, job_id, checkpoint)
+
+    while True:
+        # Each batch is read with a fresh scan, as revocation removes the index entries being scanned
+        batch = list(islice(assets_by_consumer(storage, consumer_key, after=checkpoint['last']), batch_size))
+        if not batch:
+            break
+        updated = sum(update_grant(storage, asset_id, owner_public_key, consumer_key, policy_id)
+                      for asset_id in batch)
+        checkpoint = {
+            'last': batch[-1],
+            'scanned': checkpoint['scanned'] + len(batch),
+            'updated': checkpoint['updated'] + updated,
+        }
+        storage.put(ROTATION_COLLECTION, job_id, checkpoint)
+        if progress is not None:
+            progress(RotationProgress(job_id, checkpoint['scanned'], checkpoint['updated'], False))
+
+    storage.delete(ROTATION_COLLECTION, job_id)
+    result = RotationProgress(job_id, checkpoint['scanned'], checkpoint['updated'], True)
+    if progress is not None:
+        progress(result)
+    return result
+
+
+def rotate_access(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_key: SecretKey,
+    owner_signer: Signer,
+    consumer_key: PublicKey,
+    threshold: int = 1,
+    shares: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[RotationProgress], None]] = None,
+    job_id: Optional[str] = None
+) -> RotationProgress:
+    """
+    Replaces the kfrags an owner granted to a consumer, across all of the owner's assets.
+
+    New kfrags are generated once and stored as the pair's policy for threshold and
+    shares; every other policy of the pair is deleted and cached kfrags and capsule
+    fragments are dropped, so the previous kfrags stop working as soon as the job
+    starts. The previous kfrags are revoked, so grant_kfrags refuses them from then
+    on. Ciphertexts and capsules are never touched.
+
+    If threshold and shares are unchanged and the pair has no other policy, the
+    policy keeps its ID, every asset uses the new kfrags at once and no asset is
+    scanned. Otherwise each grant is repointed at the new policy in batches, and an
+    asset is unreadable for the consumer until its batch is processed.
+
+    The job checkpoints after every batch. Calling it again with the same arguments
+    after an interruption resumes from the checkpoint without generating new kfrags.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        owner_key (SecretKey): The secret key of the data owner.
+        owner_signer (Signer): The signer object used for signing the kfrags.
+        consumer_key (PublicKey): The public key of the consumer.
+        threshold (int): Minimum number of new kfrags required for decryption.
+        shares (int): Total number of new kfrags to generate.
+        batch_size (int): Number of assets updated between checkpoints.
+        progress (Optional[Callable[[RotationProgress], None]]): Called after every batch
+            and once more when the job is done.
+        job_id (Optional[str]): Identifier of the checkpoint. Derived from the owner,
+            consumer, threshold and shares if omitted.
+
+    Returns:
+        RotationProgress: The number of assets scanned and grants updated.
+
+    Raises:
+        ValueError: If threshold and shares do not describe a valid policy.
+    """
+    storage = get_storage(database)
+    owner_public_key = owner_key.public_key()
+    policy_id = make_policy_id(owner_public_key, consumer_key, threshold, shares)
+    if job_id is None:
+        job_id = f"rotate:{policy_id}"
+
+    def start() -> bool:
+        kfrags = create_kfrags(owner_key, consumer_key, owner_signer, threshold=threshold, shares=shares)
+        previous_policies = policies_for(storage, owner_public_key, consumer_key)
+        for previous in previous_policies:
+            revoke_policy(storage, previous)
+        store_policy(storage, owner_public_key, consumer_key, threshold, kfrags)
+        stale = [previous for previous in previous_policies if previous != policy_id]
+        for previous in stale:
+            delete_policy(storage, previous)
+        clear_caches(storage)
+        # Grants only need repointing if they can reference another policy
+        return bool(stale)
+
+    return _run_job(storage, job_id, owner_public_key, consumer_key, policy_id, start, batch_size, progress)
+
+
+def revoke_consumer(
+    database: Union[Dict[str, Any], StorageBackend],
+    owner_public_key: PublicKey,
+    consumer_key: PublicKey,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[RotationProgress], None]] = None,
+    job_id: Optional[str] = None
+) -> RotationProgress:
+    """
+    Revokes a consumer's access to all assets of an owner.
+
+    Every policy of the owner/consumer pair is revoked and deleted and cached kfrags
+    and capsule fragments are dropped first, so access ends as soon as the job starts
+    and grant_kfrags refuses the revoked kfrags from then on. The
+    consumer's grants are then removed from the asset records in batches, leaving
+    ciphertexts and capsules untouched. The job checkpoints after every batch and
+    resumes from the checkpoint when called again after an interruption.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): Database containing stored data.
+        owner_public_key (PublicKey): The public key of the data owner.
+        consumer_key (PublicKey): The public key of the consumer to revoke.
+        batch_size (int): Number of assets updated between checkpoints.
+        progress (Optional[Callable[[RotationProgress], None]]): Called after every batch
+            and once more when the job is done.
+        job_id (Optional[str]): Identifier of the checkpoint. Derived from the owner and
+            consumer if omitted.
+
+    Returns:
+        RotationProgress: The number of assets scanned and grants removed.
+    """
+    storage = get_storage(database)
+    if job_id is None:
+        job_id = f"revoke:{bytes(owner_public_key).hex()}:{bytes(consumer_key).hex()}"
+
+    def start() -> bool:
+        for policy_id in policies_for(storage, owner_public_key, consumer_key):
+            revoke_policy(storage, policy_id)
+            delete_policy(storage, policy_id)
+        clear_caches(storage)
+        return True
+
+    return _run_job(storage, job_id, owner_public_key, consumer_key, None, start, batch_size, progress)
@@ -0,0 +1,463 @@
+import bisect
+import hashlib
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple, Union
+from umbral import SecretKey, PublicKey, Signer, Capsule, VerifiedCapsuleFrag, VerifiedKeyFrag
+from .database import (
+    ASSET_COLLECTION, store_data, store_encrypted_data, consume_data, reencrypt_for_consumer, grant_access,
+    grant_kfrags, revoke_access, delete_data, asset_version, AssetVersion, get_did_document, export_asset, import_asset
+)
+from .rotation import RotationProgress, rotate_access, revoke_consumer, DEFAULT_BATCH_SIZE
+from .token_validation import BurnVerifier
+from .storage import StorageBackend, InMemoryStorage
+
+# Points per shard on the hash ring; more points spread keys more evenly across shards
+DEFAULT_VNODES = 128
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to shards.
+
+    Each shard owns vnodes points on a 64-bit ring and a key belongs to the first
+    point at or after its hash. Adding or removing one of N shards therefore only
+    moves about 1/N of the keys, all of them to or from that shard.
+
+    Args:
+        shards (Iterable[str]): Names of the initial shards.
+        vnodes (int): Number of points per shard.
+    """
+
+    def __init__(self, shards: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        if vnodes <= 0:
+            raise ValueError("Number of points per shard must be positive.")
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for shard in shards:
+            self.add(shard)
+
+    @property
+    def shards(self) -> List[str]:
+        """Names of the shards on the ring, sorted."""
+        return sorted(set(self._owners))
+
+    def add(self, shard: str) -> None:
+        """
+        Add a shard to the ring.
+
+        Raises:
+            ValueError: If the shard is already on the ring.
+        """
+        if shard in self._owners:
+            raise ValueError(f"Shard {shard} is already on the ring.")
+        for index in range(self.vnodes):
+            point = _ring_hash(f"{shard}#{index}")
+            position = bisect.bisect_left(self._points, point)
+            self._points.insert(position, point)
+            self._owners.insert(position, shard)
+
+    def remove(self, shard: str) -> None:
+        """
+        Remove a shard from the ring.
+
+        Raises:
+            ValueError: If the shard is not on the ring.
+        """
+        if shard not in self._owners:
+            raise ValueError(f"Shard {shard} is not on the ring.")
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != shard]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def shard_for(self, key: str) -> str:
+        """
+        Return the shard owning a key.
+
+        Raises:
+            ValueError: If the ring has no shards.
+        """
+        if not self._points:
+            raise ValueError("The hash ring has no shards.")
+        position = bisect.bisect_left(self._points, _ring_hash(key))
+        return self._owners[position % len(self._owners)]
+
+    def copy(self) -> 'HashRing':
+        """Return an independent copy of the ring."""
+        # Points only depend on the shard names, so rebuilding gives the same ring
+        return HashRing(self.shards, self.vnodes)
+
+
+# Storage of the shard served by this worker process, set once by _init_shard
+_shard_storage: Optional[StorageBackend] = None
+
+
+def _init_shard(name: str, storage_factory: Optional[Callable[[str], StorageBackend]]) -> None:
+    global _shard_storage
+    _shard_storage = storage_factory(name) if storage_factory is not None else InMemoryStorage()
+
+
+# Operations run in the shard processes. umbral objects cannot be pickled, so keys,
+# signers, capsules and fragments cross the process boundary as bytes.
+
+def _store_data(asset_id: str, data: bytes, access_url: str, owner_key: bytes, signing_key: bytes,
+                consumer_key: bytes, threshold: int, shares: int, deduplicate: bool,
+                compression: Optional[str]) -> None:
+    store_data(_shard_storage, asset_id, data, access_url, SecretKey.from_bytes(owner_key),
+               Signer(SecretKey.from_bytes(signing_key)), PublicKey.from_bytes(consumer_key),
+               threshold, shares, deduplicate, compression)
+
+
+def _store_encrypted_data(asset_id: str, ciphertext: bytes, capsule: bytes, access_url: str,
+                          owner_public_key: bytes, grants: Optional[List[Tuple[bytes, str]]], compression: str,
+                          version: int) -> None:
+    store_encrypted_data(_shard_storage, asset_id, ciphertext, Capsule.from_bytes(capsule), access_url,
+                         PublicKey.from_bytes(owner_public_key), grants, compression, version)
+
+
+def _consume_data(asset_id: str, consumer_address: str, consumer_secret_key: bytes,
+                  delegating_public_key: bytes, receiving_public_key: bytes) -> Tuple[bytes, str]:
+    return consume_data(_shard_storage, asset_id, consumer_address, SecretKey.from_bytes(consumer_secret_key),
+                        PublicKey.from_bytes(delegating_public_key), PublicKey.from_bytes(receiving_public_key))
+
+
+def _reencrypt_for_consumer(asset_id: str, receiving_public_key: bytes, max_size: Optional[int]) -> Tuple[Any, ...]:
+    capsule, cfrags, ciphertext, access_url, compression = reencrypt_for_consumer(
+        _shard_storage, asset_id, PublicKey.from_bytes(receiving_public_key), max_size=max_size)
+    if isinstance(ciphertext, memoryview):
+        ciphertext = bytes(ciphertext)
+    return bytes(capsule), [bytes(cfrag) for cfrag in cfrags], ciphertext, access_url, compression
+
+
+def _grant_access(asset_id: str, owner_key: bytes, signing_key: bytes, consumer_key: bytes,
+                  threshold: int, shares: int) -> str:
+    return grant_access(_shard_storage, asset_id, SecretKey.from_bytes(owner_key),
+                        Signer(SecretKey.from_bytes(signing_key)), PublicKey.from_bytes(consumer_key),
+                        threshold, shares)
+
+
+def _grant_kfrags(asset_id: str, consumer_key: bytes, threshold: int, kfrags: List[bytes]) -> str:
+    return grant_kfrags(_shard_storage, asset_id, PublicKey.from_bytes(consumer_key), threshold, kfrags)
+
+
+def _revoke_access(asset_id: str, consumer_key: bytes) -> bool:
+    return revoke_access(_shard_storage, asset_id, PublicKey.from_bytes(consumer_key))
+
+
+def _delete_data(asset_id: str) -> bool:
+    return delete_data(_shard_storage, asset_id)
+
+
+def _asset_version(asset_id: str) -> Optional[AssetVersion]:
+    return asset_version(_shard_storage, asset_id)
+
+
+def _get_did_document(asset_id: str) -> Dict:
+    return get_did_document(_shard_storage, asset_id)
+
+
+def _asset_ids() -> List[str]:
+    return list(_shard_storage.keys(ASSET_COLLECTION))
+
+
+def _export_asset(asset_id: str) -> Optional[Dict[str, Any]]:
+    return export_asset(_shard_storage, asset_id)
+
+
+def _import_asset(exported: Dict[str, Any]) -> str:
+    return import_asset(_shard_storage, exported)
+
+
+def _rotate_access(owner_key: bytes, signing_key: bytes, consumer_key: bytes, threshold: int, shares: int,
+                   batch_size: int) -> RotationProgress:
+    return rotate_access(_shard_storage, SecretKey.from_bytes(owner_key), Signer(SecretKey.from_bytes(signing_key)),
+                         PublicKey.from_bytes(consumer_key), threshold, shares, batch_size)
+
+
+def _revoke_consumer(owner_public_key: bytes, consumer_key: bytes, batch_size: int) -> RotationProgress:
+    return revoke_consumer(_shard_storage, PublicKey.from_bytes(owner_public_key), PublicKey.from_bytes(consumer_key),
+                           batch_size)
+
+
+def _close_shard() -> None:
+    _shard_storage.close()
+    if _shard_storage.blob_file is not None:
+        _shard_storage.blob_file.close()
+
+
+class ShardedDatabase:
+    """
+    Router partitioning assets across worker processes by consistent hashing of their ID.
+
+    Each shard is a single worker process owning its own storage, so storage access
+    and the crypto of different shards run on different cores instead of sharing one
+    interpreter lock. Every operation on an asset is routed to the shard that owns
+    its ID; the policies an asset needs are stored in the same shard.
+
+    Secret keys passed to the router are sent to the shard process serving the call.
+    umbral Signers cannot leave the process, so kfrags are signed with signing_key,
+    which defaults to the owner's key.
+
+    Args:
+        shards (Union[int, Iterable[str]]): Number of shards, named ``shard-0`` and up,
+            or the names of the shards.
+        storage_factory (Optional[Callable[[str], StorageBackend]]): Picklable callable
+            opening the storage of a shard, given its name, in the shard's process.
+            In-memory storage is used if omitted.
+        vnodes (int): Number of points per shard on the hash ring.
+    """
+
+    def __init__(
+        self,
+        shards: Union[int, Iterable[str]],
+        storage_factory: Optional[Callable[[str], StorageBackend]] = None,
+        vnodes: int = DEFAULT_VNODES
+    ):
+        names = [f"shard-{index}" for index in range(shards)] if isinstance(shards, int) else list(shards)
+        if not names:
+            raise ValueError("At least one shard is required.")
+        self.storage_factory = storage_factory
+        self.ring = HashRing(names, vnodes)
+        self._lock = threading.Lock()
+        self._executors: Dict[str, ProcessPoolExecutor] = {}
+        for name in names:
+            self._executors[name] = self._start(name)
+
+    def _start(self, name: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=(name, self.storage_factory))
+
+    @property
+    def shards(self) -> List[str]:
+        """Names of the shards, sorted."""
+        return self.ring.shards
+
+    def shard_for(self, asset_id: str) -> str:
+        """Return the name of the shard owning an asset."""
+        return self.ring.shard_for(asset_id)
+
+    def _submit(self, asset_id: str, operation: Callable[..., Any], *args: Any) -> 'Future[Any]':
+        with self._lock:
+            return self._executors[self.ring.shard_for(asset_id)].submit(operation, asset_id, *args)
+
+    def _call(self, asset_id: str, operation: Callable[..., Any], *args: Any) -> Any:
+        return self._submit(asset_id, operation, *args).result()
+
+    def store_data(
+        self,
+        asset_id: str,
+        data: bytes,
+        access_url: str,
+        owner_key: SecretKey,
+        consumer_key: PublicKey,
+        threshold: int = 1,
+        shares: int = 1,
+        deduplicate: bool = False,
+        compression: Optional[str] = None,
+        signing_key: Optional[SecretKey] = None
+    ) -> None:
+        """
+        Store data in the asset's shard, like database.store_data.
+
+        Args:
+            signing_key (Optional[SecretKey]): Key signing the kfrags; the owner's key if omitted.
+        """
+        self._call(asset_id, _store_data, data, access_url, owner_key.to_secret_bytes(),
+                   (signing_key or owner_key).to_secret_bytes(), bytes(consumer_key),
+                   threshold, shares, deduplicate, compression)
+
+    def store_encrypted_data(
+        self,
+        asset_id: str,
+        ciphertext: bytes,
+        capsule: Capsule,
+        access_url: str,
+        owner_public_key: PublicKey,
+        grants: Optional[Iterable[Tuple[bytes, str]]],
+        compression: str = '',
+        version: int = 0
+    ) -> None:
+        """Store data already encrypted by the owner in the asset's shard, like database.store_encrypted_data."""
+        self._call(asset_id, _store_encrypted_data, ciphertext, bytes(capsule), access_url,
+                   bytes(owner_public_key), list(grants) if grants is not None else None, compression, version)
+
+    def consume_data(
+        self,
+        asset_id: str,
+        consumer_address: str,
+        consumer_secret_key: SecretKey,
+        delegating_public_key: PublicKey,
+        receiving_public_key: PublicKey,
+        burn_verifier: Optional[BurnVerifier] = None
+    ) -> Tuple[bytes, str]:
+        """
+        Consume an asset in its shard, like database.consume_data.
+
+        The token burn is verified in the calling process before the request is routed.
+        """
+        if burn_verifier is not None:
+            burn_verifier.require(consumer_address, receiving_public_key)
+        return self._call(asset_id, _consume_data, consumer_address, consumer_secret_key.to_secret_bytes(),
+                          bytes(delegating_public_key), bytes(receiving_public_key))
+
+    def reencrypt_for_consumer(
+        self,
+        asset_id: str,
+        receiving_public_key: PublicKey,
+        max_size: Optional[int] = None
+    ) -> Tuple[Capsule, List[VerifiedCapsuleFrag], Union[bytes, List[bytes]], str, str]:
+        """Re-encrypt an asset's capsule in its shard, like database.reencrypt_for_consumer."""
+        capsule, cfrags, ciphertext, access_url, compression = self._call(
+            asset_id, _reencrypt_for_consumer, bytes(receiving_public_key), max_size)
+        return (Capsule.from_bytes(capsule), [VerifiedCapsuleFrag.from_verified_bytes(cfrag) for cfrag in cfrags],
+                ciphertext, access_url, compression)
+
+    def grant_access(
+        self,
+        asset_id: str,
+        owner_key: SecretKey,
+        consumer_key: PublicKey,
+        threshold: int = 1,
+        shares: int = 1,
+        signing_key: Optional[SecretKey] = None
+    ) -> str:
+        """Grant a consumer access in the asset's shard, like database.grant_access."""
+        return self._call(asset_id, _grant_access, owner_key.to_secret_bytes(),
+                          (signing_key or owner_key).to_secret_bytes(), bytes(consumer_key), threshold, shares)
+
+    def grant_kfrags(
+        self,
+        asset_id: str,
+        consumer_key: PublicKey,
+        threshold: int,
+        kfrags: Iterable[Union[bytes, VerifiedKeyFrag]]
+    ) -> str:
+        """Grant a consumer access with owner-generated kfrags, like database.grant_kfrags."""
+        return self._call(asset_id, _grant_kfrags, bytes(consumer_key), threshold,
+                          [bytes(kfrag) for kfrag in kfrags])
+
+    def revoke_access(self, asset_id: str, consumer_key: PublicKey) -> bool:
+        """Revoke a consumer's access in the asset's shard, like database.revoke_access."""
+        return self._call(asset_id, _revoke_access, bytes(consumer_key))
+
+    def delete_data(self, asset_id: str) -> bool:
+        """Delete an asset from its shard, like database.delete_data."""
+        return self._call(asset_id, _delete_data)
+
+    def asset_version(self, asset_id: str) -> Optional[AssetVersion]:
+        """Return the owner and version of an asset from its shard, like database.asset_version."""
+        return self._call(asset_id, _asset_version)
+
+    def get_did_document(self, asset_id: str) -> Dict:
+        """Retrieve an asset's DID document from its shard, like database.get_did_document."""
+        return self._call(asset_id, _get_did_document)
+
+    def _on_every_shard(self, operation: Callable[..., RotationProgress], *args: Any) -> RotationProgress:
+        """Run a job on all shards in parallel and add up their progress."""
+        with self._lock:
+            futures = [executor.submit(operation, *args) for executor in self._executors.values()]
+        results = [future.result() for future in futures]
+        return RotationProgress(results[0].job_id, sum(result.scanned for result in results),
+                                sum(result.updated for result in results), True)
+
+    def rotate_access(
+        self,
+        owner_key: SecretKey,
+        consumer_key: PublicKey,
+        threshold: int = 1,
+        shares: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        signing_key: Optional[SecretKey] = None
+    ) -> RotationProgress:
+        """Replace an owner's kfrags for a consumer on every shard in parallel, like rotation.rotate_access."""
+        return self._on_every_shard(_rotate_access, owner_key.to_secret_bytes(),
+                                    (signing_key or owner_key).to_secret_bytes(), bytes(consumer_key),
+                                    threshold, shares, batch_size)
+
+    def revoke_consumer(
+        self,
+        owner_public_key: PublicKey,
+        consumer_key: PublicKey,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> RotationProgress:
+        """Revoke a consumer's access to an owner's assets on every shard in parallel, like rotation.revoke_consumer."""
+        return self._on_every_shard(_revoke_consumer, bytes(owner_public_key), bytes(consumer_key), batch_size)
+
+    def add_shard(self, name: str) -> int:
+        """
+        Start a new shard and move the assets it now owns to it.
+
+        Must not run concurrently with writes; reads are served throughout.
+
+        Returns:
+            int: The number of assets moved.
+
+        Raises:
+            ValueError: If the shard already exists.
+        """
+        with self._lock:
+            if name in self._executors:
+                raise ValueError(f"Shard {name} already exists.")
+            self._executors[name] = self._start(name)
+        ring = self.ring.copy()
+        ring.add(name)
+        return self._rebalance(ring)
+
+    def remove_shard(self, name: str) -> int:
+        """
+        Move the assets of a shard to the remaining shards and stop it.
+
+        Must not run concurrently with writes; reads are served throughout.
+
+        Returns:
+            int: The number of assets moved.
+
+        Raises:
+            ValueError: If the shard does not exist or is the last one.
+        """
+        if name not in self._executors:
+            raise ValueError(f"Shard {name} does not exist.")
+        if len(self._executors) == 1:
+            raise ValueError("The last shard cannot be removed.")
+        ring = self.ring.copy()
+        ring.remove(name)
+        moved = self._rebalance(ring)
+        with self._lock:
+            executor = self._executors.pop(name)
+        executor.submit(_close_shard).result()
+        executor.shutdown()
+        return moved
+
+    def _rebalance(self, ring: HashRing) -> int:
+        """Copy the assets whose owner changes under ring, switch to it, then delete the old copies."""
+        moves: List[Tuple[str, str]] = []
+        with self._lock:
+            executors = list(self._executors.items())
+        for name, executor in executors:
+            for asset_id in executor.submit(_asset_ids).result():
+                if ring.shard_for(asset_id) != name:
+                    moves.append((name, asset_id))
+        for name, asset_id in moves:
+            exported = self._executors[name].submit(_export_asset, asset_id).result()
+            if exported is not None:
+                self._executors[ring.shard_for(asset_id)].submit(_import_asset, exported).result()
+        with self._lock:
+            self.ring = ring
+        for name, asset_id in moves:
+            self._executors[name].submit(_delete_data, asset_id).result()
+        return len(moves)
+
+    def close(self) -> None:
+        """Close the storage of every shard and stop the shard processes."""
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            try:
+                executor.submit(_close_shard).result()
+            finally:
+                executor.shutdown()
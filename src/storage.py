@@ -0,0 +1,334 @@
+import bisect
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .cache import LRUCache
+from .blobfile import BlobFile
+
+
+class StorageBackend(ABC):
+    """
+    Abstract key-value storage used by the database module.
+
+    Values are grouped into named collections (e.g. ``'collection'`` for data
+    assets), mirroring the ``database[collection][key]`` layout of the
+    original in-memory dictionary.
+
+    Args:
+        object_cache (Optional[LRUCache]): Cache of parsed capsules and kfrags used
+            by the database module to skip deserialization on repeated reads.
+        cfrag_cache (Optional[LRUCache]): Cache of capsule fragments used by the
+            database module to skip re-encryption on repeated reads.
+        blob_file (Optional[BlobFile]): Memory-mapped file the database module stores
+            large ciphertexts in instead of the backend.
+    """
+
+    def __init__(
+        self,
+        object_cache: Optional[LRUCache] = None,
+        cfrag_cache: Optional[LRUCache] = None,
+        blob_file: Optional[BlobFile] = None
+    ):
+        self.object_cache = object_cache
+        self.cfrag_cache = cfrag_cache
+        self.blob_file = blob_file
+
+    @abstractmethod
+    def get(self, collection: str, key: str) -> Optional[Any]:
+        """
+        Retrieve a value from a collection.
+
+        Args:
+            collection (str): Name of the collection.
+            key (str): Key of the value.
+
+        Returns:
+            Optional[Any]: The stored value, or None if the key does not exist.
+        """
+
+    @abstractmethod
+    def put(self, collection: str, key: str, value: Any) -> None:
+        """
+        Insert or overwrite a value in a collection.
+
+        Args:
+            collection (str): Name of the collection.
+            key (str): Key of the value.
+            value (Any): Value to store.
+        """
+
+    def put_many(self, items: Iterable[Tuple[str, str, Any]]) -> None:
+        """
+        Insert or overwrite several values, possibly in different collections.
+
+        The default implementation calls put for each item; backends override it
+        to write the whole batch at once.
+
+        Args:
+            items (Iterable[Tuple[str, str, Any]]): Collection, key and value of each
+                value to store, written in order.
+        """
+        for collection, key, value in items:
+            self.put(collection, key, value)
+
+    @abstractmethod
+    def delete(self, collection: str, key: str) -> bool:
+        """
+        Remove a value from a collection.
+
+        Args:
+            collection (str): Name of the collection.
+            key (str): Key of the value.
+
+        Returns:
+            bool: True if a value was removed, False if the key did not exist.
+        """
+
+    @abstractmethod
+    def keys(self, collection: str) -> Iterator[str]:
+        """
+        Iterate over the keys of a collection.
+
+        Args:
+            collection (str): Name of the collection.
+
+        Returns:
+            Iterator[str]: Keys stored in the collection.
+        """
+
+    def contains(self, collection: str, key: str) -> bool:
+        """
+        Check whether a key exists in a collection.
+
+        Args:
+            collection (str): Name of the collection.
+            key (str): Key to look up.
+
+        Returns:
+            bool: True if the key exists, False otherwise.
+        """
+        return self.get(collection, key) is not None
+
+    def scan(self, collection: str, start: str = '', stop: Optional[str] = None) -> Iterator[str]:
+        """
+        Iterate over the keys of a collection in sorted order, within a range.
+
+        The default implementation sorts every key of the collection; backends
+        override it with an ordered lookup.
+
+        Args:
+            collection (str): Name of the collection.
+            start (str): Smallest key to include.
+            stop (Optional[str]): Key at which to stop, excluded. None scans to the end.
+
+        Returns:
+            Iterator[str]: Keys in ``[start, stop)``, in ascending order.
+        """
+        return iter([key for key in sorted(self.keys(collection))
+                     if key >= start and (stop is None or key < stop)])
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    Storage backend keeping all values in a nested dictionary.
+
+    Args:
+        data (Optional[Dict[str, Any]]): Existing ``{collection: {key: value}}``
+            dictionary to operate on. A new one is created if omitted.
+        object_cache (Optional[LRUCache]): Cache of parsed capsules and kfrags.
+        cfrag_cache (Optional[LRUCache]): Cache of capsule fragments.
+        blob_file (Optional[BlobFile]): Memory-mapped file for large ciphertexts.
+    """
+
+    def __init__(
+        self,
+        data: Optional[Dict[str, Any]] = None,
+        object_cache: Optional[LRUCache] = None,
+        cfrag_cache: Optional[LRUCache] = None,
+        blob_file: Optional[BlobFile] = None
+    ):
+        super().__init__(object_cache, cfrag_cache, blob_file)
+        self.data = data if data is not None else {}
+        # Sorted keys of the collections that have been scanned, kept up to date on writes
+        self._sorted: Dict[str, List[str]] = {}
+
+    def get(self, collection: str, key: str) -> Optional[Any]:
+        return self.data.get(collection, {}).get(key)
+
+    def put(self, collection: str, key: str, value: Any) -> None:
+        values = self.data.setdefault(collection, {})
+        keys = self._sorted.get(collection)
+        if keys is not None and key not in values:
+            bisect.insort(keys, key)
+        values[key] = value
+
+    def delete(self, collection: str, key: str) -> bool:
+        removed = self.data.get(collection, {}).pop(key, None) is not None
+        keys = self._sorted.get(collection)
+        if removed and keys is not None:
+            del keys[bisect.bisect_left(keys, key)]
+        return removed
+
+    def keys(self, collection: str) -> Iterator[str]:
+        return iter(list(self.data.get(collection, {})))
+
+    def contains(self, collection: str, key: str) -> bool:
+        return key in self.data.get(collection, {})
+
+    def scan(self, collection: str, start: str = '', stop: Optional[str] = None) -> Iterator[str]:
+        keys = self._sorted.get(collection)
+        if keys is None:
+            keys = self._sorted[collection] = sorted(self.data.get(collection, {}))
+        begin = bisect.bisect_left(keys, start)
+        end = len(keys) if stop is None else bisect.bisect_left(keys, stop)
+        return iter(keys[begin:end])
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Storage backend persisting values in a SQLite database file.
+
+    ``bytes`` values are stored as BLOBs; any other value is stored as JSON
+    text and decoded again on retrieval.
+
+    Args:
+        path (str): Path of the SQLite database file, or ``':memory:'``.
+        object_cache (Optional[LRUCache]): Cache of parsed capsules and kfrags.
+        cfrag_cache (Optional[LRUCache]): Cache of capsule fragments.
+        blob_file (Optional[BlobFile]): Memory-mapped file for large ciphertexts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        object_cache: Optional[LRUCache] = None,
+        cfrag_cache: Optional[LRUCache] = None,
+        blob_file: Optional[BlobFile] = None
+    ):
+        super().__init__(object_cache, cfrag_cache, blob_file)
+        self.path = path
+        self.scan_page_size = 1000
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "value BLOB NOT NULL, "
+            "PRIMARY KEY (collection, key))"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _encode(value: Any) -> Union[bytes, str]:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return json.dumps(value, separators=(",", ":"))
+
+    @staticmethod
+    def _decode(value: Union[bytes, str]) -> Any:
+        if isinstance(value, bytes):
+            return value
+        return json.loads(value)
+
+    def get(self, collection: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM documents WHERE collection = ? AND key = ?",
+                (collection, key),
+            ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def put(self, collection: str, key: str, value: Any) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO documents (collection, key, value) VALUES (?, ?, ?)",
+                (collection, key, self._encode(value)),
+            )
+
+    def put_many(self, items: Iterable[Tuple[str, str, Any]]) -> None:
+        # One transaction for the batch instead of one commit per value
+        rows = [(collection, key, self._encode(value)) for collection, key, value in items]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO documents (collection, key, value) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def delete(self, collection: str, key: str) -> bool:
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM documents WHERE collection = ? AND key = ?",
+                (collection, key),
+            )
+        return cursor.rowcount > 0
+
+    def keys(self, collection: str) -> Iterator[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+        return (row[0] for row in rows)
+
+    def contains(self, collection: str, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM documents WHERE collection = ? AND key = ?",
+                (collection, key),
+            ).fetchone()
+        return row is not None
+
+    def scan(self, collection: str, start: str = '', stop: Optional[str] = None) -> Iterator[str]:
+        # Read in pages along the primary key so the lock is not held while the caller iterates
+        bound = " AND key < ?" if stop is not None else ""
+        extra = (stop,) if stop is not None else ()
+        operator = ">="
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT key FROM documents WHERE collection = ? AND key {operator} ?{bound} "
+                    "ORDER BY key LIMIT ?",
+                    (collection, start, *extra, self.scan_page_size),
+                ).fetchall()
+            for (key,) in rows:
+                yield key
+            if len(rows) < self.scan_page_size:
+                return
+            start, operator = rows[-1][0], ">"
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def get_storage(database: Union[Dict[str, Any], StorageBackend]) -> StorageBackend:
+    """
+    Resolve the storage backend for a database argument.
+
+    Plain dictionaries are wrapped in an InMemoryStorage operating on the
+    dictionary itself, so existing callers keep working unchanged. The wrapper
+    is created per call and therefore has no caches; pass a StorageBackend to
+    keep caches across calls.
+
+    Args:
+        database (Union[Dict[str, Any], StorageBackend]): A storage backend or
+            a ``{collection: {key: value}}`` dictionary.
+
+    Returns:
+        StorageBackend: The backend to read from and write to.
+
+    Raises:
+        TypeError: If the database is neither a dictionary nor a StorageBackend.
+    """
+    if isinstance(database, StorageBackend):
+        return database
+    if isinstance(database, dict):
+        return InMemoryStorage(database)
+    raise TypeError(f"Unsupported database type: {type(database).__name__}")
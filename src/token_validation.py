@@ -1,18 +1,281 @@
-def validate_token_burn(consumer_address: str, token_amount: int) -> bool:
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Optional, Sequence, Set
+from umbral import PublicKey
+from .cache import LRUCache
+
+
+class InsufficientTokenBurn(PermissionError):
+    """Exception raised when a consumer has not burned enough tokens to access data."""
+    pass
+
+
+class Ledger(ABC):
     """
-    Validate token burn for access.
+    Source of truth for token burns, e.g. a token contract on chain.
+
+    Implementations should answer a whole batch of addresses with a single query,
+    since a round trip to the ledger is far more expensive than the lookup itself.
+    """
+
+    @abstractmethod
+    def burned_amounts(self, consumer_addresses: Sequence[str]) -> Dict[str, int]:
+        """
+        Look up the total amount of tokens burned by each address.
 
-    This function is a placeholder for actual token validation logic.
-    In a real-world scenario, it would interact with a token system or smart contract
-    to verify if the consumer has burned the required amount of tokens.
+        Args:
+            consumer_addresses (Sequence[str]): Addresses to look up.
+
+        Returns:
+            Dict[str, int]: Burned amount per address. Addresses that never burned
+            tokens may be omitted.
+        """
+
+
+class InMemoryLedger(Ledger):
+    """
+    In-process ledger for tests and local deployments.
+
+    Args:
+        burns (Optional[Dict[str, int]]): Initial burned amount per address.
+    """
+
+    def __init__(self, burns: Optional[Dict[str, int]] = None):
+        self._burns = dict(burns or {})
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def burn(self, consumer_address: str, token_amount: int) -> None:
+        """
+        Record a token burn.
+
+        Args:
+            consumer_address (str): Address of the consumer burning tokens.
+            token_amount (int): Amount of tokens burned.
+        """
+        if token_amount <= 0:
+            raise ValueError("Token amount must be positive.")
+        with self._lock:
+            self._burns[consumer_address] = self._burns.get(consumer_address, 0) + token_amount
+
+    def burned_amounts(self, consumer_addresses: Sequence[str]) -> Dict[str, int]:
+        with self._lock:
+            self.queries += 1
+            return {address: self._burns[address] for address in consumer_addresses if address in self._burns}
+
+
+def validate_token_burn(consumer_address: str, token_amount: int, ledger: Ledger) -> bool:
+    """
+    Validate token burn for access with a direct, uncached ledger query.
 
     Args:
         consumer_address (str): Address of the consumer performing token burn.
-        token_amount (int): Amount of tokens burned.
+        token_amount (int): Amount of tokens required.
+        ledger (Ledger): The ledger recording token burns.
 
     Returns:
         bool: True if token burn is valid, False otherwise.
     """
-    # TODO: Implement the actual token burn validation logic
-    # This is a placeholder implementation that always returns True
-    return True
+    return ledger.burned_amounts([consumer_address]).get(consumer_address, 0) >= token_amount
+
+
+class _Batch:
+    """Addresses waiting for the same ledger query."""
+
+    def __init__(self):
+        self.addresses: Set[str] = set()
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Dict[str, int] = {}
+        self.error: Optional[BaseException] = None
+
+
+class BurnVerifier:
+    """
+    Verifies token burns with batched ledger queries and a per-consumer cache.
+
+    A consumer whose burn was verified is served from the cache until the entry
+    expires, so repeated reads do not touch the ledger. Cache misses arriving
+    within batch_window of each other are answered by one ledger query: the first
+    caller waits for the window (or until max_batch addresses are pending) and
+    queries the ledger on behalf of everyone in the batch.
+
+    Only successful verifications are cached, so a consumer who burns tokens after
+    being refused is admitted on the next request.
+
+    A burn is an entitlement, not a payment: the ledger reports each address's
+    cumulative burn and nothing is spent per request, so an address that burned
+    required_amount is admitted for every request until the ledger says otherwise.
+    Without address_of, the address is whatever the consumer presents, and one
+    burn admits any consumer key presenting that address. Pass address_of to
+    derive each consumer key's address, e.g. with the chain's address scheme, so
+    that a burn only admits the key that made it.
+
+    Args:
+        ledger (Ledger): The ledger recording token burns.
+        required_amount (int): Minimum amount of tokens a consumer must have burned.
+        ttl (float): Seconds a verified burn is trusted without asking the ledger again;
+            0 asks the ledger on every request.
+        batch_window (float): Seconds to wait for more addresses before querying the ledger.
+        max_batch (int): Maximum number of addresses per ledger query.
+        cache (Optional[LRUCache]): Cache of verified burns. A cache of 65536 entries
+            expiring after ttl seconds is created if omitted.
+        address_of (Optional[Callable[[PublicKey], str]]): Derives the ledger address
+            of a consumer public key. If given, a consumer must present the address of
+            its own key.
+    """
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        required_amount: int = 1,
+        ttl: float = 60.0,
+        batch_window: float = 0.005,
+        max_batch: int = 256,
+        cache: Optional[LRUCache] = None,
+        address_of: Optional[Callable[[PublicKey], str]] = None
+    ):
+        if max_batch <= 0:
+            raise ValueError("Batch size must be positive.")
+        self.ledger = ledger
+        self.required_amount = required_amount
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache = cache if cache is not None else LRUCache(65536, ttl=ttl)
+        self.address_of = address_of
+        self._lock = threading.Lock()
+        self._pending: Optional[_Batch] = None
+
+    def owns_address(self, consumer_address: str, consumer_public_key: Optional[PublicKey]) -> bool:
+        """
+        Check that a consumer address belongs to the consumer's public key.
+
+        Args:
+            consumer_address (str): Address presented by the consumer.
+            consumer_public_key (Optional[PublicKey]): Public key of the consumer.
+
+        Returns:
+            bool: True if address_of derives the address from the key, or if no
+            address_of was given.
+        """
+        if self.address_of is None:
+            return True
+        return consumer_public_key is not None and self.address_of(consumer_public_key) == consumer_address
+
+    def cached(self, consumer_address: str, consumer_public_key: Optional[PublicKey] = None) -> bool:
+        """
+        Check the cache only, without querying the ledger.
+
+        Args:
+            consumer_address (str): Address of the consumer.
+            consumer_public_key (Optional[PublicKey]): Public key of the consumer,
+                required if address_of was given.
+
+        Returns:
+            bool: True if the address belongs to the key and a sufficient burn was
+            verified recently.
+        """
+        if not self.owns_address(consumer_address, consumer_public_key):
+            return False
+        amount = self.cache.get(consumer_address)
+        return amount is not None and amount >= self.required_amount
+
+    def verify(self, consumer_address: str, consumer_public_key: Optional[PublicKey] = None) -> bool:
+        """
+        Check whether a consumer has burned the required amount of tokens.
+
+        Args:
+            consumer_address (str): Address of the consumer.
+            consumer_public_key (Optional[PublicKey]): Public key of the consumer,
+                required if address_of was given.
+
+        Returns:
+            bool: True if the address belongs to the key and the burn is sufficient,
+            False otherwise.
+        """
+        if not self.owns_address(consumer_address, consumer_public_key):
+            return False
+        if self.cached(consumer_address, consumer_public_key):
+            return True
+        return self._lookup(consumer_address) >= self.required_amount
+
+    def verify_many(self, consumer_addresses: Iterable[str]) -> Dict[str, bool]:
+        """
+        Check many consumers at once with at most one ledger query per max_batch misses.
+
+        Only the burns are checked, not whether the addresses belong to any key.
+
+        Args:
+            consumer_addresses (Iterable[str]): Addresses of the consumers.
+
+        Returns:
+            Dict[str, bool]: Whether each consumer's burn is sufficient.
+        """
+        results = {}
+        missing = []
+        for address in dict.fromkeys(consumer_addresses):
+            if self.cached(address):
+                results[address] = True
+            else:
+                missing.append(address)
+        for start in range(0, len(missing), self.max_batch):
+            amounts = self._query(missing[start:start + self.max_batch])
+            for address in missing[start:start + self.max_batch]:
+                results[address] = amounts.get(address, 0) >= self.required_amount
+        return results
+
+    def require(self, consumer_address: str, consumer_public_key: Optional[PublicKey] = None) -> None:
+        """
+        Ensure a consumer has burned the required amount of tokens.
+
+        Args:
+            consumer_address (str): Address of the consumer.
+            consumer_public_key (Optional[PublicKey]): Public key of the consumer,
+                required if address_of was given.
+
+        Raises:
+            PermissionError: If address_of was given and the address does not belong
+                to the consumer's public key.
+            InsufficientTokenBurn: If the burn is missing or insufficient.
+        """
+        if consumer_address and not self.owns_address(consumer_address, consumer_public_key):
+            raise PermissionError("Consumer address does not belong to the consumer's public key.")
+        if not consumer_address or not self.verify(consumer_address, consumer_public_key):
+            raise InsufficientTokenBurn("Consumer has not burned enough tokens to access the data.")
+
+    def _query(self, consumer_addresses: Sequence[str]) -> Dict[str, int]:
+        amounts = self.ledger.burned_amounts(consumer_addresses)
+        for address, amount in amounts.items():
+            if amount >= self.required_amount:
+                self.cache.put(address, amount)
+        return amounts
+
+    def _lookup(self, consumer_address: str) -> int:
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            batch.addresses.add(consumer_address)
+            if len(batch.addresses) >= self.max_batch:
+                # Later callers start a new batch
+                self._pending = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.batch_window)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            try:
+                batch.results = self._query(sorted(batch.addresses))
+            except BaseException as e:  # pylint: disable=broad-except
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(consumer_address, 0)
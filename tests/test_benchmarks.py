@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import pytest
+from benchmarks.load import LatencyHistogram, parse_distribution, run_load
+from benchmarks.run import compare, parse_size, format_size, run_benchmarks
+from src.relayer import Relayer
+
+
+def test_run_benchmarks():
+    """
+    Test that a minimal sweep produces machine-readable results.
+    """
+    results = run_benchmarks([parse_size("1K")], [(2, 3)], min_time=0)
+
+    # Every operation is measured once per parameter value
+    assert set(results) == {
+        "encrypt_data[size=1K]",
+        "create_kfrags[policy=2/3]",
+        "reencrypt_data[policy=2/3]",
+        "decrypt_reencrypted_data[size=1K,policy=2/3]",
+        "create_did_document",
+        "encode_did_document",
+        "decode_did_document",
+        "store_data[size=1K,policy=2/3]",
+        "consume_data[size=1K,policy=2/3]",
+    }
+    assert all(result['rounds'] >= 3 and result['min'] > 0 for result in results.values())
+    assert results["encrypt_data[size=1K]"]['bytes'] == 1024
+
+    # A subset of the cases can be measured again
+    assert set(run_benchmarks([1024], [(2, 3)], min_time=0, only={"decode_did_document"})) == {
+        "decode_did_document"
+    }
+
+
+def test_compare_detects_regressions():
+    """
+    Test the regression gate against a baseline.
+    """
+    baseline = {"fast": {'min': 1.0}, "slow": {'min': 1.0}, "removed": {'min': 1.0}}
+    results = {"fast": {'min': 1.2}, "slow": {'min': 1.5}, "new": {'min': 9.0}}
+
+    # Only cases present in both and slower than the tolerance are reported
+    assert compare(results, baseline, tolerance=0.25) == {"slow": 1.5}
+    assert compare(results, baseline, tolerance=0.5) == {}
+    assert parse_size("64K") == 65536 and parse_size("1G") == 1 << 30
+    assert format_size(1 << 20) == "1M"
+
+
+def test_latency_histogram():
+    """
+    Test that percentiles are accurate to the bucket resolution.
+    """
+    histogram = LatencyHistogram()
+    for index in range(1, 1001):
+        histogram.observe(index / 1000)
+
+    # Percentiles fall within 2% of the exact values
+    for fraction in (0.5, 0.95, 0.99):
+        assert histogram.percentile(fraction) == pytest.approx(fraction, rel=0.02)
+    assert histogram.percentile(1.0) == histogram.max == 1.0
+    assert LatencyHistogram().percentile(0.5) == 0.0
+    assert parse_distribution("1K:70,1M", parse_size) == [(1024, 70.0), (1 << 20, 1.0)]
+    with pytest.raises(ValueError):
+        parse_distribution("1K:0", parse_size)
+
+
+def test_run_load(tmp_path):
+    """
+    Test a short mixed load on the library and on a relayer.
+    """
+    reports = []
+    results = run_load(owners=2, consumers=3, sizes=[(512, 1.0), (4096, 1.0)], policies=[(1, 1), (2, 3)],
+                       mix=[('consume', 6.0), ('store', 3.0), ('grant', 1.0)], concurrency=2, duration=None,
+                       operations=60, initial_assets=5, seed=7, report_interval=0.05,
+                       report=lambda *args: reports.append(args))
+
+    # Every issued operation is accounted for, without errors
+    assert results['total']['count'] == 60 and results['total']['errors'] == 0
+    assert sum(summary['count'] for summary in results['operations'].values()) == 60
+    consume = results['operations']['consume']
+    assert 0 < consume['p50'] <= consume['p95'] <= consume['p99'] <= consume['max']
+    assert results['assets'] == 5 + results['operations']['store']['count']
+    assert results['peak_memory'] > 0 and reports
+
+    # The same workload can be sent to a relayer
+    unix_path = str(tmp_path / "relayer.sock")
+    loop = asyncio.new_event_loop()
+    relayer = Relayer()
+    server = loop.run_until_complete(relayer.start(unix_path=unix_path))
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        results = run_load(owners=1, consumers=2, policies=[(2, 3)], duration=None, operations=20,
+                           initial_assets=2, relayer={'unix_path': unix_path})
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        relayer.close()
+    assert results['total']['count'] == 20 and results['total']['errors'] == 0
@@ -0,0 +1,100 @@
+import os
+import pytest
+from umbral import SecretKey, Signer
+from src.blobfile import BlobFile, BlobExtent
+from src.database import (
+    store_data, store_encrypted_data, consume_data, reencrypt_for_consumer, get_did_document, DataStorageError
+)
+from src.encryption import encrypt_data
+from src.storage import InMemoryStorage, SQLiteStorage
+
+
+def test_blob_file_append_and_read(tmp_path):
+    """
+    Test that blobs are read back as views of the memory map, across appends and reopening.
+    """
+    path = str(tmp_path / "blobs.bin")
+    blob_file = BlobFile(path)
+    first = blob_file.append(b"first blob")
+    view = blob_file.read(first)
+
+    # Views are zero-copy and stay valid while later appends remap the file
+    assert isinstance(view, memoryview) and view.readonly
+    second = blob_file.append(b"second blob")
+    assert bytes(blob_file.read(second)) == b"second blob"
+    assert bytes(view) == b"first blob"
+    assert second.offset == len(b"first blob")
+
+    # Corrupt or out-of-range extents are rejected
+    with pytest.raises(ValueError):
+        blob_file.read(BlobExtent(first.offset, first.length, second.digest))
+    with pytest.raises(ValueError):
+        blob_file.read(BlobExtent(second.offset, second.length + 1, second.digest))
+    del view
+    blob_file.close()
+
+    reopened = BlobFile(path)
+    assert bytes(reopened.read(second)) == b"second blob"
+    assert reopened.size == first.length + second.length
+    reopened.close()
+
+
+def test_large_ciphertexts_are_served_from_the_blob_file(tmp_path):
+    """
+    Test that large ciphertexts are stored in the blob file and consumed from the mapping.
+    """
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    large, small = os.urandom(200 * 1024), b"Small data"
+    blob_path, db_path = str(tmp_path / "blobs.bin"), str(tmp_path / "data.db")
+
+    storage = SQLiteStorage(db_path, blob_file=BlobFile(blob_path, min_size=1024))
+    for asset_id, data in (("large", large), ("small", small)):
+        store_data(storage, asset_id, data, "https://example.com/data", owner_key, Signer(owner_key),
+                   consumer_key.public_key())
+
+    # Only the large ciphertext moved to the blob file
+    assert storage.get('ciphertexts', "large") is None
+    assert storage.get('ciphertexts', "small") is not None
+    assert storage.blob_file.size > len(large)
+    storage.blob_file.close()
+    storage.close()
+
+    # Records keep pointing at the blob after reopening
+    storage = SQLiteStorage(db_path, blob_file=BlobFile(blob_path, min_size=1024))
+    _, _, ciphertext, _, _ = reencrypt_for_consumer(storage, "large", consumer_key.public_key())
+    assert isinstance(ciphertext, memoryview)
+    for asset_id, data in (("large", large), ("small", small)):
+        assert consume_data(storage, asset_id, "consumer_address", consumer_key,
+                            owner_key.public_key(), consumer_key.public_key())[0] == data
+    assert get_did_document(storage, "large")["access"][0]["data"] == ciphertext.hex()
+    del ciphertext
+    storage.blob_file.close()
+    storage.close()
+
+    # Without the blob file, the asset cannot be read
+    storage = SQLiteStorage(db_path)
+    with pytest.raises(DataStorageError):
+        consume_data(storage, "large", "consumer_address", consumer_key,
+                     owner_key.public_key(), consumer_key.public_key())
+    storage.close()
+
+
+def test_invalid_records_do_not_use_blob_space(tmp_path):
+    """
+    Test that a ciphertext is not appended to the blob file when its record is invalid.
+    """
+    owner_key = SecretKey.random()
+    ciphertext, capsule = encrypt_data(os.urandom(4096), owner_key.public_key())
+    storage = InMemoryStorage(blob_file=BlobFile(str(tmp_path / "blobs.bin"), min_size=1024))
+
+    with pytest.raises(DataStorageError):
+        store_encrypted_data(storage, "asset", ciphertext, capsule, "https://example.com/data",
+                             owner_key.public_key(), [(b"bad grant", "policy_id")])
+    assert storage.blob_file.size == 0
+    assert storage.get('collection', "asset") is None
+
+    store_encrypted_data(storage, "asset", ciphertext, capsule, "https://example.com/data",
+                         owner_key.public_key(), [])
+    assert storage.blob_file.size == len(ciphertext)
+    storage.blob_file.close()
@@ -0,0 +1,54 @@
+from umbral import SecretKey, Signer
+from src.blobs import BLOB_COLLECTION, BLOB_REF_COLLECTION, content_digest, blob_refcount
+from src.database import store_data, consume_data, delete_data, get_did_document
+from src.storage import InMemoryStorage
+
+
+def test_deduplicated_assets_share_one_blob():
+    """
+    Test that identical payloads are stored once and freed with their last reference.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    data = b"Shared payload"
+    digest = content_digest(owner_key, data)
+
+    def store(asset_id, payload, key=owner_key):
+        store_data(storage, asset_id, payload, "https://example.com/data", key, Signer(key),
+                   consumer_key.public_key(), deduplicate=True)
+
+    def consume(asset_id, key=owner_key):
+        return consume_data(storage, asset_id, "consumer_address", consumer_key,
+                            key.public_key(), consumer_key.public_key())[0]
+
+    # Both assets reference one ciphertext and capsule
+    store("first", data)
+    store("second", data)
+    assert list(storage.keys(BLOB_COLLECTION)) == [digest.hex()]
+    assert blob_refcount(storage, digest) == 2
+    assert consume("first") == consume("second") == data
+    assert get_did_document(storage, "first")["access"][0]["capsule"] == \
+        get_did_document(storage, "second")["access"][0]["capsule"]
+
+    # Storing the same data again under an existing asset keeps the count stable
+    store("second", data)
+    assert blob_refcount(storage, digest) == 2
+
+    # Another owner's identical payload gets its own blob
+    other_owner = SecretKey.random()
+    store("third", data, other_owner)
+    assert len(list(storage.keys(BLOB_COLLECTION))) == 2
+    assert consume("third", other_owner) == data
+
+    # Deleting one asset keeps the blob for the other
+    assert delete_data(storage, "first")
+    assert blob_refcount(storage, digest) == 1
+    assert consume("second") == data
+
+    # Overwriting the last reference with different data frees the blob
+    store("second", b"Other payload")
+    assert blob_refcount(storage, digest) == 0
+    assert storage.get(BLOB_COLLECTION, digest.hex()) is None
+    assert storage.get(BLOB_REF_COLLECTION, digest.hex()) is None
+    assert consume("second") == b"Other payload"
@@ -0,0 +1,109 @@
+import os
+import pytest
+from umbral import SecretKey, Signer
+from src.blobfile import BlobFile
+from src.bulk import store_many, consume_many
+from src.database import consume_data, store_data, store_stream, DataStorageError
+from src.indexes import assets_by_owner
+from src.storage import SQLiteStorage
+from src.token_validation import BurnVerifier, InMemoryLedger, InsufficientTokenBurn
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_store_many(workers):
+    """
+    Test that many assets are stored in batches and failures are reported per asset.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+
+    # Include one invalid asset with empty data among valid ones
+    assets = [(f"asset_{index}", f"data {index}".encode(), "https://example.com/data") for index in range(5)]
+    assets.insert(2, ("empty_asset", b"", "https://example.com/data"))
+
+    failures = store_many(database, iter(assets), owner_key, Signer(owner_key), consumer_key.public_key(),
+                          workers=workers, batch_size=2)
+
+    # Assert that only the invalid asset failed and the rest were stored
+    assert list(failures) == ["empty_asset"]
+    assert isinstance(failures["empty_asset"], ValueError)
+    assert len(database['collection']) == 5
+    assert len(database['policies']) == 1
+
+    decrypted_data, _ = consume_data(database, "asset_4", "consumer_address", consumer_key,
+                                     owner_key.public_key(), consumer_key.public_key())
+    assert decrypted_data == b"data 4"
+
+
+def test_store_many_writes_batches(tmp_path):
+    """
+    Test that each batch is written with one put_many, including index entries and overwrites.
+    """
+    storage = SQLiteStorage(str(tmp_path / "data.db"), blob_file=BlobFile(str(tmp_path / "blobs"), min_size=1024))
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    store_data(storage, "asset_0", b"old data", "https://example.com/old", owner_key, Signer(owner_key),
+               consumer_key.public_key())
+
+    batches = []
+    put_many = storage.put_many
+    storage.put_many = lambda items: batches.append(list(items)) or put_many(batches[-1])
+
+    # Small and blob file sized payloads, one of them overwriting an existing asset
+    assets = [(f"asset_{index}", os.urandom(2048) if index % 2 else b"small", "https://example.com/data")
+              for index in range(5)]
+    failures = store_many(storage, assets, owner_key, Signer(owner_key), consumer_key.public_key(),
+                          workers=0, batch_size=2)
+
+    assert not failures
+    assert len(batches) == 3
+    assert sorted(assets_by_owner(storage, owner_key.public_key())) == [f"asset_{index}" for index in range(5)]
+    for asset_id, data, access_url in assets:
+        assert consume_data(storage, asset_id, "consumer_address", consumer_key, owner_key.public_key(),
+                            consumer_key.public_key()) == (data, access_url)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_consume_many(tmp_path, workers):
+    """
+    Test that many assets are consumed with bounded work in flight and failures are reported per asset.
+    """
+    storage = SQLiteStorage(str(tmp_path / "data.db"), blob_file=BlobFile(str(tmp_path / "blobs.bin"), min_size=1024))
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    other_key = SecretKey.random()
+
+    # Plain, compressed, blob-file and chunked assets, plus one the consumer was not granted
+    assets = {f"asset_{index}": f"data {index}".encode() * 100 for index in range(6)}
+    assets["large"] = os.urandom(4096)
+    for asset_id, data in assets.items():
+        store_data(storage, asset_id, data, "https://example.com/data", owner_key, Signer(owner_key),
+                   consumer_key.public_key(), compression="auto")
+    store_stream(storage, "stream", iter([b"a" * 3000, b"b" * 3000]), "https://example.com/data",
+                 owner_key, Signer(owner_key), consumer_key.public_key(), chunk_size=1024)
+    assets["stream"] = b"a" * 3000 + b"b" * 3000
+    store_data(storage, "private", b"Private data", "https://example.com/data", owner_key, Signer(owner_key),
+               other_key.public_key())
+
+    asset_ids = list(assets) + ["missing", "private"]
+    results = consume_many(storage, iter(asset_ids), "consumer_address", consumer_key, owner_key.public_key(),
+                           workers=workers, max_in_flight=3)
+    results = {result.asset_id: result for result in results}
+
+    # Every asset has exactly one result; failures do not stop the batch
+    assert sorted(results) == sorted(asset_ids)
+    for asset_id, data in assets.items():
+        assert results[asset_id].error is None
+        assert results[asset_id].data == data
+        assert results[asset_id].access_url == "https://example.com/data"
+    assert isinstance(results["missing"].error, DataStorageError)
+    assert isinstance(results["private"].error, PermissionError)
+    assert results["private"].data is None
+
+    # The token burn is checked once, before any asset is read
+    with pytest.raises(InsufficientTokenBurn):
+        next(consume_many(storage, asset_ids, "consumer_address", consumer_key, owner_key.public_key(),
+                          workers=workers, burn_verifier=BurnVerifier(InMemoryLedger(), 10)))
+    storage.blob_file.close()
+    storage.close()
@@ -0,0 +1,60 @@
+from src.cache import LRUCache
+
+
+def test_lru_eviction_and_counters():
+    """
+    Test that the least recently used entry is evicted and hits/misses are counted.
+    """
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    # Touch "a" so that "b" becomes the least recently used entry
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 2}
+
+
+def test_ttl_expiry():
+    """
+    Test that entries expire after the configured time to live.
+    """
+    now = [100.0]
+    cache = LRUCache(maxsize=10, ttl=5, clock=lambda: now[0])
+    cache.put("key", "value")
+
+    now[0] += 4
+    assert cache.get("key") == "value"
+    now[0] += 2
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_group():
+    """
+    Test that all entries of a group are invalidated together.
+    """
+    cache = LRUCache(maxsize=10)
+    cache.put(("asset", "policy_1"), 1, group="asset")
+    cache.put(("asset", "policy_2"), 2, group="asset")
+    cache.put(("other", "policy_1"), 3, group="other")
+
+    cache.invalidate_group("asset")
+
+    assert cache.get(("asset", "policy_1")) is None
+    assert cache.get(("asset", "policy_2")) is None
+    assert cache.get(("other", "policy_1")) == 3
+
+
+def test_zero_ttl_disables_caching():
+    """
+    Test that a time to live of zero caches nothing instead of never expiring.
+    """
+    cache = LRUCache(maxsize=10, ttl=0, clock=lambda: 100.0)
+    cache.put("key", "value")
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import pytest
+from umbral import SecretKey, Signer
+from src.compression import (
+    available_codecs, compress_data, decompress_data, compress_stream, decompress_stream,
+    select_codec, CompressionError
+)
+from src.database import store_data, store_stream, consume_data, consume_stream, get_did_document
+from src.relayer import Relayer, open_consume_response
+from src.storage import InMemoryStorage
+
+CSV = b"".join(b"%d,sensor-%d,%d.5,ok\n" % (i, i % 7, i * 3) for i in range(2000))
+
+
+def test_codecs_round_trip():
+    """
+    Test one-shot and streaming round trips of every available codec.
+    """
+    for name in available_codecs():
+        codec, compressed = compress_data(CSV, name)
+        assert codec.name == name
+        assert decompress_data(compressed, name) == CSV
+
+        codec, stream = compress_stream([CSV[:1000], CSV[1000:5000], CSV[5000:]], name)
+        assert b"".join(decompress_stream(list(stream), codec)) == CSV
+
+    # Adaptive selection compresses text and skips small or incompressible data
+    assert select_codec(CSV).name != 'none'
+    assert select_codec(os.urandom(100000)).name == 'none'
+    assert select_codec(b"short").name == 'none'
+
+    with pytest.raises(CompressionError):
+        compress_data(CSV, "unknown")
+    with pytest.raises(CompressionError):
+        decompress_data(b"not compressed", "zlib")
+
+
+def test_store_and_consume_compressed():
+    """
+    Test that compressed assets are recorded in the DID document and decompressed on consumption.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+
+    def store(asset_id, data, **kwargs):
+        store_data(storage, asset_id, data, "https://example.com/data", owner_key, Signer(owner_key),
+                   consumer_key.public_key(), **kwargs)
+
+    def consume(asset_id):
+        return consume_data(storage, asset_id, "consumer_address", consumer_key,
+                            owner_key.public_key(), consumer_key.public_key())[0]
+
+    # Compressible data is stored smaller and read back unchanged
+    store("csv", CSV, compression="auto")
+    store("csv_deduplicated", CSV, compression="lzma", deduplicate=True)
+    noise = os.urandom(4096)
+    store("noise", noise, compression="auto")
+    assert consume("csv") == consume("csv_deduplicated") == CSV
+    assert consume("noise") == noise
+    assert len(storage.get('ciphertexts', "csv")) < len(CSV) // 3
+    assert get_did_document(storage, "csv_deduplicated")["access"][0]["compression"] == "lzma"
+    assert "compression" not in get_did_document(storage, "noise")["access"][0]
+
+    # Streamed assets are decompressed incrementally
+    store_stream(storage, "stream", iter([CSV[:7000], CSV[7000:]]), "https://example.com/data",
+                 owner_key, Signer(owner_key), consumer_key.public_key(), chunk_size=1024, compression="zlib")
+    chunks, _ = consume_stream(storage, "stream", "consumer_address", consumer_key,
+                               owner_key.public_key(), consumer_key.public_key())
+    assert b"".join(chunks) == CSV
+    assert get_did_document(storage, "stream")["access"][0]["chunks"] < len(CSV) // 1024
+
+    # Relayer clients receive the codec and decompress after decrypting
+    relayer = Relayer(storage)
+    try:
+        response = asyncio.run(relayer.consume({
+            'assetId': "csv", 'consumerAddress': "consumer_address",
+            'consumerPublicKey': bytes(consumer_key.public_key()).hex(),
+        }))
+    finally:
+        relayer.close()
+    assert response['compression'] == get_did_document(storage, "csv")["access"][0]["compression"]
+    assert open_consume_response(response, consumer_key, owner_key.public_key()) == CSV
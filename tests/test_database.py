@@ -1,6 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 import pytest
-from umbral import SecretKey, Signer
-from src.database import store_data, consume_data, DataStorageError
+from umbral import SecretKey, Signer, KeyFrag
+from src.database import (
+    store_data, consume_data, store_stream, consume_stream, get_did_document,
+    grant_access, grant_kfrags, revoke_access, reencrypt_for_consumer, export_asset, import_asset, DataStorageError
+)
+from src.cache import LRUCache
+from src.encryption import create_kfrags
+from src.storage import InMemoryStorage, SQLiteStorage
 
 
 def test_store_data():
@@ -63,3 +70,325 @@ def test_consume_data():
 
     # Assert that the access link matches the expected URL
     assert access_link == access_url
+
+
+def test_store_and_consume_with_sqlite_backend(tmp_path):
+    """
+    Test that stored data survives reopening a SQLite-backed database.
+    """
+    path = str(tmp_path / "assets.db")
+    owner_key = SecretKey.random()
+    owner_signer = Signer(owner_key)
+    consumer_key = SecretKey.random()
+
+    # Store the data and close the database
+    database = SQLiteStorage(path)
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, owner_signer, consumer_key.public_key())
+    database.close()
+
+    # Consume the data from a freshly opened database
+    database = SQLiteStorage(path)
+    decrypted_data, access_link = consume_data(
+        database,
+        "test_asset",
+        "consumer_address",
+        consumer_key,
+        owner_key.public_key(),
+        consumer_key.public_key()
+    )
+    database.close()
+
+    assert decrypted_data == b"Test data"
+    assert access_link == "https://example.com/data"
+
+
+def test_consume_missing_asset_raises():
+    """
+    Test that consuming an unknown asset raises a DataStorageError.
+    """
+    consumer_key = SecretKey.random()
+    with pytest.raises(DataStorageError):
+        consume_data(
+            {'collection': {}},
+            "missing_asset",
+            "consumer_address",
+            consumer_key,
+            SecretKey.random().public_key(),
+            consumer_key.public_key()
+        )
+
+
+def test_get_did_document():
+    """
+    Test that the JSON DID document view is produced on request.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, Signer(owner_key), SecretKey.random().public_key())
+
+    did_doc = get_did_document(database, "test_asset")
+
+    assert did_doc["id"] == "did:op:test_asset"
+    assert did_doc["encryption"]["publicKey"] == bytes(owner_key.public_key()).hex()
+    assert len(did_doc["access"][0]["kfrags"]) == 1
+
+
+def test_store_and_consume_stream():
+    """
+    Test that a streamed asset is stored as chunks and consumed chunk by chunk.
+    """
+    database = {'collection': {}}
+    data = b"0123456789" * 100
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+
+    # Store the data from an iterator in chunks of 64 bytes
+    store_stream(database, "stream_asset", iter([data[:500], data[500:]]), "https://example.com/data",
+                 owner_key, Signer(owner_key), consumer_key.public_key(), chunk_size=64)
+    assert len(database['chunks']) == 16
+
+    # Consume the data chunk by chunk
+    chunks, access_link = consume_stream(
+        database,
+        "stream_asset",
+        "consumer_address",
+        consumer_key,
+        owner_key.public_key(),
+        consumer_key.public_key()
+    )
+    chunks = list(chunks)
+    assert len(chunks) == 16
+    assert b"".join(chunks) == data
+    assert access_link == "https://example.com/data"
+
+    # The regular consume path returns the whole payload
+    decrypted_data, _ = consume_data(database, "stream_asset", "consumer_address", consumer_key,
+                                     owner_key.public_key(), consumer_key.public_key())
+    assert decrypted_data == data
+
+    # Overwriting with a regular asset removes the stale chunks
+    store_data(database, "stream_asset", b"small", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_key.public_key())
+    assert not database['chunks']
+
+
+def test_grant_and_revoke_access():
+    """
+    Test that additional consumers can be granted and revoked without storing the data again.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    owner_signer = Signer(owner_key)
+    first_consumer = SecretKey.random()
+    second_consumer = SecretKey.random()
+
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, owner_signer, first_consumer.public_key())
+    ciphertext = database['ciphertexts']["test_asset"]
+
+    # The second consumer cannot read the asset before being granted access
+    with pytest.raises(PermissionError):
+        consume_data(database, "test_asset", "consumer_address", second_consumer,
+                     owner_key.public_key(), second_consumer.public_key())
+
+    grant_access(database, "test_asset", owner_key, owner_signer, second_consumer.public_key(),
+                 threshold=2, shares=3)
+
+    # Both consumers can read the single stored ciphertext
+    for consumer in (first_consumer, second_consumer):
+        decrypted_data, _ = consume_data(database, "test_asset", "consumer_address", consumer,
+                                         owner_key.public_key(), consumer.public_key())
+        assert decrypted_data == b"Test data"
+    assert database['ciphertexts']["test_asset"] is ciphertext
+    assert len(get_did_document(database, "test_asset")["access"]) == 2
+
+    # Revoking removes only the revoked consumer's grant
+    assert revoke_access(database, "test_asset", first_consumer.public_key())
+    assert not revoke_access(database, "test_asset", first_consumer.public_key())
+    with pytest.raises(PermissionError):
+        consume_data(database, "test_asset", "consumer_address", first_consumer,
+                     owner_key.public_key(), first_consumer.public_key())
+
+
+def test_export_and_import_asset():
+    """
+    Test that exported assets, including deduplicated and streamed ones, can be imported into another database.
+    """
+    source, target = InMemoryStorage(), InMemoryStorage()
+    owner_key = SecretKey.random()
+    first_consumer = SecretKey.random()
+    second_consumer = SecretKey.random()
+
+    store_data(source, "shared", b"Shared data", "https://example.com/data", owner_key, Signer(owner_key),
+               first_consumer.public_key(), deduplicate=True)
+    grant_access(source, "shared", owner_key, Signer(owner_key), second_consumer.public_key(), threshold=2, shares=3)
+    store_stream(source, "stream", iter([b"x" * 5000]), "https://example.com/data", owner_key, Signer(owner_key),
+                 first_consumer.public_key(), chunk_size=1024)
+
+    for asset_id in ("shared", "stream"):
+        assert import_asset(target, export_asset(source, asset_id)) == asset_id
+    assert export_asset(source, "missing") is None
+
+    # Every grant keeps working, and the creation time is kept
+    for consumer in (first_consumer, second_consumer):
+        decrypted_data, _ = consume_data(target, "shared", "consumer_address", consumer,
+                                         owner_key.public_key(), consumer.public_key())
+        assert decrypted_data == b"Shared data"
+    chunks, _ = consume_stream(target, "stream", "consumer_address", first_consumer,
+                               owner_key.public_key(), first_consumer.public_key())
+    assert b"".join(chunks) == b"x" * 5000
+    assert get_did_document(target, "shared")["created"] == get_did_document(source, "shared")["created"]
+
+    with pytest.raises(DataStorageError):
+        import_asset(target, {'record': b"invalid", 'ciphertext': None, 'chunks': [], 'policies': []})
+
+
+def test_grant_access_requires_owner():
+    """
+    Test that only the data owner can grant access to an asset.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    other_key = SecretKey.random()
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, Signer(owner_key), SecretKey.random().public_key())
+
+    with pytest.raises(PermissionError):
+        grant_access(database, "test_asset", other_key, Signer(other_key), SecretKey.random().public_key())
+
+
+def test_consume_data_with_executor():
+    """
+    Test consuming a 3-of-5 asset with concurrent re-encryption.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_key.public_key(), threshold=3, shares=5)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        decrypted_data, _ = consume_data(database, "test_asset", "consumer_address", consumer_key,
+                                         owner_key.public_key(), consumer_key.public_key(),
+                                         executor=executor)
+
+    assert decrypted_data == b"Test data"
+
+
+def test_consume_data_uses_object_cache():
+    """
+    Test that parsed capsules and kfrags are cached and invalidated when the asset is overwritten.
+    """
+    cache = LRUCache(maxsize=16)
+    database = InMemoryStorage(object_cache=cache)
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+
+    def consume():
+        return consume_data(database, "test_asset", "consumer_address", consumer_key,
+                            owner_key.public_key(), consumer_key.public_key())[0]
+
+    store_data(database, "test_asset", b"first", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_key.public_key())
+
+    # The first read parses the asset, the second one is served from the cache
+    assert consume() == b"first"
+    assert consume() == b"first"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Overwriting the asset invalidates the cached capsule
+    store_data(database, "test_asset", b"second", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_key.public_key())
+    assert consume() == b"second"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_consume_data_uses_cfrag_cache():
+    """
+    Test that repeated reads reuse capsule fragments until access is revoked.
+    """
+    cfrag_cache = LRUCache(maxsize=16)
+    database = InMemoryStorage(cfrag_cache=cfrag_cache)
+    owner_key = SecretKey.random()
+    owner_signer = Signer(owner_key)
+    consumer_key = SecretKey.random()
+    store_data(database, "test_asset", b"Test data", "https://example.com/data",
+               owner_key, owner_signer, consumer_key.public_key(), threshold=2, shares=3)
+
+    def consume():
+        return consume_data(database, "test_asset", "consumer_address", consumer_key,
+                            owner_key.public_key(), consumer_key.public_key())[0]
+
+    # The first read re-encrypts with two kfrags, the second one reuses both cfrags
+    assert consume() == b"Test data"
+    assert len(cfrag_cache) == 2
+    assert consume() == b"Test data"
+    assert cfrag_cache.hits == 2
+
+    # Revoking access clears the cached cfrags of the asset
+    revoke_access(database, "test_asset", consumer_key.public_key())
+    assert len(cfrag_cache) == 0
+    with pytest.raises(PermissionError):
+        consume()
+
+
+def test_grant_kfrags_replacing_policy_clears_caches():
+    """
+    Test that new kfrags for a shared policy drop what was cached for every asset using it.
+    """
+    object_cache, cfrag_cache = LRUCache(maxsize=16), LRUCache(maxsize=16)
+    database = InMemoryStorage(object_cache=object_cache, cfrag_cache=cfrag_cache)
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    for asset_id in ("asset_1", "asset_2"):
+        store_data(database, asset_id, b"Test data", "https://example.com/data",
+                   owner_key, Signer(owner_key), consumer_key.public_key())
+        consume_data(database, asset_id, "consumer_address", consumer_key,
+                     owner_key.public_key(), consumer_key.public_key())
+    assert (len(object_cache), len(cfrag_cache)) == (2, 2)
+
+    kfrags = [bytes(kfrag) for kfrag in create_kfrags(owner_key, consumer_key.public_key(), Signer(owner_key), 1, 1)]
+    grant_kfrags(database, "asset_1", consumer_key.public_key(), 1, kfrags)
+    assert (len(object_cache), len(cfrag_cache)) == (0, 0)
+
+    # The other asset of the pair re-encrypts with the new kfrags
+    _, cfrags, *_ = reencrypt_for_consumer(database, "asset_2", consumer_key.public_key())
+    assert [bytes(cfrag.cfrag.kfrag_id) for cfrag in cfrags] == [
+        bytes(KeyFrag.from_bytes(kfrag).id) for kfrag in kfrags
+    ]
+
+
+def test_grant_kfrags_refuses_revoked_kfrags():
+    """
+    Test that replaying a grant after its kfrags were revoked or replaced does not restore access.
+    """
+    database, target = InMemoryStorage(), InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    for asset_id in ("asset_1", "asset_2"):
+        store_data(database, asset_id, b"Test data", "https://example.com/data",
+                   owner_key, Signer(owner_key), consumer_key.public_key())
+
+    def new_kfrags():
+        kfrags = create_kfrags(owner_key, consumer_key.public_key(), Signer(owner_key), 1, 1)
+        return [bytes(kfrag) for kfrag in kfrags]
+
+    old_kfrags = new_kfrags()
+    grant_kfrags(database, "asset_1", consumer_key.public_key(), 1, old_kfrags)
+    assert revoke_access(database, "asset_1", consumer_key.public_key())
+    with pytest.raises(PermissionError):
+        grant_kfrags(database, "asset_1", consumer_key.public_key(), 1, old_kfrags)
+    # The revocation only covers the asset it was made for
+    grant_kfrags(database, "asset_2", consumer_key.public_key(), 1, old_kfrags)
+
+    # New kfrags for the pair revoke the ones they replace on every asset
+    grant_kfrags(database, "asset_1", consumer_key.public_key(), 1, new_kfrags())
+    with pytest.raises(PermissionError):
+        grant_kfrags(database, "asset_2", consumer_key.public_key(), 1, old_kfrags)
+
+    # Revocations move with an exported asset
+    import_asset(target, export_asset(database, "asset_2"))
+    with pytest.raises(PermissionError):
+        grant_kfrags(target, "asset_2", consumer_key.public_key(), 1, old_kfrags)
@@ -1,7 +1,11 @@
+import struct
 import pytest
 from umbral import SecretKey, Signer
 from src.encryption import encrypt_data, create_kfrags
-from src.did_document import create_did_document
+from src.did_document import (
+    AssetRecord, create_did_document, encode_did_document, decode_did_document, did_document_to_json,
+    replace_grants, FIELD_CHUNKS
+)
 
 
 def test_create_did_document():
@@ -35,3 +39,101 @@ def test_create_did_document():
 
     # Assert that the DID document contains the expected number of key fragments (kfrags)
     assert len(did_doc["access"][0]["kfrags"]) == 1
+
+
+def test_binary_did_document_round_trip():
+    """
+    Test that a binary DID document decodes to the original fields without hex encoding.
+    """
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random().public_key()
+    ciphertext, capsule = encrypt_data(b"Test data", owner_key.public_key())
+
+    # Encode and decode the binary DID document
+    encoded = encode_did_document("test_asset", "https://example.com/data", owner_key.public_key(),
+                                  capsule, [(bytes(consumer_key), "policy_id")])
+    decoded = decode_did_document(encoded)
+
+    # Assert that binary fields are zero-copy slices holding the raw values
+    assert isinstance(decoded["capsule"], memoryview)
+    assert decoded["capsule"] == bytes(capsule)
+    assert decoded["grants"] == {bytes(consumer_key): "policy_id"}
+
+    # Assert that the JSON view is produced with hex-encoded fields
+    did_doc = did_document_to_json(decoded, ciphertext)
+    assert did_doc["id"] == "did:op:test_asset"
+    assert did_doc["access"][0]["data"] == ciphertext.hex()
+    assert did_doc["access"][0]["consumer"] == bytes(consumer_key).hex()
+
+
+def test_asset_record():
+    """
+    Test that an AssetRecord decodes the binary format into slots and round-trips.
+    """
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random().public_key()
+    ciphertext, capsule = encrypt_data(b"Test data", owner_key.public_key())
+    encoded = encode_did_document("test_asset", "https://example.com/data", owner_key.public_key(),
+                                  capsule, [(bytes(consumer_key), "policy_id")])
+
+    record = AssetRecord.from_bytes(encoded)
+
+    # Fields are plain bytes and strings held in slots, without a per-instance dict
+    assert not hasattr(record, "__dict__")
+    assert record.capsule == bytes(capsule) and type(record.capsule) is bytes
+    assert record.grants == ((bytes(consumer_key), "policy_id"),)
+    assert record.policy_for(consumer_key) == "policy_id"
+    assert record.policy_for(owner_key.public_key()) is None
+
+    # Encoding and the JSON view match the dict-based functions
+    assert record.to_bytes() == encoded
+    assert record.to_json(ciphertext) == did_document_to_json(decode_did_document(encoded), ciphertext)
+    with pytest.raises(ValueError):
+        AssetRecord.from_bytes(encoded[:-3])
+
+
+def test_replace_grants():
+    """
+    Test that grants can be replaced without touching the other fields.
+    """
+    owner_key = SecretKey.random()
+    first, second = bytes(SecretKey.random().public_key()), bytes(SecretKey.random().public_key())
+    _, capsule = encrypt_data(b"Test data", owner_key.public_key())
+    encoded = encode_did_document("test_asset", "https://example.com/data", owner_key.public_key(),
+                                  capsule, [(first, "policy_1")])
+
+    updated = decode_did_document(replace_grants(encoded, [(first, "policy_1"), (second, "policy_2")]))
+
+    assert updated["grants"] == {first: "policy_1", second: "policy_2"}
+    assert updated["capsule"] == bytes(capsule)
+    assert updated["created"] == decode_did_document(encoded)["created"]
+
+
+def test_decode_truncated_did_document():
+    """
+    Test that a truncated binary DID document is rejected.
+    """
+    owner_key = SecretKey.random()
+    _, capsule = encrypt_data(b"Test data", owner_key.public_key())
+    encoded = encode_did_document("test_asset", "https://example.com/data", owner_key.public_key(),
+                                  capsule, [(bytes(owner_key.public_key()), "policy_id")])
+
+    with pytest.raises(ValueError):
+        decode_did_document(encoded[:-5])
+
+
+def test_decode_malformed_chunk_count():
+    """
+    Test that a chunk count field of the wrong length is rejected with ValueError.
+    """
+    owner_key = SecretKey.random()
+    _, capsule = encrypt_data(b"Test data", owner_key.public_key())
+    encoded = encode_did_document("test_asset", "https://example.com/data", owner_key.public_key(),
+                                  capsule, [(bytes(owner_key.public_key()), "policy_id")])
+    # Field header (tag, length) followed by a 2-byte instead of a 4-byte count
+    malformed = encoded + struct.pack('>BI', FIELD_CHUNKS, 2) + b"\x00\x01"
+
+    with pytest.raises(ValueError, match="malformed chunk count"):
+        decode_did_document(malformed)
+    with pytest.raises(ValueError, match="malformed chunk count"):
+        AssetRecord.from_bytes(malformed)
@@ -1,5 +1,10 @@
+import io
 import unittest
-from src.encryption import encrypt_data, decrypt_data, create_kfrags, reencrypt_data, decrypt_reencrypted_data
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from src.encryption import (
+    encrypt_data, decrypt_data, create_kfrags, reencrypt_data, decrypt_reencrypted_data,
+    encrypt_stream, decrypt_stream, decrypt_reencrypted_stream, reencrypt_threshold
+)
 from umbral import SecretKey, Signer, pre, keys, decrypt_reencrypted
 
 
@@ -59,6 +64,74 @@ class TestEncryption(unittest.TestCase):
         # Assert that the decrypted data matches the original data
         assert decrypted_data == self.data
 
+    def test_stream_re_encryption_flow(self):
+        """
+        Test the proxy re-encryption flow for a chunked stream.
+        """
+        data = bytes(range(256)) * 40
+
+        # Encrypt a file-like object in small chunks under a single capsule
+        capsule, encrypted_chunks = encrypt_stream(io.BytesIO(data), self.owner_public_key, chunk_size=1000)
+        chunks = list(encrypted_chunks)
+        self.assertEqual(len(chunks), 11)
+
+        kfrags = create_kfrags(self.owner_secret_key, self.consumer_public_key, self.signer, 1, 1)
+        cfrags = [reencrypt_data(capsule, kfrags[0])]
+
+        # Decrypt the chunks one by one using the consumer's secret key
+        decrypted_chunks = decrypt_reencrypted_stream(
+            self.consumer_secret_key,
+            self.owner_public_key,
+            capsule,
+            cfrags,
+            chunks
+        )
+        self.assertEqual(b"".join(decrypted_chunks), data)
+
+    def test_stream_rejects_truncation_and_reordering(self):
+        """
+        Test that dropped or reordered chunks fail authentication.
+        """
+        capsule, encrypted_chunks = encrypt_stream([b"a" * 10, b"b" * 10, b"c" * 10],
+                                                   self.owner_public_key, chunk_size=10)
+        chunks = list(encrypted_chunks)
+
+        with self.assertRaises(ValueError):
+            list(decrypt_stream(self.owner_secret_key, capsule, chunks[:-1]))
+        with self.assertRaises(ValueError):
+            list(decrypt_stream(self.owner_secret_key, capsule, [chunks[1], chunks[0], chunks[2]]))
+
+    def test_reencrypt_threshold_stops_early(self):
+        """
+        Test that only threshold capsule fragments are produced, serially or concurrently.
+        """
+        ciphertext, capsule = encrypt_data(self.data, self.owner_public_key)
+        kfrags = create_kfrags(self.owner_secret_key, self.consumer_public_key, self.signer, 3, 5)
+
+        with ThreadPoolExecutor(max_workers=5) as threads, ProcessPoolExecutor(max_workers=2) as processes:
+            for executor in (None, threads, processes):
+                cfrags = reencrypt_threshold(capsule, kfrags, 3, executor)
+                self.assertEqual(len(cfrags), 3)
+
+                decrypted_data = decrypt_reencrypted_data(
+                    self.consumer_secret_key,
+                    self.owner_public_key,
+                    capsule,
+                    cfrags,
+                    ciphertext
+                )
+                self.assertEqual(decrypted_data, self.data)
+
+    def test_reencrypt_threshold_not_reached(self):
+        """
+        Test that too few key fragments are reported as an error.
+        """
+        _, capsule = encrypt_data(self.data, self.owner_public_key)
+        kfrags = create_kfrags(self.owner_secret_key, self.consumer_public_key, self.signer, 3, 5)
+
+        with self.assertRaises(ValueError):
+            reencrypt_threshold(capsule, kfrags[:2], 3)
+
 
 if __name__ == '__main__':
     unittest.main()
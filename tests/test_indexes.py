@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from umbral import SecretKey, Signer
+from src.database import (
+    store_data, grant_access, revoke_access, delete_data, rebuild_indexes, ASSET_COLLECTION
+)
+from src.indexes import assets_by_owner, assets_by_consumer, assets_created, INDEXES
+from src.storage import InMemoryStorage, SQLiteStorage
+
+
+@pytest.mark.parametrize("make_storage", [InMemoryStorage, lambda: SQLiteStorage(':memory:')])
+def test_indexes_follow_writes(make_storage):
+    """
+    Test that owner, consumer and creation-time indexes are updated on every write.
+    """
+    storage = make_storage()
+    owner_key = SecretKey.random()
+    other_owner_key = SecretKey.random()
+    consumer_key = SecretKey.random().public_key()
+    second_consumer_key = SecretKey.random().public_key()
+    before = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    for asset_id in ("asset1", "asset2"):
+        store_data(storage, asset_id, b"Test data", "https://example.com/data",
+                   owner_key, Signer(owner_key), consumer_key)
+    store_data(storage, "asset3", b"Test data", "https://example.com/data",
+               other_owner_key, Signer(other_owner_key), second_consumer_key)
+
+    # Exact and prefix lookups by owner
+    assert list(assets_by_owner(storage, owner_key.public_key())) == ["asset1", "asset2"]
+    assert "asset3" in assets_by_owner(storage, bytes(other_owner_key.public_key()).hex()[:6])
+    assert list(assets_by_consumer(storage, second_consumer_key)) == ["asset3"]
+
+    # Grants and revocations update the consumer index only
+    grant_access(storage, "asset1", owner_key, Signer(owner_key), second_consumer_key)
+    assert list(assets_by_consumer(storage, second_consumer_key)) == ["asset1", "asset3"]
+    revoke_access(storage, "asset1", consumer_key)
+    assert list(assets_by_consumer(storage, consumer_key)) == ["asset2"]
+
+    # Range queries over creation time
+    assert sorted(assets_created(storage, since=before)) == ["asset1", "asset2", "asset3"]
+    assert list(assets_created(storage, until=before)) == []
+    assert list(assets_created(storage, since=datetime.now(timezone.utc) + timedelta(seconds=1))) == []
+    assert sorted(assets_created(storage, since=before.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))) == [
+        "asset1", "asset2", "asset3"
+    ]
+    assert list(assets_created(storage, until=before.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))) == []
+    with pytest.raises(ValueError):
+        list(assets_created(storage, since="yesterday"))
+
+    # Deleting an asset removes all of its entries
+    assert delete_data(storage, "asset3")
+    assert not delete_data(storage, "asset3")
+    assert list(assets_by_owner(storage, other_owner_key.public_key())) == []
+    assert list(assets_by_consumer(storage, second_consumer_key)) == ["asset1"]
+    assert "asset3" not in assets_created(storage)
+
+
+def test_rebuild_indexes():
+    """
+    Test rebuilding the indexes of records stored without them.
+    """
+    database = {}
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random().public_key()
+    store_data(database, "asset", b"Test data", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_key)
+
+    # Simulate data stored before indexing existed
+    for collection in INDEXES:
+        database.pop(collection, None)
+    assert list(assets_by_owner(database, owner_key.public_key())) == []
+
+    assert rebuild_indexes(database) == len(database[ASSET_COLLECTION]) == 1
+    assert list(assets_by_owner(database, owner_key.public_key())) == ["asset"]
+    assert list(assets_by_consumer(database, consumer_key)) == ["asset"]
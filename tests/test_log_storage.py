@@ -0,0 +1,114 @@
+import os
+import pytest
+from umbral import SecretKey, Signer
+from src.database import store_data, consume_data, grant_access, revoke_access
+from src.log_storage import LogStorage, StorageCorruption
+
+
+def _consume(storage, owner_key, consumer_key):
+    return consume_data(storage, "asset", "consumer_address", consumer_key,
+                        owner_key.public_key(), consumer_key.public_key())[0]
+
+
+def test_log_storage_survives_restarts(tmp_path):
+    """
+    Test that stores, grants and revokes are recovered from the log and from snapshots.
+    """
+    path = str(tmp_path / "log")
+    owner_key = SecretKey.random()
+    first_consumer, second_consumer = SecretKey.random(), SecretKey.random()
+
+    storage = LogStorage(path, wal_limit=0)
+    store_data(storage, "asset", b"Logged data", "https://example.com/data", owner_key, Signer(owner_key),
+               first_consumer.public_key())
+    storage.put('settings', "limits", {'maxSize': 10})
+    storage.close()
+
+    # Replaying the log restores every write
+    storage = LogStorage(path, wal_limit=0)
+    assert _consume(storage, owner_key, first_consumer) == b"Logged data"
+    assert storage.get('settings', "limits") == {'maxSize': 10}
+    grant_access(storage, "asset", owner_key, Signer(owner_key), second_consumer.public_key())
+    revoke_access(storage, "asset", first_consumer.public_key())
+
+    # A snapshot replaces the log; later writes go to a new log
+    storage.snapshot()
+    storage.delete('settings', "limits")
+    storage.close()
+    assert sorted(os.listdir(path)) == ["snapshot-1.log", "wal-1.log"]
+
+    storage = LogStorage(path, wal_limit=0)
+    assert _consume(storage, owner_key, second_consumer) == b"Logged data"
+    with pytest.raises(PermissionError):
+        _consume(storage, owner_key, first_consumer)
+    assert storage.get('settings', "limits") is None
+    assert list(storage.scan('collection')) == ["asset"]
+    storage.close()
+
+
+def test_log_storage_recovers_from_torn_writes(tmp_path):
+    """
+    Test that a torn log tail is discarded and corrupted values are detected.
+    """
+    path = str(tmp_path / "log")
+    storage = LogStorage(path, wal_limit=0)
+    storage.put('collection', "kept", b"kept value")
+    storage.close()
+
+    # A crash in the middle of an append leaves a partial entry
+    with open(os.path.join(path, "wal-0.log"), 'ab') as file:
+        file.write(b"\x01\x00\x05partial")
+    storage = LogStorage(path, wal_limit=0)
+    assert list(storage.keys('collection')) == ["kept"]
+    storage.put('collection', "after", b"after crash")
+    storage.close()
+
+    storage = LogStorage(path, wal_limit=0)
+    assert storage.get('collection', "after") == b"after crash"
+    storage.close()
+
+    # Corruption before the end of the log is reported instead of truncating valid entries
+    _flip(os.path.join(path, "wal-0.log"), b"kept value")
+    with pytest.raises(StorageCorruption):
+        LogStorage(path, wal_limit=0)
+    _flip(os.path.join(path, "wal-0.log"), b"Kept value")
+
+    # In snapshots, values are only checked when they are read
+    storage = LogStorage(path, wal_limit=0)
+    storage.snapshot()
+    storage.close()
+    _flip(os.path.join(path, "snapshot-1.log"), b"kept value")
+    storage = LogStorage(path, wal_limit=0)
+    assert storage.get('collection', "after") == b"after crash"
+    with pytest.raises(StorageCorruption):
+        storage.get('collection', "kept")
+    storage.close()
+
+
+def _flip(path, value):
+    """Toggle the case of the first byte of a stored value."""
+    with open(path, 'r+b') as file:
+        data = file.read()
+        file.seek(data.index(value))
+        file.write(bytes([value[0] ^ 0x20]))
+
+
+def test_log_storage_snapshots_in_background(tmp_path):
+    """
+    Test that snapshots are taken automatically once the log is over its limit.
+    """
+    path = str(tmp_path / "log")
+    storage = LogStorage(path, wal_limit=4096)
+    for index in range(200):
+        storage.put('collection', f"key-{index:03d}", os.urandom(100))
+        storage.put('collection', "overwritten", index.to_bytes(2, 'big'))
+    expected = {key: storage.get('collection', key) for key in storage.keys('collection')}
+    storage.close()
+
+    # Old logs were compacted away, and the live values survive the restart
+    assert any(name.startswith("snapshot-") for name in os.listdir(path))
+    assert sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) < 200 * 100 * 2
+    storage = LogStorage(path)
+    assert {key: storage.get('collection', key) for key in storage.keys('collection')} == expected
+    assert storage.get('collection', "overwritten") == (199).to_bytes(2, 'big')
+    storage.close()
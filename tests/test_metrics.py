@@ -0,0 +1,78 @@
+import pytest
+from umbral import SecretKey, Signer
+from src.database import store_data, consume_data, DataStorageError
+from src.encryption import encrypt_data
+from src.metrics import MetricsRegistry, Histogram, enable_metrics, disable_metrics, get_registry, timed
+from src.storage import InMemoryStorage
+
+
+@pytest.fixture
+def registry():
+    """
+    Enable instrumentation for one test.
+    """
+    yield enable_metrics()
+    disable_metrics()
+
+
+def test_store_and_consume_stages(registry):
+    """
+    Test that each stage of store_data and consume_data is timed and counted.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_secret_key = SecretKey.random()
+    store_data(storage, "asset", b"Measured data", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_secret_key.public_key())
+    consume_data(storage, "asset", "consumer_address", consumer_secret_key,
+                 owner_key.public_key(), consumer_secret_key.public_key())
+
+    # Every stage ran once, and payload sizes are counted
+    for stage in ('store_data', 'store.encrypt', 'store.policy', 'store.write', 'consume_data',
+                  'consume.load', 'consume.parse', 'consume.reencrypt', 'consume.read',
+                  'consume.decrypt', 'encrypt_data', 'reencrypt_data', 'decrypt_reencrypted_data'):
+        assert registry.operations[stage] == 1, stage
+    assert registry.bytes['store_data'] == len(b"Measured data")
+    assert registry.bytes['consume_data'] == len(b"Measured data")
+
+    # Failures are counted by exception type
+    with pytest.raises(DataStorageError):
+        consume_data(storage, "missing", "consumer_address", consumer_secret_key,
+                     owner_key.public_key(), consumer_secret_key.public_key())
+    assert registry.errors[('consume_data', 'DataStorageError')] == 1
+
+    exported = registry.to_prometheus()
+    assert 'data_proxy_stage_duration_seconds_count{stage="consume.reencrypt"} 1' in exported
+    assert 'data_proxy_stage_errors_total{stage="consume_data",error="DataStorageError"} 1' in exported
+    assert 'data_proxy_stage_bytes_total{stage="encrypt_data"} 13' in exported
+
+
+def test_metrics_disabled_and_callback():
+    """
+    Test that nothing is recorded while disabled and that callbacks receive each stage.
+    """
+    assert get_registry() is None
+    with timed('ignored') as stage:
+        stage.nbytes = 10
+    encrypt_data(b"data", SecretKey.random().public_key())
+
+    calls = []
+    registry = enable_metrics(MetricsRegistry(callback=lambda *args: calls.append(args)))
+    try:
+        encrypt_data(b"data", SecretKey.random().public_key())
+    finally:
+        disable_metrics()
+    assert list(registry.operations) == ['encrypt_data']
+    assert calls[0][0] == 'encrypt_data' and calls[0][2] == 4 and calls[0][3] is None
+
+
+def test_histogram_buckets():
+    """
+    Test that histogram buckets are cumulative.
+    """
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.count == 4 and histogram.total == pytest.approx(2.65)
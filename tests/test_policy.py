@@ -0,0 +1,47 @@
+from umbral import SecretKey, Signer
+from src.database import store_data, consume_data
+from src.policy import Policy, get_or_create_policy, load_policy, make_policy_id
+
+
+def test_policy_is_created_once():
+    """
+    Test that kfrags are generated once per owner/consumer pair and reused.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    owner_signer = Signer(owner_key)
+    consumer_key = SecretKey.random().public_key()
+
+    first = get_or_create_policy(database, owner_key, owner_signer, consumer_key, threshold=2, shares=3)
+    second = get_or_create_policy(database, owner_key, owner_signer, consumer_key, threshold=2, shares=3)
+
+    # Assert that the same stored policy is returned
+    assert first == second == make_policy_id(owner_key.public_key(), consumer_key, 2, 3)
+    assert len(database['policies']) == 1
+
+    # Assert that the policy round-trips through its binary encoding
+    policy = load_policy(database, first)
+    assert Policy.from_bytes(policy.to_bytes()).kfrags == policy.kfrags
+    assert (policy.threshold, policy.shares) == (2, 3)
+    assert len(policy.verified_kfrags()) == 3
+
+
+def test_assets_share_policy():
+    """
+    Test that assets stored for the same consumer reference a single policy.
+    """
+    database = {'collection': {}}
+    owner_key = SecretKey.random()
+    owner_signer = Signer(owner_key)
+    consumer_key = SecretKey.random()
+
+    for index in range(3):
+        store_data(database, f"asset_{index}", b"Test data", "https://example.com/data",
+                   owner_key, owner_signer, consumer_key.public_key(), threshold=2, shares=3)
+
+    # Assert that only one policy is stored for the three assets
+    assert len(database['policies']) == 1
+
+    decrypted_data, _ = consume_data(database, "asset_2", "consumer_address", consumer_key,
+                                     owner_key.public_key(), consumer_key.public_key())
+    assert decrypted_data == b"Test data"
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import threading
+import time
+from umbral import SecretKey, Signer
+from src.database import store_stream
+from src.encryption import encrypt_data, create_kfrags
+from src.relayer import Relayer, relayer_request, open_consume_response, sign_store_request
+import src.relayer as relayer_module
+
+
+def _store_payload(asset_id, data, owner_key, version=1):
+    """Build a store request for data encrypted by the owner."""
+    ciphertext, capsule = encrypt_data(data, owner_key.public_key())
+    return sign_store_request({
+        'assetId': asset_id,
+        'accessUrl': "https://example.com/data",
+        'ownerPublicKey': bytes(owner_key.public_key()).hex(),
+        'capsule': bytes(capsule).hex(),
+        'ciphertext': ciphertext.hex(),
+        'version': version,
+    }, Signer(owner_key))
+
+
+def _grant_payload(asset_id, owner_key, consumer_key, threshold=2, shares=3):
+    """Build a grant request with kfrags signed by the owner."""
+    kfrags = create_kfrags(owner_key, consumer_key, Signer(owner_key), threshold=threshold, shares=shares)
+    return {
+        'assetId': asset_id,
+        'consumerPublicKey': bytes(consumer_key).hex(),
+        'threshold': threshold,
+        'kfrags': [bytes(kfrag).hex() for kfrag in kfrags],
+    }
+
+
+def test_relayer_store_grant_consume():
+    """
+    Test a full round trip through the relayer's HTTP endpoints.
+    """
+    owner_key = SecretKey.random()
+    consumer_sk = SecretKey.random()
+    intruder_sk = SecretKey.random()
+
+    async def scenario():
+        relayer = Relayer()
+        server = await relayer.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, _ = await relayer_request('/store', _store_payload("asset", b"Relayed data", owner_key), port=port)
+            assert status == 200
+            status, body = await relayer_request(
+                '/grant', _grant_payload("asset", owner_key, consumer_sk.public_key()), port=port)
+            assert status == 200 and body['policyId']
+
+            # Kfrags issued for another consumer cannot be used to grant access
+            forged = _grant_payload("asset", owner_key, consumer_sk.public_key())
+            forged['consumerPublicKey'] = bytes(intruder_sk.public_key()).hex()
+            status, _ = await relayer_request('/grant', forged, port=port)
+            assert status == 403
+
+            request = {'assetId': "asset", 'consumerAddress': "consumer_address",
+                       'consumerPublicKey': bytes(consumer_sk.public_key()).hex()}
+            status, body = await relayer_request('/consume', request, port=port)
+            assert status == 200
+            return body
+        finally:
+            server.close()
+            await server.wait_closed()
+            relayer.close()
+
+    body = asyncio.run(scenario())
+
+    # The consumer verifies the fragments and decrypts locally
+    assert open_consume_response(body, consumer_sk, owner_key.public_key()) == b"Relayed data"
+    assert body['accessUrl'] == "https://example.com/data"
+
+
+def test_relayer_coalesces_identical_consumes(monkeypatch):
+    """
+    Test that concurrent identical consume requests share one re-encryption.
+    """
+    owner_key = SecretKey.random()
+    consumer_sk = SecretKey.random()
+    calls = []
+    lock = threading.Lock()
+    original = relayer_module.reencrypt_for_consumer
+
+    def counting_reencrypt(*args):
+        with lock:
+            calls.append(args[1])
+        # Keep the first call in flight while the other requests arrive
+        time.sleep(0.1)
+        return original(*args)
+
+    monkeypatch.setattr(relayer_module, 'reencrypt_for_consumer', counting_reencrypt)
+
+    async def scenario():
+        relayer = Relayer()
+        try:
+            await relayer.store(_store_payload("asset", b"Shared data", owner_key))
+            await relayer.grant(_grant_payload("asset", owner_key, consumer_sk.public_key()))
+            request = {'assetId': "asset", 'consumerAddress': "consumer_address",
+                       'consumerPublicKey': bytes(consumer_sk.public_key()).hex()}
+            return await asyncio.gather(*(relayer.consume(request) for _ in range(20)))
+        finally:
+            relayer.close()
+
+    responses = asyncio.run(scenario())
+
+    # Twenty requests, one re-encryption, identical responses
+    assert calls == ["asset"]
+    assert all(response == responses[0] for response in responses)
+    assert open_consume_response(responses[0], consumer_sk, owner_key.public_key()) == b"Shared data"
+
+
+def test_relayer_errors():
+    """
+    Test the HTTP status returned for invalid requests.
+    """
+    consumer_key = SecretKey.random().public_key()
+
+    async def scenario():
+        relayer = Relayer()
+        try:
+            missing = await relayer.dispatch('/consume', {
+                'assetId': "missing", 'consumerAddress': "consumer_address",
+                'consumerPublicKey': bytes(consumer_key).hex()})
+            invalid = await relayer.dispatch('/consume', {'assetId': "missing"})
+            unknown = await relayer.dispatch('/unknown', {})
+            return missing[0], invalid[0], unknown[0]
+        finally:
+            relayer.close()
+
+    assert asyncio.run(scenario()) == (404, 400, 404)
+
+
+def test_relayer_rejects_store_by_another_owner():
+    """
+    Test that an asset cannot be replaced by another key or by an unsigned request.
+    """
+    owner_key = SecretKey.random()
+    intruder_key = SecretKey.random()
+    consumer_sk = SecretKey.random()
+
+    async def scenario():
+        relayer = Relayer()
+        try:
+            await relayer.store(_store_payload("asset", b"Owner data", owner_key))
+            await relayer.grant(_grant_payload("asset", owner_key, consumer_sk.public_key()))
+
+            # Takeover with the intruder's own key and signature
+            takeover = await relayer.dispatch('/store', _store_payload("asset", b"Intruder data", intruder_key))
+            # Claiming the owner's public key without the owner's signature
+            forged = _store_payload("asset", b"Intruder data", owner_key)
+            forged = sign_store_request({**forged, 'accessUrl': "https://example.com/other"}, Signer(intruder_key))
+            unsigned = _store_payload("other", b"Intruder data", owner_key)
+            del unsigned['signature']
+            statuses = [takeover[0], (await relayer.dispatch('/store', forged))[0],
+                        (await relayer.dispatch('/store', unsigned))[0]]
+
+            request = {'assetId': "asset", 'consumerAddress': "consumer_address",
+                       'consumerPublicKey': bytes(consumer_sk.public_key()).hex()}
+            return statuses, await relayer.consume(request)
+        finally:
+            relayer.close()
+
+    statuses, body = asyncio.run(scenario())
+    assert statuses == [403, 403, 400]
+
+    # The owner's asset and the consumer's grant are unchanged
+    assert open_consume_response(body, consumer_sk, owner_key.public_key()) == b"Owner data"
+    assert body['accessUrl'] == "https://example.com/data"
+
+
+def test_relayer_limits_response_size():
+    """
+    Test that assets too large for a consume response are answered with 413.
+    """
+    owner_key = SecretKey.random()
+    consumer_sk = SecretKey.random()
+
+    async def scenario():
+        relayer = Relayer(max_response_size=4096)
+        try:
+            for asset_id, data in (("small", b"x" * 100), ("large", os.urandom(4096))):
+                await relayer.store(_store_payload(asset_id, data, owner_key))
+                await relayer.grant(_grant_payload(asset_id, owner_key, consumer_sk.public_key()))
+            # A streamed asset is rejected while its chunks are read
+            store_stream(relayer.storage, "streamed", [os.urandom(1024)] * 4, "https://example.com/data",
+                         owner_key, Signer(owner_key), consumer_sk.public_key(), chunk_size=1024)
+            statuses = []
+            for asset_id in ("small", "large", "streamed"):
+                status, _ = await relayer.dispatch('/consume', {
+                    'assetId': asset_id, 'consumerAddress': "consumer_address",
+                    'consumerPublicKey': bytes(consumer_sk.public_key()).hex()})
+                statuses.append(status)
+            return statuses
+        finally:
+            relayer.close()
+
+    assert asyncio.run(scenario()) == [200, 413, 413]
+
+
+def test_relayer_store_versions():
+    """
+    Test that replayed or older store requests are refused and that re-storing keeps the grants.
+    """
+    owner_key = SecretKey.random()
+    consumer_sk = SecretKey.random()
+
+    async def scenario():
+        relayer = Relayer()
+        try:
+            first = _store_payload("asset", b"First version", owner_key)
+            await relayer.store(first)
+            await relayer.grant(_grant_payload("asset", owner_key, consumer_sk.public_key()))
+            await relayer.store(_store_payload("asset", b"Second version", owner_key, version=2))
+
+            # Replaying the first request, or signing an older version, is a conflict
+            statuses = [(await relayer.dispatch('/store', first))[0],
+                        (await relayer.dispatch('/store', _store_payload("asset", b"Old", owner_key, version=2)))[0],
+                        (await relayer.dispatch('/store', {**first, 'version': 0}))[0]]
+
+            request = {'assetId': "asset", 'consumerAddress': "consumer_address",
+                       'consumerPublicKey': bytes(consumer_sk.public_key()).hex()}
+            return statuses, await relayer.consume(request)
+        finally:
+            relayer.close()
+
+    statuses, body = asyncio.run(scenario())
+    assert statuses == [409, 409, 400]
+
+    # The consumer granted access to the first version can read the second
+    assert open_consume_response(body, consumer_sk, owner_key.public_key()) == b"Second version"
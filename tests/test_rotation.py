@@ -0,0 +1,152 @@
+import pytest
+from umbral import SecretKey, Signer
+from src.cache import LRUCache
+from src.database import store_data, consume_data, get_did_document, grant_kfrags
+from src.encryption import create_kfrags
+from src.policy import load_policy, make_policy_id
+from src.rotation import rotate_access, revoke_consumer, ROTATION_COLLECTION
+from src.sharding import ShardedDatabase
+from src.storage import InMemoryStorage
+import src.rotation as rotation_module
+
+
+def _consume(storage, asset_id, owner_key, consumer_key):
+    return consume_data(storage, asset_id, "consumer_address", consumer_key,
+                        owner_key.public_key(), consumer_key.public_key())[0]
+
+
+def test_rotate_access():
+    """
+    Test that kfrags are replaced across all assets without touching ciphertexts, and that rotation resumes.
+    """
+    storage = InMemoryStorage(object_cache=LRUCache(), cfrag_cache=LRUCache())
+    owner_key, other_owner = SecretKey.random(), SecretKey.random()
+    consumer_key = SecretKey.random()
+    for index in range(7):
+        store_data(storage, f"asset_{index}", b"Data %d" % index, "https://example.com/data", owner_key,
+                   Signer(owner_key), consumer_key.public_key())
+    store_data(storage, "other", b"Other data", "https://example.com/data", other_owner, Signer(other_owner),
+               consumer_key.public_key())
+    assert _consume(storage, "asset_0", owner_key, consumer_key) == b"Data 0"
+    ciphertexts = {asset_id: storage.get('ciphertexts', asset_id) for asset_id in storage.keys('ciphertexts')}
+    policy_id = make_policy_id(owner_key.public_key(), consumer_key.public_key(), 1, 1)
+    old_kfrags = load_policy(storage, policy_id).kfrags
+
+    # With the same threshold and shares, the policy is replaced in place without a scan
+    result = rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key(), batch_size=3)
+    assert result.done and result.scanned == 0 and result.updated == 0
+    assert load_policy(storage, policy_id).kfrags != old_kfrags
+    assert _consume(storage, "asset_0", owner_key, consumer_key) == b"Data 0"
+
+    # A rotation to new parameters that is interrupted after its first batch
+    def interrupt(progress):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key(), threshold=2, shares=3,
+                      batch_size=3, progress=interrupt)
+    with pytest.raises(PermissionError):
+        _consume(storage, "asset_6", owner_key, consumer_key)
+    assert len(list(storage.keys(ROTATION_COLLECTION))) == 1
+
+    # resumes from its checkpoint, counting the batch done before the interruption
+    reported = []
+    result = rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key(), threshold=2, shares=3,
+                           batch_size=3, progress=reported.append)
+    assert [progress.scanned for progress in reported] == [6, 8, 8]
+    assert result.updated == 7
+    assert list(storage.keys(ROTATION_COLLECTION)) == []
+    for index in range(7):
+        assert _consume(storage, f"asset_{index}", owner_key, consumer_key) == b"Data %d" % index
+    assert _consume(storage, "other", other_owner, consumer_key) == b"Other data"
+    assert storage.get('policies', policy_id) is None
+    assert {asset_id: storage.get('ciphertexts', asset_id) for asset_id in storage.keys('ciphertexts')} == ciphertexts
+
+
+def test_rotate_access_skips_unchanged_policy(monkeypatch):
+    """
+    Test that rotating to the current policy rewrites no record unless other policies remain.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    for index in range(4):
+        store_data(storage, f"asset_{index}", b"Data %d" % index, "https://example.com/data", owner_key,
+                   Signer(owner_key), consumer_key.public_key(), threshold=2, shares=3)
+    updated = []
+    monkeypatch.setattr(rotation_module, 'update_grant', lambda *args: updated.append(args[1]) or True)
+
+    result = rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key(), threshold=2, shares=3)
+    assert result == (result.job_id, 0, 0, True)
+    assert not updated
+    assert _consume(storage, "asset_3", owner_key, consumer_key) == b"Data 3"
+
+    # An asset granted under another policy of the pair still needs every grant checked
+    store_data(storage, "asset_4", b"Data 4", "https://example.com/data", owner_key, Signer(owner_key),
+               consumer_key.public_key())
+    result = rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key(), threshold=2, shares=3)
+    assert result.scanned == 5 and sorted(updated) == [f"asset_{index}" for index in range(5)]
+
+
+def test_revoke_consumer():
+    """
+    Test that a consumer's access to all of an owner's assets ends at once, locally and across shards.
+    """
+    storage = InMemoryStorage(object_cache=LRUCache(), cfrag_cache=LRUCache())
+    owner_key, other_owner = SecretKey.random(), SecretKey.random()
+    consumer_key = SecretKey.random()
+    for index in range(5):
+        store_data(storage, f"asset_{index}", b"Data", "https://example.com/data", owner_key,
+                   Signer(owner_key), consumer_key.public_key())
+    store_data(storage, "other", b"Other data", "https://example.com/data", other_owner, Signer(other_owner),
+               consumer_key.public_key())
+    assert _consume(storage, "asset_0", owner_key, consumer_key) == b"Data"
+
+    result = revoke_consumer(storage, owner_key.public_key(), consumer_key.public_key(), batch_size=2)
+    assert (result.scanned, result.updated) == (6, 5)
+    for index in range(5):
+        with pytest.raises(PermissionError):
+            _consume(storage, f"asset_{index}", owner_key, consumer_key)
+        assert get_did_document(storage, f"asset_{index}")["access"] == []
+    assert _consume(storage, "other", other_owner, consumer_key) == b"Other data"
+
+    # Sharded databases run the job on every shard in parallel
+    shards = ShardedDatabase(2)
+    try:
+        for index in range(6):
+            shards.store_data(f"asset_{index}", b"Data", "https://example.com/data", owner_key,
+                              consumer_key.public_key())
+        assert shards.rotate_access(owner_key, consumer_key.public_key(), threshold=2, shares=2).updated == 6
+        assert shards.consume_data("asset_3", "consumer_address", consumer_key, owner_key.public_key(),
+                                   consumer_key.public_key())[0] == b"Data"
+        assert shards.revoke_consumer(owner_key.public_key(), consumer_key.public_key()).updated == 6
+        with pytest.raises(PermissionError):
+            shards.consume_data("asset_3", "consumer_address", consumer_key, owner_key.public_key(),
+                                consumer_key.public_key())
+    finally:
+        shards.close()
+
+
+def test_revoked_kfrags_cannot_be_granted_again():
+    """
+    Test that grants replayed with kfrags from before a rotation or a revocation are refused.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    store_data(storage, "asset", b"Data", "https://example.com/data", owner_key, Signer(owner_key),
+               consumer_key.public_key())
+    kfrags = [bytes(kfrag) for kfrag in create_kfrags(owner_key, consumer_key.public_key(), Signer(owner_key), 1, 1)]
+    grant_kfrags(storage, "asset", consumer_key.public_key(), 1, kfrags)
+
+    rotate_access(storage, owner_key, Signer(owner_key), consumer_key.public_key())
+    with pytest.raises(PermissionError):
+        grant_kfrags(storage, "asset", consumer_key.public_key(), 1, kfrags)
+    rotated = load_policy(storage, make_policy_id(owner_key.public_key(), consumer_key.public_key(), 1, 1)).kfrags
+    grant_kfrags(storage, "asset", consumer_key.public_key(), 1, rotated)
+
+    revoke_consumer(storage, owner_key.public_key(), consumer_key.public_key())
+    with pytest.raises(PermissionError):
+        grant_kfrags(storage, "asset", consumer_key.public_key(), 1, rotated)
+    with pytest.raises(PermissionError):
+        _consume(storage, "asset", owner_key, consumer_key)
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from umbral import SecretKey, Signer
+from src.encryption import encrypt_data, create_kfrags
+from src.relayer import Relayer, open_consume_response, sign_store_request
+from src.sharding import HashRing, ShardedDatabase
+
+
+def test_hash_ring_moves_few_keys():
+    """
+    Test that adding or removing a shard only moves keys to or from that shard.
+    """
+    keys = [f"asset_{index}" for index in range(10000)]
+    ring = HashRing(["a", "b", "c", "d"])
+    before = {key: ring.shard_for(key) for key in keys}
+
+    # Keys are spread over all shards
+    counts = {shard: list(before.values()).count(shard) for shard in ring.shards}
+    assert min(counts.values()) > len(keys) / 4 * 0.7
+
+    # A fifth shard takes about a fifth of the keys, all from the other shards
+    ring.add("e")
+    after = {key: ring.shard_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "e" for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.3
+
+    # A copy places keys the same way and is independent of the original
+    copy = ring.copy()
+    assert {key: copy.shard_for(key) for key in keys} == after
+    copy.remove("a")
+    assert ring.shards == ["a", "b", "c", "d", "e"]
+
+    # Removing it restores the original placement
+    ring.remove("e")
+    assert {key: ring.shard_for(key) for key in keys} == before
+    with pytest.raises(ValueError):
+        ring.remove("e")
+    with pytest.raises(ValueError):
+        HashRing().shard_for("asset")
+
+
+def test_sharded_database():
+    """
+    Test that assets are served by their shard and survive adding and removing shards.
+    """
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    other_key = SecretKey.random()
+    shards = ShardedDatabase(2)
+    try:
+        asset_ids = [f"asset_{index}" for index in range(12)]
+        for asset_id in asset_ids:
+            shards.store_data(asset_id, asset_id.encode(), "https://example.com/data", owner_key,
+                              consumer_key.public_key(), compression="zlib")
+        shards.grant_access("asset_0", owner_key, other_key.public_key())
+        assert shards.revoke_access("asset_1", consumer_key.public_key())
+
+        def consume(asset_id, key=consumer_key):
+            return shards.consume_data(asset_id, "consumer_address", key, owner_key.public_key(),
+                                       key.public_key())[0]
+
+        # Errors raised in a shard process reach the caller unchanged
+        assert consume("asset_0", other_key) == b"asset_0"
+        with pytest.raises(PermissionError):
+            consume("asset_1")
+
+        # A new shard receives only the assets it now owns
+        moved = shards.add_shard("shard-2")
+        assert 0 < moved < len(asset_ids)
+        assert {shards.shard_for(asset_id) for asset_id in asset_ids} == {"shard-0", "shard-1", "shard-2"}
+        assert [consume(asset_id) for asset_id in asset_ids[2:]] == [asset_id.encode() for asset_id in asset_ids[2:]]
+        assert consume("asset_0", other_key) == b"asset_0"
+        with pytest.raises(PermissionError):
+            consume("asset_1")
+        with pytest.raises(ValueError):
+            shards.add_shard("shard-2")
+
+        shards.remove_shard("shard-0")
+        assert shards.shards == ["shard-1", "shard-2"]
+        assert [consume(asset_id) for asset_id in asset_ids[2:]] == [asset_id.encode() for asset_id in asset_ids[2:]]
+        assert shards.get_did_document("asset_5")["id"].endswith("asset_5")
+        assert shards.delete_data("asset_5")
+        assert not shards.delete_data("asset_5")
+    finally:
+        shards.close()
+
+
+def test_relayer_with_shards():
+    """
+    Test that a relayer serves store, grant and consume requests through shard processes.
+    """
+    owner_key = SecretKey.random()
+    consumer_key = SecretKey.random()
+    ciphertext, capsule = encrypt_data(b"Sharded data", owner_key.public_key())
+    kfrags = create_kfrags(owner_key, consumer_key.public_key(), Signer(owner_key), threshold=1, shares=1)
+    shards = ShardedDatabase(2)
+    relayer = Relayer(shards=shards)
+
+    async def run():
+        for path, payload in (
+            ('/store', sign_store_request({'assetId': "asset", 'accessUrl': "https://example.com/data",
+                                           'ownerPublicKey': bytes(owner_key.public_key()).hex(),
+                                           'capsule': bytes(capsule).hex(), 'ciphertext': ciphertext.hex(),
+                                           'version': 1},
+                                          Signer(owner_key))),
+            ('/grant', {'assetId': "asset", 'consumerPublicKey': bytes(consumer_key.public_key()).hex(),
+                        'threshold': 1, 'kfrags': [bytes(kfrag).hex() for kfrag in kfrags]}),
+        ):
+            status, _ = await relayer.dispatch(path, payload)
+            assert status == 200
+        return await relayer.dispatch('/consume', {
+            'assetId': "asset", 'consumerAddress': "consumer_address",
+            'consumerPublicKey': bytes(consumer_key.public_key()).hex(),
+        })
+
+    try:
+        status, response = asyncio.run(run())
+    finally:
+        relayer.close()
+        shards.close()
+    assert status == 200
+    assert open_consume_response(response, consumer_key, owner_key.public_key()) == b"Sharded data"
@@ -0,0 +1,105 @@
+import pytest
+from src.log_storage import LogStorage
+from src.storage import InMemoryStorage, SQLiteStorage, get_storage
+
+
+def test_in_memory_storage_wraps_dict():
+    """
+    Test that the in-memory backend reads and writes the wrapped dictionary.
+    """
+    database = {'collection': {}}
+    storage = get_storage(database)
+
+    storage.put('collection', 'asset', {'value': 1})
+
+    # The value is visible through both the backend and the dictionary
+    assert database['collection']['asset'] == {'value': 1}
+    assert storage.get('collection', 'asset') == {'value': 1}
+    assert storage.delete('collection', 'asset')
+    assert storage.get('collection', 'asset') is None
+
+
+def test_sqlite_storage_persists_values(tmp_path):
+    """
+    Test that the SQLite backend keeps values across reopening the file.
+    """
+    path = str(tmp_path / "store.db")
+    storage = SQLiteStorage(path)
+    storage.put('collection', 'doc', {'did_document': {'id': 'did:op:doc'}})
+    storage.put('blobs', 'raw', b'\x00\x01')
+    storage.close()
+
+    reopened = SQLiteStorage(path)
+
+    # Assert that JSON and binary values round-trip
+    assert reopened.get('collection', 'doc') == {'did_document': {'id': 'did:op:doc'}}
+    assert reopened.get('blobs', 'raw') == b'\x00\x01'
+    assert list(reopened.keys('collection')) == ['doc']
+    assert not reopened.contains('collection', 'missing')
+    reopened.close()
+
+
+def test_get_storage_rejects_unknown_types():
+    """
+    Test that unsupported database objects are rejected.
+    """
+    with pytest.raises(TypeError):
+        get_storage(['not', 'a', 'database'])
+
+
+def test_in_memory_storage_default_dict():
+    """
+    Test that an in-memory backend can be created without a dictionary.
+    """
+    storage = InMemoryStorage()
+    storage.put('collection', 'asset', 'value')
+    assert storage.contains('collection', 'asset')
+
+
+@pytest.mark.parametrize("make_storage", [InMemoryStorage, lambda: SQLiteStorage(':memory:')])
+def test_scan_returns_sorted_range(make_storage):
+    """
+    Test ordered range scans, including writes after the first scan.
+    """
+    storage = make_storage()
+    if isinstance(storage, SQLiteStorage):
+        # Force several pages
+        storage.scan_page_size = 2
+    for key in ('b', 'd', 'a', 'c'):
+        storage.put('index', key, b'')
+
+    assert list(storage.scan('index')) == ['a', 'b', 'c', 'd']
+
+    # Later writes are reflected in the order
+    storage.put('index', 'bb', b'')
+    storage.delete('index', 'c')
+    assert list(storage.scan('index', 'b', 'd')) == ['b', 'bb']
+    assert list(storage.scan('index', 'bc')) == ['d']
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "log"])
+def test_put_many_writes_batch(tmp_path, backend):
+    """
+    Test that a batch spanning several collections is written in order and persists.
+    """
+    def open_storage():
+        if backend == "sqlite":
+            return SQLiteStorage(str(tmp_path / "data.db"))
+        if backend == "log":
+            return LogStorage(str(tmp_path / "log"))
+        return InMemoryStorage(data)
+
+    data = {}
+    storage = open_storage()
+    storage.put('collection', 'a', b'old')
+    storage.scan('index')
+    storage.put_many([('collection', 'a', b'new'), ('index', 'b', b''), ('index', 'a', b''),
+                      ('policies', 'p', {'threshold': 1}), ('collection', 'c', b'last')])
+    storage.close()
+
+    storage = open_storage()
+    assert storage.get('collection', 'a') == b'new'
+    assert storage.get('collection', 'c') == b'last'
+    assert storage.get('policies', 'p') == {'threshold': 1}
+    assert list(storage.scan('index')) == ['a', 'b']
+    storage.close()
@@ -0,0 +1,124 @@
+import threading
+import pytest
+from umbral import SecretKey, Signer
+from src.cache import LRUCache
+from src.database import store_data, consume_data
+from src.storage import InMemoryStorage
+from src.token_validation import (
+    BurnVerifier, InMemoryLedger, InsufficientTokenBurn, validate_token_burn
+)
+
+
+def test_validate_token_burn():
+    """
+    Test a direct token burn check against the ledger.
+    """
+    ledger = InMemoryLedger({"alice": 5})
+
+    assert validate_token_burn("alice", 5, ledger)
+    assert not validate_token_burn("alice", 6, ledger)
+    assert not validate_token_burn("bob", 1, ledger)
+
+
+def test_burn_verifier_batches_and_caches():
+    """
+    Test that concurrent checks share one ledger query and verified burns are cached.
+    """
+    now = [0.0]
+    ledger = InMemoryLedger({f"consumer{i}": 1 for i in range(8)})
+    verifier = BurnVerifier(ledger, batch_window=0.5, max_batch=8,
+                            cache=LRUCache(ttl=60.0, clock=lambda: now[0]))
+
+    # Eight concurrent cache misses fill one batch and are answered by one query
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def check(address):
+        barrier.wait()
+        results[address] = verifier.verify(address)
+
+    threads = [threading.Thread(target=check, args=(f"consumer{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results.values()) and len(results) == 8
+    assert ledger.queries == 1
+
+    # Verified burns are served from the cache until they expire
+    verifier.require("consumer0")
+    assert ledger.queries == 1
+    now[0] = 61.0
+    verifier.require("consumer0")
+    assert ledger.queries == 2
+
+
+def test_burn_verifier_does_not_cache_refusals():
+    """
+    Test that a consumer who burns tokens after being refused is admitted.
+    """
+    ledger = InMemoryLedger()
+    verifier = BurnVerifier(ledger, required_amount=3, batch_window=0)
+
+    with pytest.raises(InsufficientTokenBurn):
+        verifier.require("alice")
+    ledger.burn("alice", 3)
+    verifier.require("alice")
+    assert verifier.verify_many(["alice", "bob"]) == {"alice": True, "bob": False}
+
+
+def test_consume_data_requires_token_burn():
+    """
+    Test that consume_data enforces token burns when given a verifier.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_secret_key = SecretKey.random()
+    store_data(storage, "asset", b"Paid data", "https://example.com/data",
+               owner_key, Signer(owner_key), consumer_secret_key.public_key())
+    ledger = InMemoryLedger()
+    verifier = BurnVerifier(ledger, batch_window=0)
+
+    # Refused until the consumer burns tokens
+    with pytest.raises(PermissionError):
+        consume_data(storage, "asset", "consumer_address", consumer_secret_key,
+                     owner_key.public_key(), consumer_secret_key.public_key(),
+                     burn_verifier=verifier)
+
+    ledger.burn("consumer_address", 1)
+    for _ in range(3):
+        decrypted_data, _ = consume_data(storage, "asset", "consumer_address", consumer_secret_key,
+                                         owner_key.public_key(), consumer_secret_key.public_key(),
+                                         burn_verifier=verifier)
+        assert decrypted_data == b"Paid data"
+
+    # One query for the refusal, one for the first successful read, none afterwards
+    assert ledger.queries == 2
+
+
+def test_burn_verifier_binds_address_to_consumer_key():
+    """
+    Test that with address_of, a burn only admits the consumer key owning the address.
+    """
+    storage = InMemoryStorage()
+    owner_key = SecretKey.random()
+    consumer_key, other_key = SecretKey.random(), SecretKey.random()
+    for key in (consumer_key, other_key):
+        store_data(storage, f"asset_{bytes(key.public_key()).hex()}", b"Paid data", "https://example.com/data",
+                   owner_key, Signer(owner_key), key.public_key())
+
+    def address_of(public_key):
+        return bytes(public_key).hex()[-40:]
+
+    address = address_of(consumer_key.public_key())
+    verifier = BurnVerifier(InMemoryLedger({address: 1}), batch_window=0, address_of=address_of)
+    verifier.require(address, consumer_key.public_key())
+    assert verifier.cached(address, consumer_key.public_key())
+
+    # Another consumer presenting the address is refused, even once its burn is cached
+    assert not verifier.cached(address, other_key.public_key())
+    assert not verifier.verify(address)
+    with pytest.raises(PermissionError) as raised:
+        consume_data(storage, f"asset_{bytes(other_key.public_key()).hex()}", address, other_key,
+                     owner_key.public_key(), other_key.public_key(), burn_verifier=verifier)
+    assert not isinstance(raised.value, InsufficientTokenBurn)